@@ -7,7 +7,7 @@ ESTRATEGIA DE DISEÑO:
 1. Inlines: Extendemos los modelos nativos (User, Group) inyectando nuestros 
    modelos de perfil (PerfilUsuario, PerfilGrupo) dentro de ellos.
 2. Auditoría: El historial es estrictamente de solo lectura para garantizar integridad.
-3. Usabilidad: Uso de 'filter_horizontal' y 'autocomplete_fields' para manejar 
+3. Usabilidad: Uso de 'autocomplete_fields' e inlines tabulares para manejar
    grandes volúmenes de usuarios y permisos sin trabar la interfaz.
 """
 
@@ -16,14 +16,24 @@ from django.contrib import admin
 from django.contrib.auth.admin import GroupAdmin as BaseGroupAdmin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import Group, User
+from django.contrib.postgres.search import SearchQuery
+from django.db.models import Q
 
+from .auditoria import VECTOR_DETALLE
+from .delegacion import excepciones_actuales, registrar_cambios_admin
 from .models import (
     Empresa, 
     Pertenencia, 
     Area, 
     PerfilGrupo, 
     HistorialCambiosRol, 
-    PerfilUsuario
+    PerfilUsuario,
+    PermisoEfectivo,
+    IndicePermiso,
+    CorreoPendiente,
+    ExcepcionPermiso,
+    SuscriptorWebhook,
+    EntregaWebhook,
 )
 
 
@@ -82,6 +92,19 @@ class EmpresaAdmin(admin.ModelAdmin):
 # ==============================================================================
 # 4. MATRIZ DE PERTENENCIA (CORE DEL HUB)
 # ==============================================================================
+class ExcepcionPermisoInline(admin.TabularInline):
+    """Excepciones de la asignación; con 'vence_en' son delegaciones temporales."""
+    model = ExcepcionPermiso
+    fk_name = 'pertenencia'
+    fields = ('permission', 'vence_en', 'otorgada_por')
+    readonly_fields = ('otorgada_por',)
+    extra = 0
+    verbose_name_plural = 'Excepciones (permisos extra solo para este usuario en esta empresa)'
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('permission__content_type', 'otorgada_por')
+
+
 @admin.register(Pertenencia)
 class PertenenciaAdmin(admin.ModelAdmin):
     """
@@ -97,9 +120,9 @@ class PertenenciaAdmin(admin.ModelAdmin):
     # Autocomplete: Vital para no cargar un dropdown con 5000 usuarios
     autocomplete_fields = ('usuario', 'grupo', 'empresa')
     
-    # Interfaz de doble caja para seleccionar múltiples permisos visualmente
-    filter_horizontal = ('permisos_adicionales',)
-    
+    # Excepciones en tabla (la intermedia lleva el vencimiento de cada una)
+    inlines = (ExcepcionPermisoInline,)
+
     fieldsets = (
         ('Identidad', {
             'fields': ('usuario', 'empresa')
@@ -108,12 +131,64 @@ class PertenenciaAdmin(admin.ModelAdmin):
             'fields': ('grupo', 'area'),
             'description': 'El rol define los permisos estándar del cargo.'
         }),
-        ('Excepciones', {
-            'fields': ('permisos_adicionales',),
-            'description': 'Permisos extra granulares solo para este usuario en esta empresa.'
-        }),
     )
 
+    def save_formset(self, request, form, formset, change):
+        if formset.model is ExcepcionPermiso:
+            for excepcion in formset.save(commit=False):
+                if excepcion.otorgada_por_id is None:
+                    excepcion.otorgada_por = request.user
+                excepcion.save()
+            for excepcion in formset.deleted_objects:
+                excepcion.delete()
+            return
+        super().save_formset(request, form, formset, change)
+
+    def save_related(self, request, form, formsets, change):
+        # El inline escribe la intermedia directo (sin m2m_changed): tabla, caché,
+        # corte de Pasaportes, auditoría y webhooks como en una delegación
+        pertenencia = form.instance
+        antes = excepciones_actuales(pertenencia)
+        super().save_related(request, form, formsets, change)
+        registrar_cambios_admin(request.user, pertenencia, antes)
+
+
+@admin.register(PermisoEfectivo)
+class PermisoEfectivoAdmin(admin.ModelAdmin):
+    """
+    Vista de solo lectura de la tabla desnormalizada de permisos.
+    Se mantiene sola (señales); sirve para auditar "qué puede hacer" cada usuario.
+    """
+    list_display = ('usuario', 'empresa', 'permiso')
+    list_filter = ('empresa',)
+    search_fields = ('usuario__username', 'permiso')
+    list_select_related = ('usuario', 'empresa')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(IndicePermiso)
+class IndicePermisoAdmin(admin.ModelAdmin):
+    """Registro de bits del Pasaporte compacto. Solo lectura: un bit jamás se reasigna."""
+    list_display = ('bit', 'permiso')
+    search_fields = ('permiso',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 
 # ==============================================================================
 # 5. AUDITORÍA Y SEGURIDAD
@@ -126,10 +201,28 @@ class HistorialAdmin(admin.ModelAdmin):
     """
     list_display = ('fecha', 'actor', 'usuario_afectado', 'accion')
     list_filter = ('accion', 'fecha')
-    search_fields = ('actor__username', 'usuario_afectado__username', 'detalle')
+    list_select_related = ('actor', 'usuario_afectado')
+    search_fields = ('detalle',)  # Solo para mostrar la caja; la búsqueda real es get_search_results
+    show_full_result_count = False  # Evita un COUNT(*) de toda la tabla en cada búsqueda
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Username exacto (actor o afectado) o texto del detalle con el índice de
+        texto completo: un icontains sobre 'detalle' recorrería toda la tabla.
+        """
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        ids = list(User.objects.filter(username=search_term).values_list('pk', flat=True))
+        queryset = queryset.annotate(vector_detalle=VECTOR_DETALLE).filter(
+            Q(actor_id__in=ids)
+            | Q(usuario_afectado_id__in=ids)
+            | Q(vector_detalle=SearchQuery(search_term, config='simple', search_type='websearch'))
+        )
+        return queryset, False
     
     # Todos los campos son de solo lectura para preservar la evidencia
-    readonly_fields = ('fecha', 'actor', 'usuario_afectado', 'accion', 'detalle')
+    readonly_fields = ('fecha', 'actor', 'usuario_afectado', 'accion', 'detalle', 'datos')
     
     def has_add_permission(self, request):
         return False  # Bloquea el botón "Agregar"
@@ -165,4 +258,47 @@ class UserAdmin(BaseUserAdmin):
 
 # Aplicamos el cambio
 admin.site.unregister(User)
-admin.site.register(User, UserAdmin)
\ No newline at end of file
+admin.site.register(User, UserAdmin)
+
+
+# ==============================================================================
+# 7. INFRAESTRUCTURA (BANDEJAS DE SALIDA: CORREOS Y WEBHOOKS)
+# ==============================================================================
+@admin.register(CorreoPendiente)
+class CorreoPendienteAdmin(admin.ModelAdmin):
+    """
+    Monitoreo de la cola de correos. Los envía el worker 'run_mail_worker'.
+    Solo lectura: el contenido puede incluir enlaces de recuperación.
+    """
+    list_display = ('creado', 'destinatario', 'asunto', 'estado', 'intentos', 'proximo_intento')
+    list_filter = ('estado',)
+    search_fields = ('destinatario',)
+    exclude = ('cuerpo',)
+    readonly_fields = ('destinatario', 'asunto', 'estado', 'intentos', 'proximo_intento', 'ultimo_error', 'creado', 'enviado_en')
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(SuscriptorWebhook)
+class SuscriptorWebhookAdmin(admin.ModelAdmin):
+    """
+    Apps satélite que reciben los eventos de permisos ('run_webhook_worker').
+    El estado de reintento se ve aquí: un suscriptor caído retiene su cola.
+    """
+    list_display = ('nombre', 'url', 'activo', 'fallos_consecutivos', 'proximo_intento')
+    list_filter = ('activo',)
+    search_fields = ('nombre', 'url')
+    readonly_fields = ('fallos_consecutivos', 'ultimo_error')
+
+
+@admin.register(EntregaWebhook)
+class EntregaWebhookAdmin(admin.ModelAdmin):
+    """Monitoreo de la cola de eventos por suscriptor. Solo lectura."""
+    list_display = ('id', 'creado', 'suscriptor', 'tipo', 'estado', 'intentos', 'entregado_en')
+    list_filter = ('estado', 'tipo', 'suscriptor')
+    list_select_related = ('suscriptor',)
+    readonly_fields = ('suscriptor', 'tipo', 'datos', 'estado', 'intentos', 'creado', 'entregado_en')
+
+    def has_add_permission(self, request):
+        return False
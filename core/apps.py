@@ -4,3 +4,19 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from django.conf import settings
+
+        from .conexiones import instalar_contador
+        from .metricas import instalar_medicion_bd
+
+        # Métricas de conexiones nuevas a la BD (ver /api/bd/estadisticas/)
+        instalar_contador()
+        # Consultas y tiempo en BD por petición (ver core/metricas.py)
+        instalar_medicion_bd()
+
+        # Firma asimétrica: SimpleJWT firma/verifica con las llaves en disco
+        if settings.JWT_FIRMA != 'HS256':
+            from .firmas import instalar_backend_rotativo
+            instalar_backend_rotativo()
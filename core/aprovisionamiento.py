@@ -0,0 +1,62 @@
+"""
+CORE APROVISIONAMIENTO - ALTA MASIVA DE USUARIOS
+------------------------------------------------
+User.objects.bulk_create() NO dispara post_save, así que la señal
+crear_perfil_usuario no corre y el usuario queda SIN PerfilUsuario: el cambio
+de clave obligatorio del primer ingreso se salta en silencio.
+
+Toda alta masiva de usuarios debe pasar por crear_usuarios_en_bloque(): dos
+INSERT masivos (Users y luego sus Perfiles) en una sola transacción.
+Para reparar usuarios ya creados sin perfil: 'manage.py reparar_perfiles_usuario'.
+"""
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .models import PerfilUsuario
+
+
+def crear_usuarios_en_bloque(usuarios, debe_cambiar_password=True, batch_size=None):
+    """
+    Inserta 'usuarios' (instancias de User sin guardar) y sus PerfilUsuario.
+
+    - La clave debe venir ya hasheada (user.set_password) o vacía: las vacías
+      quedan sin clave utilizable (el usuario entra por "Olvidé mi contraseña").
+    - batch_size=None: una sentencia por tabla. Devuelve la lista con los PK asignados.
+    """
+    usuarios = list(usuarios)
+    if not usuarios:
+        return usuarios
+
+    inutilizable = None
+    for usuario in usuarios:
+        if not usuario.password:
+            # Un solo hash "inutilizable" para todo el lote (no cuesta un PBKDF2)
+            inutilizable = inutilizable or make_password(None)
+            usuario.password = inutilizable
+
+    with transaction.atomic():
+        User.objects.bulk_create(usuarios, batch_size=batch_size)
+        PerfilUsuario.objects.bulk_create(
+            [PerfilUsuario(usuario_id=u.pk, debe_cambiar_password=debe_cambiar_password) for u in usuarios],
+            batch_size=batch_size,
+        )
+    return usuarios
+
+
+def usuarios_sin_perfil():
+    """Usuarios sin PerfilUsuario: un LEFT JOIN ... WHERE perfil IS NULL (anti-join)."""
+    return User.objects.filter(perfil_usuario__isnull=True)
+
+
+def reparar_perfiles(debe_cambiar_password=True, batch_size=None):
+    """Crea el PerfilUsuario faltante de cada usuario. Devuelve los IDs reparados."""
+    with transaction.atomic():
+        ids = list(usuarios_sin_perfil().values_list('pk', flat=True))
+        PerfilUsuario.objects.bulk_create(
+            [PerfilUsuario(usuario_id=pk, debe_cambiar_password=debe_cambiar_password) for pk in ids],
+            batch_size=batch_size,
+            ignore_conflicts=True,  # Por si la señal lo creó en paralelo
+        )
+    return ids
@@ -0,0 +1,85 @@
+"""
+CORE ARRANQUE - HUELLA DE DESPLIEGUE Y ESTADO DEL ESQUEMA
+---------------------------------------------------------
+Cada arranque del contenedor corría 'migrate' completo (carga el grafo de
+migraciones y dispara post_migrate en todas las apps) aunque nada hubiera
+cambiado. Ahora:
+
+1. calcular_huella(): sha256 de los archivos de migración de TODAS las apps
+   instaladas + los permisos que declaran los modelos fantasma.
+2. 'manage.py preparar_arranque' la compara con la guardada (HuellaArranque):
+   si coincide, no hay nada que aplicar y el contenedor pasa directo a Gunicorn.
+3. migraciones_pendientes(): lo que revisa /readyz (core/middleware.py).
+
+Los estáticos ya no se recolectan al arrancar: se hace al construir la imagen.
+"""
+
+import hashlib
+import os
+from importlib import import_module
+from importlib.util import find_spec
+
+from django.apps import apps
+from django.db import DatabaseError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.migrations.loader import MigrationLoader
+
+from .models import HuellaArranque
+from .sincronizacion import contenedores_de_permisos, permisos_declarados
+
+COMPONENTE_ESQUEMA = 'esquema'
+
+
+# ==============================================================================
+# 1. HUELLA
+# ==============================================================================
+
+def _archivos_de_migracion():
+    """(app_label, nombre, ruta) de cada archivo de migración, en orden estable."""
+    archivos = []
+    for app_config in apps.get_app_configs():
+        modulo, _ = MigrationLoader.migrations_module(app_config.label)
+        if modulo is None or find_spec(modulo) is None:
+            continue
+        paquete = import_module(modulo)
+        for directorio in getattr(paquete, '__path__', []):
+            for nombre in sorted(os.listdir(directorio)):
+                if nombre.endswith('.py') and nombre != '__init__.py':
+                    archivos.append((app_config.label, nombre, os.path.join(directorio, nombre)))
+    return archivos
+
+
+def calcular_huella():
+    """sha256 (hex) de migraciones + permisos declarados. Solo lee disco: no toca la BD."""
+    huella = hashlib.sha256()
+    for app_label, nombre, ruta in _archivos_de_migracion():
+        huella.update(f"{app_label}/{nombre}\0".encode())
+        with open(ruta, 'rb') as archivo:
+            huella.update(archivo.read())
+    for modelo in contenedores_de_permisos():
+        for codename, nombre in sorted(permisos_declarados(modelo).items()):
+            huella.update(f"{modelo._meta.label}.{codename}={nombre}\0".encode())
+    return huella.hexdigest()
+
+
+def huella_guardada():
+    """Huella del último arranque preparado, o None (también si la tabla aún no existe)."""
+    try:
+        return HuellaArranque.objects.filter(componente=COMPONENTE_ESQUEMA).values_list('huella', flat=True).first()
+    except DatabaseError:
+        return None
+
+
+def guardar_huella(huella):
+    HuellaArranque.objects.update_or_create(componente=COMPONENTE_ESQUEMA, defaults={'huella': huella})
+
+
+# ==============================================================================
+# 2. ESTADO DEL ESQUEMA (READINESS)
+# ==============================================================================
+
+def migraciones_pendientes():
+    """Migraciones del código que la BD aún no tiene (lista vacía = esquema al día)."""
+    executor = MigrationExecutor(connection)
+    plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+    return [f"{migracion.app_label}.{migracion.name}" for migracion, _ in plan]
@@ -0,0 +1,175 @@
+"""
+CORE AUDITORÍA - EVENTOS ESTRUCTURADOS Y ESCRITURA EN LOTES
+-----------------------------------------------------------
+1. registrar_evento(): lo que usan las vistas. Arma el evento (campos JSON
+   para acción, permiso y empresa) y lo INSERTA en la transacción del
+   cambio: si el cambio se revierte, el evento también; si confirma, el
+   evento ya está escrito. Sin buffers en memoria que un SIGKILL, un
+   timeout del worker o un reciclaje puedan perder.
+   registrar_eventos() hace lo mismo con un lote en UN bulk_create
+   (core/delegacion.py): una escritura por operación, no por evento.
+2. exportar_eventos(): streaming JSONL para el SIEM ('manage.py export_auditoria').
+3. consultar_eventos(): lo que usa /api/auditoria/. Paginación por cursor
+   sobre (fecha, id) y filtros que caen en los índices compuestos del modelo.
+"""
+
+import base64
+import binascii
+import json
+
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.search import SearchQuery, SearchVector
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import HistorialCambiosRol
+
+
+# ==============================================================================
+# 1. API DE EVENTOS
+# ==============================================================================
+
+def construir_evento(actor, usuario_afectado, accion, detalle='', empresa=None, permiso=None, **extra):
+    """HistorialCambiosRol SIN guardar. 'extra' se agrega tal cual a los datos JSON."""
+    datos = {'accion': accion}
+    if permiso is not None:
+        if type(permiso).content_type.is_cached(permiso):  # Ya viene con select_related (lotes)
+            app_label = permiso.content_type.app_label
+        else:
+            app_label = ContentType.objects.get_for_id(permiso.content_type_id).app_label  # Caché de Django
+        datos['permiso'] = f"{app_label}.{permiso.codename}"
+    if empresa is not None:
+        datos['empresa'] = empresa.codigo
+        datos['empresa_id'] = empresa.pk
+    datos.update(extra)
+
+    return HistorialCambiosRol(
+        fecha=timezone.now(),
+        actor_id=getattr(actor, 'pk', actor),
+        usuario_afectado_id=getattr(usuario_afectado, 'pk', usuario_afectado),
+        accion=accion,
+        detalle=detalle,
+        datos=datos,
+    )
+
+
+def registrar_evento(actor, usuario_afectado, accion, detalle='', empresa=None, permiso=None, **extra):
+    """Escribe un evento de auditoría dentro de la transacción actual."""
+    evento = construir_evento(actor, usuario_afectado, accion, detalle, empresa, permiso, **extra)
+    evento.save(force_insert=True)
+    return evento
+
+
+def registrar_eventos(eventos):
+    """Varios eventos ya construidos (construir_evento) en un solo bulk_create, en la transacción actual."""
+    eventos = list(eventos)
+    if eventos:
+        HistorialCambiosRol.objects.bulk_create(eventos, batch_size=1000)
+    return eventos
+
+
+# ==============================================================================
+# 2. EXPORTACIÓN (SIEM)
+# ==============================================================================
+
+def exportar_eventos(salida, desde=None, hasta=None, desde_id=None, tamano_lote=2000):
+    """
+    Escribe los eventos como JSONL (uno por línea) en orden de 'id' y devuelve
+    (total, ultimo_id). 'desde'/'hasta' filtran por fecha (usa el índice BRIN);
+    'desde_id' permite exportaciones incrementales (solo lo posterior a la última).
+    """
+    consulta = HistorialCambiosRol.objects.all()
+    if desde is not None:
+        consulta = consulta.filter(fecha__gte=desde)
+    if hasta is not None:
+        consulta = consulta.filter(fecha__lt=hasta)
+
+    total, ultimo_id = 0, desde_id or 0
+    campos = ('id', 'fecha', 'actor__username', 'usuario_afectado__username', 'accion', 'detalle', 'datos')
+    while True:
+        # Paginación por clave (id > último): cada consulta cuesta lo mismo en toda la tabla
+        lote = list(consulta.filter(id__gt=ultimo_id).order_by('id').values_list(*campos)[:tamano_lote])
+        if not lote:
+            break
+        salida.write(''.join(
+            json.dumps({
+                'id': pk,
+                'fecha': fecha.isoformat(),
+                'actor': actor,
+                'usuario_afectado': afectado,
+                'accion': accion,
+                'detalle': detalle,
+                'datos': datos,
+            }, ensure_ascii=False) + '\n'
+            for pk, fecha, actor, afectado, accion, detalle, datos in lote
+        ))
+        total += len(lote)
+        ultimo_id = lote[-1][0]
+    return total, ultimo_id
+
+
+# ==============================================================================
+# 3. CONSULTA PAGINADA (API)
+# ==============================================================================
+
+# Misma expresión que el GinIndex 'core_historial_detalle_fts' (si no, Postgres no lo usa).
+# Config 'simple': sin stemming, el detalle es casi todo usernames y codenames.
+VECTOR_DETALLE = SearchVector('detalle', config='simple')
+
+CAMPOS_EVENTO = ('id', 'fecha', 'actor_id', 'actor__username', 'usuario_afectado_id',
+                 'usuario_afectado__username', 'accion', 'detalle', 'datos')
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def codificar_cursor(fecha, pk):
+    return base64.urlsafe_b64encode(f"{fecha.isoformat()}|{pk}".encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    try:
+        texto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        fecha, pk = texto.rsplit('|', 1)
+        fecha = parse_datetime(fecha)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+        raise CursorInvalido(str(exc))
+    if fecha is None:
+        raise CursorInvalido("fecha inválida")
+    return fecha, pk
+
+
+def consultar_eventos(actor_id=None, usuario_id=None, desde=None, hasta=None, texto=None, cursor=None, limite=50):
+    """
+    Una página de eventos, del más nuevo al más viejo. Devuelve (filas, siguiente_cursor).
+
+    Keyset: la página siguiente pide (fecha, id) < último visto. Se recorre el
+    índice desde ese punto, así la página 1.000 cuesta lo mismo que la primera
+    (con OFFSET Postgres tendría que leer y descartar todas las anteriores).
+    """
+    consulta = HistorialCambiosRol.objects.all()
+    if actor_id is not None:
+        consulta = consulta.filter(actor_id=actor_id)
+    if usuario_id is not None:
+        consulta = consulta.filter(usuario_afectado_id=usuario_id)
+    if desde is not None:
+        consulta = consulta.filter(fecha__gte=desde)
+    if hasta is not None:
+        consulta = consulta.filter(fecha__lt=hasta)
+    if texto:
+        consulta = consulta.annotate(vector_detalle=VECTOR_DETALLE).filter(
+            vector_detalle=SearchQuery(texto, config='simple', search_type='websearch')
+        )
+    if cursor is not None:
+        fecha, pk = decodificar_cursor(cursor)
+        # (fecha, id) < (f, pk): el 'fecha <= f' acota el recorrido del índice
+        consulta = consulta.filter(fecha__lte=fecha).exclude(fecha=fecha, id__gte=pk)
+
+    filas = list(consulta.order_by('-fecha', '-id').values(*CAMPOS_EVENTO)[:limite + 1])
+    siguiente = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        siguiente = codificar_cursor(filas[-1]['fecha'], filas[-1]['id'])
+    return filas, siguiente
@@ -0,0 +1,171 @@
+"""
+CORE AUTENTICACIÓN - LOGIN CON VERIFICACIÓN DE CLAVE ACOTADA
+------------------------------------------------------------
+Durante la tormenta de logins de las 8:00 AM, casi todo el CPU se va en el
+hash de la contraseña (PBKDF2/Scrypt/Argon2). Este módulo saca ese cálculo a
+un pool de hilos ACOTADO, con una cola de espera limitada:
+
+1. Si hay cupo: el hash corre en el pool (hashlib libera el GIL).
+2. Si la cola está llena: se lanza LoginSaturadoError de inmediato y la vista
+   responde 503 + Retry-After, en lugar de bloquear a todos los workers.
+3. Re-hash transparente: si la clave usa un hasher/parámetros viejos, se
+   actualiza al hasher preferido (ver core/hashers.py) tras un login exitoso.
+
+Las consultas a la BD siguen en el hilo de la petición; el pool solo calcula.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturoTimeoutError
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import make_password, verify_password
+
+from .metricas import anotar_hash
+
+UserModel = get_user_model()
+
+
+class LoginSaturadoError(Exception):
+    """El pool de verificación de claves no tiene cupo: reintentar más tarde."""
+
+
+# ==============================================================================
+# 1. POOL ACOTADO DE HASHING
+# ==============================================================================
+# Se crea de forma perezosa (en el primer login) para que cada proceso
+# worker tenga el suyo, incluso si Gunicorn hace fork desde un master precargado.
+_pool = None
+_cupos = None
+_candado = threading.Lock()
+
+
+def _obtener_pool():
+    global _pool, _cupos
+    if _pool is None:
+        with _candado:
+            if _pool is None:
+                hilos = settings.LOGIN_HASH_WORKERS
+                # Cupos = hilos ejecutando + peticiones esperando en cola
+                _cupos = threading.BoundedSemaphore(hilos + settings.LOGIN_HASH_COLA_MAX)
+                _pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='login-hash')
+    return _pool, _cupos
+
+
+def enviar_hash(funcion, *args):
+    """
+    Encola 'funcion(*args)' en el pool y devuelve el Future.
+    Lanza LoginSaturadoError sin esperar si no hay cupo.
+    """
+    pool, cupos = _obtener_pool()
+    if not cupos.acquire(blocking=False):
+        raise LoginSaturadoError()
+    try:
+        futuro = pool.submit(funcion, *args)
+    except BaseException:
+        cupos.release()
+        raise
+    # El cupo se libera cuando el hash TERMINA, no cuando el cliente se rinde
+    futuro.add_done_callback(lambda _: cupos.release())
+    return futuro
+
+
+def ejecutar_hash(funcion, *args):
+    """Versión bloqueante de enviar_hash() con el timeout de LOGIN_HASH_TIMEOUT."""
+    inicio = time.perf_counter()
+    futuro = enviar_hash(funcion, *args)
+    try:
+        return futuro.result(timeout=settings.LOGIN_HASH_TIMEOUT)
+    except FuturoTimeoutError:
+        raise LoginSaturadoError()
+    finally:
+        # Incluye la espera en la cola: es lo que paga la petición (core/metricas.py)
+        anotar_hash(time.perf_counter() - inicio)
+
+
+async def aejecutar_hash(funcion, *args):
+    """Versión asíncrona de ejecutar_hash() para las vistas ASGI."""
+    inicio = time.perf_counter()
+    futuro = enviar_hash(funcion, *args)
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(futuro), settings.LOGIN_HASH_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise LoginSaturadoError()
+    finally:
+        anotar_hash(time.perf_counter() - inicio)
+
+
+# ==============================================================================
+# 2. BACKEND DE AUTENTICACIÓN
+# ==============================================================================
+
+class BackendLoginAcotado(ModelBackend):
+    """
+    Igual que ModelBackend, pero el cálculo del hash pasa por el pool acotado.
+    Configurado en settings.AUTHENTICATION_BACKENDS.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Igualamos el tiempo de respuesta de un usuario inexistente (#20760)
+            ejecutar_hash(make_password, password)
+            return None
+
+        correcta, actualizar = ejecutar_hash(verify_password, password, user.password)
+
+        if correcta and actualizar:
+            self.actualizar_hash(user, password)
+
+        if correcta and self.user_can_authenticate(user):
+            return user
+        return None
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        """Versión ASGI: el event loop espera el Future del pool sin bloquear un hilo."""
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        try:
+            user = await UserModel._default_manager.aget_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            await aejecutar_hash(make_password, password)
+            return None
+
+        correcta, actualizar = await aejecutar_hash(verify_password, password, user.password)
+
+        if correcta and actualizar:
+            try:
+                user.password = await aejecutar_hash(make_password, password)
+            except LoginSaturadoError:
+                pass
+            else:
+                await user.asave(update_fields=['password'])
+
+        if correcta and self.user_can_authenticate(user):
+            return user
+        return None
+
+    @staticmethod
+    def actualizar_hash(user, password):
+        """
+        Re-hash al hasher preferido (PASSWORD_HASHERS[0]).
+        Si el pool está saturado lo dejamos para el próximo login: no vale la
+        pena rechazar a un usuario cuya clave ya fue verificada.
+        """
+        try:
+            user.password = ejecutar_hash(make_password, password)
+        except LoginSaturadoError:
+            return
+        user.save(update_fields=['password'])
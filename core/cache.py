@@ -0,0 +1,220 @@
+"""
+CORE CACHE - CACHÉ DE DOS NIVELES (LOCAL + COMPARTIDO)
+------------------------------------------------------
+Backend de caché de Django con dos capas:
+
+1. LOCAL (en el proceso): un LRU acotado con TTL corto. Responde sin red
+   las claves más calientes (versión global de permisos, Pasaportes
+   recién calculados, etc.).
+2. COMPARTIDO: otro alias de CACHES (Redis/Valkey en producción, LocMem
+   como sustituto local sin servidor). Es la fuente de verdad entre workers.
+
+Las escrituras van a las dos capas. Una escritura en un worker NO borra la
+copia local de los demás: pueden ver el valor anterior hasta TTL_LOCAL
+segundos. Por eso los contadores (incr/decr, throttling) saltan la capa
+local y usan directamente el alias compartido (ver core/throttling.py).
+
+Configuración (settings.CACHES):
+    'default': {
+        'BACKEND': 'core.cache.CacheDosNiveles',
+        'OPTIONS': {'COMPARTIDO': 'compartido', 'MAX_ENTRADAS': 1000, 'TTL_LOCAL': 5},
+    }
+"""
+
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from .metricas import anotar_cache
+
+
+class CacheDosNiveles(BaseCache):
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        opciones = params.get('OPTIONS', {})
+        self.alias_compartido = opciones.get('COMPARTIDO', 'compartido')
+        self.max_entradas = int(opciones.get('MAX_ENTRADAS', 1000))
+        self.ttl_local = float(opciones.get('TTL_LOCAL', 5))
+
+        self._local = OrderedDict()  # clave -> (expira_monotonic, valor serializado)
+        self._candado = threading.Lock()
+        self._estadisticas = dict.fromkeys(
+            ('aciertos_local', 'aciertos_compartido', 'fallos', 'escrituras', 'desalojos'), 0
+        )
+
+    @property
+    def compartido(self):
+        return caches[self.alias_compartido]
+
+    # --------------------------------------------------------------------------
+    # CAPA LOCAL (LRU + TTL)
+    # --------------------------------------------------------------------------
+    def _clave_local(self, key, version):
+        return self.make_and_validate_key(key, version=version)
+
+    def _leer_local(self, clave):
+        with self._candado:
+            entrada = self._local.get(clave)
+            if entrada is None:
+                return False, None
+            if entrada[0] < time.monotonic():
+                del self._local[clave]
+                return False, None
+            self._local.move_to_end(clave)
+            self._estadisticas['aciertos_local'] += 1
+        anotar_cache('acierto_local')
+        # Se guarda serializado (como LocMem) para que nadie mute el valor cacheado
+        return True, pickle.loads(entrada[1])
+
+    def _guardar_local(self, clave, valor, timeout=DEFAULT_TIMEOUT):
+        if not self.max_entradas:
+            return
+        ttl = self.ttl_local
+        if timeout is not DEFAULT_TIMEOUT and timeout is not None:
+            if timeout <= 0:
+                self._borrar_local(clave)
+                return
+            ttl = min(ttl, timeout)
+        serializado = pickle.dumps(valor, pickle.HIGHEST_PROTOCOL)
+        with self._candado:
+            self._local[clave] = (time.monotonic() + ttl, serializado)
+            self._local.move_to_end(clave)
+            while len(self._local) > self.max_entradas:
+                self._local.popitem(last=False)
+                self._estadisticas['desalojos'] += 1
+
+    def _borrar_local(self, clave):
+        with self._candado:
+            self._local.pop(clave, None)
+
+    # --------------------------------------------------------------------------
+    # API DE CACHÉ DE DJANGO
+    # --------------------------------------------------------------------------
+    def get(self, key, default=None, version=None):
+        clave = self._clave_local(key, version)
+        encontrado, valor = self._leer_local(clave)
+        if encontrado:
+            return valor
+
+        faltante = object()
+        valor = self.compartido.get(key, faltante, version=version)
+        if valor is faltante:
+            self._estadisticas['fallos'] += 1
+            anotar_cache('fallo')
+            return default
+        self._estadisticas['aciertos_compartido'] += 1
+        anotar_cache('acierto_compartido')
+        self._guardar_local(clave, valor)
+        return valor
+
+    def get_many(self, keys, version=None):
+        resultado, pendientes = {}, []
+        for key in keys:
+            encontrado, valor = self._leer_local(self._clave_local(key, version))
+            if encontrado:
+                resultado[key] = valor
+            else:
+                pendientes.append(key)
+
+        if pendientes:
+            remotos = self.compartido.get_many(pendientes, version=version)
+            self._estadisticas['aciertos_compartido'] += len(remotos)
+            self._estadisticas['fallos'] += len(pendientes) - len(remotos)
+            anotar_cache('acierto_compartido', len(remotos))
+            anotar_cache('fallo', len(pendientes) - len(remotos))
+            for key, valor in remotos.items():
+                self._guardar_local(self._clave_local(key, version), valor)
+            resultado.update(remotos)
+        return resultado
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.compartido.set(key, value, timeout, version=version)
+        self._estadisticas['escrituras'] += 1
+        self._guardar_local(self._clave_local(key, version), value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        fallidas = self.compartido.set_many(data, timeout, version=version)
+        self._estadisticas['escrituras'] += len(data)
+        for key, value in data.items():
+            if key not in fallidas:
+                self._guardar_local(self._clave_local(key, version), value, timeout)
+        return fallidas
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        agregado = self.compartido.add(key, value, timeout, version=version)
+        if agregado:
+            self._estadisticas['escrituras'] += 1
+            self._guardar_local(self._clave_local(key, version), value, timeout)
+        return agregado
+
+    def delete(self, key, version=None):
+        self._borrar_local(self._clave_local(key, version))
+        return self.compartido.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self._borrar_local(self._clave_local(key, version))
+        self.compartido.delete_many(keys, version=version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._borrar_local(self._clave_local(key, version))
+        return self.compartido.touch(key, timeout, version=version)
+
+    def has_key(self, key, version=None):
+        encontrado, _ = self._leer_local(self._clave_local(key, version))
+        return encontrado or self.compartido.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        # Contador atómico: siempre en la capa compartida
+        self._borrar_local(self._clave_local(key, version))
+        return self.compartido.incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        self._borrar_local(self._clave_local(key, version))
+        return self.compartido.decr(key, delta, version=version)
+
+    def clear(self):
+        with self._candado:
+            self._local.clear()
+        self.compartido.clear()
+
+    def close(self, **kwargs):
+        self.compartido.close(**kwargs)
+
+    # --------------------------------------------------------------------------
+    # ESTADÍSTICAS (POR PROCESO)
+    # --------------------------------------------------------------------------
+    def estadisticas(self):
+        datos = dict(self._estadisticas)
+        lecturas = datos['aciertos_local'] + datos['aciertos_compartido'] + datos['fallos']
+        datos['entradas_local'] = len(self._local)
+        datos['max_entradas'] = self.max_entradas
+        datos['ttl_local'] = self.ttl_local
+        datos['tasa_acierto_local'] = round(datos['aciertos_local'] / lecturas, 4) if lecturas else None
+        datos['tasa_acierto_total'] = (
+            round((datos['aciertos_local'] + datos['aciertos_compartido']) / lecturas, 4) if lecturas else None
+        )
+        return datos
+
+
+def estadisticas_de_cache(alias):
+    """Estadísticas de un alias de CACHES (capa local y, si es Redis, del servidor)."""
+    cache = caches[alias]
+    datos = {'backend': f"{type(cache).__module__}.{type(cache).__qualname__}"}
+    if isinstance(cache, CacheDosNiveles):
+        datos['local'] = cache.estadisticas()
+        datos['compartido'] = estadisticas_de_cache(cache.alias_compartido)
+    elif hasattr(cache, '_cache') and hasattr(cache._cache, 'get_client'):
+        # django.core.cache.backends.redis.RedisCache
+        try:
+            info = cache._cache.get_client().info('stats')
+        except Exception as exc:
+            datos['error'] = f"{type(exc).__name__}: {exc}"
+        else:
+            datos['servidor'] = {campo: info.get(campo) for campo in ('keyspace_hits', 'keyspace_misses', 'evicted_keys', 'expired_keys')}
+    return datos
@@ -0,0 +1,74 @@
+"""
+CORE CONEXIONES - MÉTRICAS DE CONEXIONES A LA BASE DE DATOS
+-----------------------------------------------------------
+El modo se elige con DB_CONEXIONES en settings (persistentes / pool /
+pgbouncer / ninguna). Este módulo solo observa:
+
+1. Contador por proceso de conexiones NUEVAS (señal connection_created):
+   con conexiones persistentes o pool debe crecer poco y luego quedarse
+   quieto; si sube al ritmo de las peticiones, no se están reutilizando.
+2. Estadísticas del pool de psycopg 3 (tamaño, libres, peticiones en espera,
+   tiempo de espera acumulado). 'saturacion' ~ 1.0 y 'en_espera' > 0
+   significan que DB_POOL_MAX se quedó corto para la concurrencia del worker.
+"""
+
+import os
+import threading
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+_candado = threading.Lock()
+_conexiones_creadas = {}
+
+
+def _contar_conexion(sender, connection, **kwargs):
+    with _candado:
+        _conexiones_creadas[connection.alias] = _conexiones_creadas.get(connection.alias, 0) + 1
+
+
+def instalar_contador():
+    """Se llama una vez desde CoreConfig.ready()."""
+    connection_created.connect(_contar_conexion, dispatch_uid='core.conexiones.contador')
+
+
+def estadisticas_de_conexiones():
+    """{alias: {...}} del proceso actual (cada worker de Gunicorn tiene las suyas)."""
+    datos = {}
+    for alias in connections:
+        conexion = connections[alias]
+        info = {
+            'modo': settings.DB_CONEXIONES if alias == 'default' else None,
+            'conn_max_age': conexion.settings_dict.get('CONN_MAX_AGE'),
+            'health_checks': conexion.settings_dict.get('CONN_HEALTH_CHECKS'),
+            'conexiones_creadas': _conexiones_creadas.get(alias, 0),
+        }
+        pool = getattr(conexion, 'pool', None)
+        if pool is not None:
+            info['pool'] = estadisticas_de_pool(pool)
+        datos[alias] = info
+    return {'pid': os.getpid(), 'alias': datos}
+
+
+def estadisticas_de_pool(pool):
+    """Resumen de psycopg_pool.ConnectionPool.get_stats() con la saturación ya calculada."""
+    stats = pool.get_stats()
+    tamano = stats.get('pool_size', 0)
+    libres = stats.get('pool_available', 0)
+    return {
+        'min': stats.get('pool_min'),
+        'max': stats.get('pool_max'),
+        'tamano': tamano,
+        'libres': libres,
+        'en_uso': tamano - libres,
+        'saturacion': round((tamano - libres) / stats['pool_max'], 4) if stats.get('pool_max') else None,
+        'en_espera': stats.get('requests_waiting', 0),
+        # Acumulados desde el arranque del proceso
+        'peticiones': stats.get('requests_num', 0),
+        'peticiones_encoladas': stats.get('requests_queued', 0),
+        'espera_total_ms': stats.get('requests_wait_ms', 0),
+        'errores': stats.get('requests_errors', 0),
+        'conexiones_abiertas': stats.get('connections_num', 0),
+        'conexiones_perdidas': stats.get('connections_lost', 0),
+    }
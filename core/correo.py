@@ -0,0 +1,106 @@
+"""
+CORE CORREO - BANDEJA DE SALIDA Y ENVÍO EN LOTES
+------------------------------------------------
+1. encolar_correo(): lo que usan las vistas. Un INSERT y listo: la respuesta
+   HTTP ya no depende de la latencia del SMTP (Office 365 / SES), y el tiempo
+   de respuesta deja de revelar si un correo existe en el sistema.
+2. procesar_lote(): lo que usa 'manage.py run_mail_worker'. Toma un lote de
+   pendientes (con bloqueo SKIP LOCKED, así varios workers no se pisan), abre
+   UNA conexión SMTP, envía respetando el límite de tasa y agenda reintentos
+   con backoff exponencial para los que fallan.
+
+El backend real se define con EMAIL_BACKEND (SMTP, consola, archivo, memoria).
+"""
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import CorreoPendiente
+
+
+def encolar_correo(destinatario, asunto, cuerpo):
+    """Agrega un correo a la bandeja de salida. Costo: un INSERT."""
+    return CorreoPendiente.objects.create(destinatario=destinatario, asunto=asunto, cuerpo=cuerpo)
+
+
+def calcular_backoff(intentos):
+    """Espera antes del siguiente intento: base * 2^(intentos-1), con tope."""
+    segundos = settings.CORREO_BACKOFF_BASE * (2 ** max(intentos - 1, 0))
+    return timedelta(seconds=min(segundos, settings.CORREO_BACKOFF_MAXIMO))
+
+
+class LimitadorTasa:
+    """Espaciador simple: como máximo 'por_segundo' envíos por segundo (0 = sin límite)."""
+
+    def __init__(self, por_segundo):
+        self.intervalo = 1.0 / por_segundo if por_segundo else 0.0
+        self.siguiente = 0.0
+
+    def esperar(self):
+        if not self.intervalo:
+            return
+        ahora = time.monotonic()
+        if ahora < self.siguiente:
+            time.sleep(self.siguiente - ahora)
+            ahora = self.siguiente
+        self.siguiente = ahora + self.intervalo
+
+
+def procesar_lote(tamano=None, limitador=None):
+    """
+    Envía un lote de correos pendientes. Devuelve (enviados, fallidos).
+    Los correos del lote quedan bloqueados por esta transacción mientras se envían.
+    """
+    tamano = tamano or settings.CORREO_LOTE
+    limitador = limitador or LimitadorTasa(settings.CORREO_MAX_POR_SEGUNDO)
+    enviados = fallidos = 0
+
+    with transaction.atomic():
+        lote = list(
+            CorreoPendiente.objects.select_for_update(skip_locked=True)
+            .filter(estado=CorreoPendiente.Estado.PENDIENTE, proximo_intento__lte=timezone.now())
+            .order_by('proximo_intento', 'id')[:tamano]
+        )
+        if not lote:
+            return 0, 0
+
+        conexion = get_connection(fail_silently=False)
+        try:
+            for correo in lote:
+                limitador.esperar()
+                correo.intentos += 1
+                try:
+                    conexion.open()  # No-op si la conexión del lote sigue abierta
+                    conexion.send_messages([EmailMessage(
+                        subject=correo.asunto,
+                        body=correo.cuerpo,
+                        from_email=settings.DEFAULT_FROM_EMAIL,
+                        to=[correo.destinatario],
+                    )])
+                except Exception as exc:
+                    fallidos += 1
+                    correo.ultimo_error = f"{type(exc).__name__}: {exc}"[:2000]
+                    if correo.intentos >= settings.CORREO_MAX_INTENTOS:
+                        correo.estado = CorreoPendiente.Estado.FALLIDO
+                    else:
+                        correo.proximo_intento = timezone.now() + calcular_backoff(correo.intentos)
+                    # La conexión pudo quedar inservible: la próxima iteración reabre
+                    conexion.close()
+                else:
+                    enviados += 1
+                    correo.estado = CorreoPendiente.Estado.ENVIADO
+                    correo.enviado_en = timezone.now()
+                    correo.ultimo_error = ''
+        finally:
+            conexion.close()
+
+        CorreoPendiente.objects.bulk_update(
+            lote, ['estado', 'intentos', 'proximo_intento', 'ultimo_error', 'enviado_en']
+        )
+
+    return enviados, fallidos
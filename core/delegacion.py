@@ -0,0 +1,357 @@
+"""
+CORE DELEGACIÓN - PERMISOS DELEGADOS EN LOTE
+--------------------------------------------
+Un Gerente que habilita la temporada a 40 personas hacía 40 llamadas a
+/api/delegar-permiso/, cada una con sus consultas y su INSERT de auditoría.
+aplicar_delegaciones() procesa la lista completa con un número FIJO de
+consultas, sin importar cuántas operaciones traiga:
+
+1. El Jefe se valida UNA vez (vista).
+2. Pertenencias destino y Permisos se resuelven con '__in' (una consulta cada uno).
+3. Altas y bajas van directo a la tabla intermedia (ExcepcionPermiso): un
+   INSERT y un DELETE.
+4. Como las escrituras en bloque no disparan m2m_changed, PermisoEfectivo se
+   sincroniza a mano (una vez) y el caché se invalida subiendo la generación
+   de cada Pertenencia tocada con un solo set_many (invalidar_permisos_en_bloque).
+   Las bajas cortan los Pasaportes ya emitidos (core/revocacion.py).
+5. La auditoría se escribe en un bulk_create dentro de la transacción y los
+   avisos a las apps satélite se encolan igual (core/webhooks.py).
+
+Todo en una transacción. Cada operación tiene su resultado: 'aplicada',
+'sin_cambios' (ya estaba en ese estado) o 'rechazada' (con el motivo); las
+rechazadas no impiden aplicar las demás.
+
+Delegaciones TEMPORALES: un 'add' con 'vence_en' guarda el vencimiento en
+ExcepcionPermiso (volver a otorgar lo reemplaza; sin 'vence_en' queda
+permanente). vencer_delegaciones() revoca las vencidas en lotes; la corre
+'manage.py expire_delegations' cada minuto.
+
+Los cambios hechos en el inline del Admin (core/admin.py) pasan por
+registrar_cambios_admin(): mismas consecuencias que una delegación.
+"""
+
+from datetime import datetime
+
+from django.contrib.auth.models import Permission
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .auditoria import construir_evento, registrar_eventos
+from .models import ExcepcionPermiso, Pertenencia
+from .permisos import invalidar_permisos_en_bloque, sincronizar_permisos_efectivos
+from .revocacion import cortar_sesiones
+from .webhooks import encolar_eventos, evento_delegacion
+
+ACCIONES = ('add', 'remove')
+
+
+# ==============================================================================
+# 1. RESOLUCIÓN DE PERMISOS ("app.codename" O codename)
+# ==============================================================================
+
+def filtro_permiso(nombre):
+    """kwargs para buscar UN Permiso por "app.codename" o por codename solo."""
+    app_label, punto, codename = nombre.rpartition('.')
+    if punto:
+        return {'content_type__app_label': app_label, 'codename': codename}
+    return {'codename': codename}
+
+
+def resolver_permisos(nombres):
+    """
+    {nombre: Permission | mensaje de error} en UNA consulta. El codename solo
+    sirve si es único en el catálogo (si no, hay que calificarlo con la app).
+    """
+    codenames = {nombre.rpartition('.')[2] for nombre in nombres}
+    por_codename, por_nombre = {}, {}
+    for permiso in Permission.objects.select_related('content_type').filter(codename__in=codenames):
+        por_codename.setdefault(permiso.codename, []).append(permiso)
+        por_nombre[f"{permiso.content_type.app_label}.{permiso.codename}"] = permiso
+
+    resueltos = {}
+    for nombre in nombres:
+        if '.' in nombre:
+            resueltos[nombre] = por_nombre.get(nombre, f"El permiso '{nombre}' no existe")
+            continue
+        candidatos = por_codename.get(nombre, [])
+        if len(candidatos) == 1:
+            resueltos[nombre] = candidatos[0]
+        elif candidatos:
+            resueltos[nombre] = f"El permiso '{nombre}' es ambiguo: usar 'app.codename'"
+        else:
+            resueltos[nombre] = f"El permiso '{nombre}' no existe"
+    return resueltos
+
+
+def interpretar_vencimiento(valor, ahora=None):
+    """(datetime | None, None) o (None, mensaje). Acepta ISO 8601; sin zona = hora local del Hub."""
+    if valor in (None, ''):
+        return None, None
+    try:
+        vence_en = valor if isinstance(valor, datetime) else parse_datetime(str(valor))
+    except ValueError:  # Bien formado pero imposible (ej: 30 de febrero)
+        vence_en = None
+    if vence_en is None:
+        return None, "vence_en inválido: usar ISO 8601 (ej: 2026-12-31T18:00:00-05:00)"
+    if timezone.is_naive(vence_en):
+        vence_en = timezone.make_aware(vence_en)
+    if vence_en <= (ahora or timezone.now()):
+        return None, "vence_en debe ser futuro"
+    return vence_en, None
+
+
+# ==============================================================================
+# 2. APLICACIÓN EN LOTE
+# ==============================================================================
+
+def _normalizar(operacion, ahora):
+    """(usuario_id, nombre_permiso, accion, vence_en) o un mensaje de error."""
+    if not isinstance(operacion, dict):
+        return "Cada operación debe ser un objeto"
+    usuario_id = operacion.get('usuario_destino_id')
+    nombre = operacion.get('permiso') or operacion.get('permiso_codename')
+    accion = operacion.get('accion')
+    if not all([usuario_id, nombre, accion]):
+        return "Faltan datos obligatorios"
+    if accion not in ACCIONES:
+        return "Acción inválida"
+    try:
+        usuario_id = int(usuario_id)
+    except (TypeError, ValueError):
+        return "usuario_destino_id inválido"
+    vence_en, error = interpretar_vencimiento(operacion.get('vence_en'), ahora)
+    if error:
+        return error
+    if vence_en and accion != 'add':
+        return "vence_en solo aplica a 'add'"
+    return usuario_id, str(nombre), accion, vence_en
+
+
+@transaction.atomic
+def aplicar_delegaciones(actor, pertenencia_jefe, operaciones):
+    """
+    Aplica 'operaciones' ([{usuario_destino_id, permiso, accion}, ...]) en la
+    empresa de 'pertenencia_jefe' (ya validada como gerencial, con
+    select_related('empresa', 'grupo__perfil')). Devuelve un resultado por operación.
+    """
+    empresa = pertenencia_jefe.empresa
+    area_id = pertenencia_jefe.grupo.perfil.area_id
+    resultados = [{'indice': i} for i in range(len(operaciones))]
+    ahora = timezone.now()
+
+    normalizadas = {}
+    for i, operacion in enumerate(operaciones):
+        valor = _normalizar(operacion, ahora)
+        if isinstance(valor, str):
+            resultados[i].update(estado='rechazada', error=valor)
+        else:
+            normalizadas[i] = valor
+
+    # Destinos y permisos: una consulta cada uno
+    destinos = {
+        p.usuario_id: p
+        for p in Pertenencia.objects.select_related('grupo__perfil').filter(
+            empresa=empresa, usuario_id__in={u for u, _, _, _ in normalizadas.values()}
+        )
+    }
+    permisos = resolver_permisos({n for _, n, _, _ in normalizadas.values()})
+
+    # Validación por operación (Territorio, permiso, duplicados)
+    validas, vistas = {}, set()
+    for i, (usuario_id, nombre, accion, vence_en) in normalizadas.items():
+        pertenencia, permiso = destinos.get(usuario_id), permisos[nombre]
+        if pertenencia is None:
+            error = "El usuario no pertenece a esta empresa"
+        elif getattr(pertenencia.grupo, 'perfil', None) is None or pertenencia.grupo.perfil.area_id != area_id:
+            error = "Conflicto de Área: Solo puedes gestionar personal de tu departamento."
+        elif isinstance(permiso, str):
+            error = permiso
+        elif (pertenencia.pk, permiso.pk) in vistas:
+            error = "Operación repetida en el lote para el mismo usuario y permiso"
+        else:
+            vistas.add((pertenencia.pk, permiso.pk))
+            validas[i] = (pertenencia, permiso, accion, vence_en)
+            continue
+        resultados[i].update(estado='rechazada', error=error)
+
+    if not validas:
+        return resultados
+
+    # Estado actual de las excepciones involucradas: una consulta
+    actuales = {
+        (pertenencia_id, permiso_id): (pk, vence_en)
+        for pk, pertenencia_id, permiso_id, vence_en in ExcepcionPermiso.objects.filter(
+            pertenencia_id__in={p.pk for p, _, _, _ in validas.values()},
+            permission_id__in={q.pk for _, q, _, _ in validas.values()},
+        ).values_list('pk', 'pertenencia_id', 'permission_id', 'vence_en')
+    }
+
+    altas, bajas, renovadas, eventos, tocadas, revocados = [], [], [], [], {}, set()
+    avisos = []
+    for i, (pertenencia, permiso, accion, vence_en) in validas.items():
+        clave = (pertenencia.pk, permiso.pk)
+        actual = actuales.get(clave)
+        if accion == 'add' and actual is not None and actual[1] != vence_en:
+            # Ya la tenía: solo cambia el vencimiento (los permisos efectivos no cambian)
+            renovadas.append(ExcepcionPermiso(pk=actual[0], vence_en=vence_en))
+            detalle = f"Vencimiento de '{permiso.codename}' ACTUALIZADO por {actor.username}"
+        elif (accion == 'add') == (actual is not None):
+            resultados[i].update(estado='sin_cambios')
+            continue
+        elif accion == 'add':
+            altas.append(ExcepcionPermiso(
+                pertenencia_id=pertenencia.pk, permission_id=permiso.pk, vence_en=vence_en, otorgada_por_id=actor.pk,
+            ))
+            detalle = f"Permiso '{permiso.codename}' OTORGADO por {actor.username}"
+            tocadas[pertenencia.pk] = (pertenencia.usuario_id, pertenencia.empresa_id)
+        else:
+            bajas.append(actual[0])
+            revocados.add((pertenencia.usuario_id, pertenencia.empresa_id))
+            detalle = f"Permiso '{permiso.codename}' REVOCADO por {actor.username}"
+            tocadas[pertenencia.pk] = (pertenencia.usuario_id, pertenencia.empresa_id)
+
+        resultados[i].update(estado='aplicada', detalle=detalle)
+        eventos.append(construir_evento(
+            actor, pertenencia.usuario_id, f"Delegación ({accion})",
+            detalle=f"{detalle} en empresa {empresa.codigo}",
+            empresa=empresa, permiso=permiso,
+            operacion=accion, pertenencia_id=pertenencia.pk, lote=True,
+            vence_en=vence_en.isoformat() if vence_en else None,
+        ))
+        avisos.append(evento_delegacion(pertenencia.usuario_id, empresa, permiso, accion, vence_en))
+
+    if altas:
+        ExcepcionPermiso.objects.bulk_create(altas, ignore_conflicts=True)
+    if bajas:
+        ExcepcionPermiso.objects.filter(pk__in=bajas).delete()
+    if renovadas:
+        ExcepcionPermiso.objects.bulk_update(renovadas, ['vence_en'])
+    _propagar(tocadas, revocados, eventos, avisos)
+    return resultados
+
+
+def _propagar(tocadas, revocados, eventos, avisos):
+    """
+    Lo que m2m_changed no hace por las escrituras directas a ExcepcionPermiso:
+    sincroniza PermisoEfectivo de 'tocadas' ({pertenencia_id: (usuario_id, empresa_id)}),
+    invalida su caché, corta los Pasaportes de 'revocados', audita y encola los webhooks.
+    """
+    if tocadas:
+        sincronizar_permisos_efectivos(tocadas)
+        invalidar_permisos_en_bloque(tocadas.values())
+    if revocados:
+        cortar_sesiones(revocados)
+    registrar_eventos(eventos)
+    encolar_eventos(avisos)
+
+
+# ==============================================================================
+# 3. VENCIMIENTO DE DELEGACIONES TEMPORALES
+# ==============================================================================
+
+def vencer_delegaciones(ahora=None, tamano_lote=2000):
+    """
+    Revoca las excepciones con vence_en <= ahora y devuelve cuántas revocó.
+
+    Cada lote es una transacción: toma las vencidas por el índice parcial
+    (FOR UPDATE SKIP LOCKED: dos workers a la vez no se pisan), las borra con
+    un DELETE, sincroniza PermisoEfectivo, invalida el caché, corta los
+    Pasaportes ya emitidos de los afectados y deja un evento de auditoría
+    por revocación, firmado por quien había delegado. Sin vencidas cuesta
+    una sola consulta; repetirla no hace nada (idempotente).
+    """
+    ahora = ahora or timezone.now()
+    total = 0
+    while True:
+        revocadas = _vencer_lote(ahora, tamano_lote)
+        total += revocadas
+        if revocadas < tamano_lote:
+            return total
+
+
+@transaction.atomic
+def _vencer_lote(ahora, tamano_lote):
+    vencidas = list(
+        ExcepcionPermiso.objects.select_related('pertenencia__empresa', 'permission__content_type')
+        .filter(vence_en__lte=ahora)
+        .order_by('vence_en')
+        .select_for_update(skip_locked=True, of=('self',))[:tamano_lote]
+    )
+    if not vencidas:
+        return 0
+
+    ExcepcionPermiso.objects.filter(pk__in=[e.pk for e in vencidas]).delete()
+
+    tocadas, eventos, avisos = {}, [], []
+    for excepcion in vencidas:
+        pertenencia, permiso = excepcion.pertenencia, excepcion.permission
+        tocadas[pertenencia.pk] = (pertenencia.usuario_id, pertenencia.empresa_id)
+        detalle = f"Permiso '{permiso.codename}' VENCIDO (delegado hasta {excepcion.vence_en.isoformat()})"
+        eventos.append(construir_evento(
+            # Sin quien delegó (borrado o anterior al vencimiento): el evento queda a nombre del afectado
+            excepcion.otorgada_por_id or pertenencia.usuario_id, pertenencia.usuario_id, "Delegación (vencida)",
+            detalle=f"{detalle} en empresa {pertenencia.empresa.codigo}",
+            empresa=pertenencia.empresa, permiso=permiso,
+            operacion='remove', pertenencia_id=pertenencia.pk, vence_en=excepcion.vence_en.isoformat(),
+        ))
+        avisos.append(evento_delegacion(
+            pertenencia.usuario_id, pertenencia.empresa, permiso, 'vencida', excepcion.vence_en
+        ))
+
+    _propagar(tocadas, tocadas.values(), eventos, avisos)
+    return len(vencidas)
+
+
+# ==============================================================================
+# 4. CAMBIOS DESDE EL ADMIN
+# ==============================================================================
+
+def excepciones_actuales(pertenencia):
+    """{permission_id: vence_en} de la Pertenencia: la foto previa para registrar_cambios_admin()."""
+    return dict(ExcepcionPermiso.objects.filter(pertenencia=pertenencia).values_list('permission_id', 'vence_en'))
+
+
+@transaction.atomic
+def registrar_cambios_admin(actor, pertenencia, antes):
+    """
+    El inline del Admin escribe ExcepcionPermiso directo (sin m2m_changed ni
+    las reglas de Territorio: es un superusuario). Compara con la foto 'antes'
+    y aplica lo mismo que una delegación: tabla, caché, corte de Pasaportes si
+    hubo bajas, auditoría y webhooks. Devuelve cuántas excepciones cambiaron.
+    """
+    despues = excepciones_actuales(pertenencia)
+    cambios = {
+        permiso_id: ('add' if permiso_id in despues else 'remove')
+        for permiso_id in antes.keys() | despues.keys()
+        if permiso_id not in antes or permiso_id not in despues or antes[permiso_id] != despues[permiso_id]
+    }
+    if not cambios:
+        return 0
+
+    empresa = pertenencia.empresa
+    clave = (pertenencia.usuario_id, pertenencia.empresa_id)
+    tocadas, eventos, avisos = {}, [], []
+    for permiso in Permission.objects.select_related('content_type').filter(pk__in=cambios).order_by('pk'):
+        accion, vence_en = cambios[permiso.pk], despues.get(permiso.pk)
+        if accion == 'remove':
+            detalle = f"Permiso '{permiso.codename}' REVOCADO por {actor.username} (Admin)"
+        elif permiso.pk in antes:
+            detalle = f"Vencimiento de '{permiso.codename}' ACTUALIZADO por {actor.username} (Admin)"
+        else:
+            detalle = f"Permiso '{permiso.codename}' OTORGADO por {actor.username} (Admin)"
+        if permiso.pk not in antes or accion == 'remove':
+            tocadas[pertenencia.pk] = clave  # Renovar el vencimiento no cambia los permisos efectivos
+
+        eventos.append(construir_evento(
+            actor, pertenencia.usuario_id, f"Delegación ({accion})",
+            detalle=f"{detalle} en empresa {empresa.codigo}",
+            empresa=empresa, permiso=permiso,
+            operacion=accion, pertenencia_id=pertenencia.pk, admin=True,
+            vence_en=vence_en.isoformat() if vence_en else None,
+        ))
+        avisos.append(evento_delegacion(pertenencia.usuario_id, empresa, permiso, accion, vence_en))
+
+    revocados = [clave] if 'remove' in cambios.values() else []
+    _propagar(tocadas, revocados, eventos, avisos)
+    return len(cambios)
@@ -0,0 +1,255 @@
+"""
+CORE FIRMAS - LLAVES ASIMÉTRICAS DEL PASAPORTE (RS256 / EdDSA)
+--------------------------------------------------------------
+Con HS256 cualquier servicio que quiera verificar un Pasaporte necesita la
+SECRET_KEY (la llave maestra). Con firma asimétrica el Hub firma con su llave
+PRIVADA y las apps satélite verifican con la PÚBLICA, publicada en
+/.well-known/jwks.json.
+
+ALMACÉN EN DISCO (JWT_CLAVES_DIR):
+    claves.json      -> Manifiesto: llave activa + llaves aún publicadas.
+    <kid>.pem        -> Llave privada de cada 'kid' (permisos 600).
+
+ROTACIÓN ('manage.py rotate_signing_key'):
+1. Se genera una llave nueva y pasa a ser la ACTIVA (firma desde ya).
+2. La anterior queda 'retirada' pero sigue publicada y aceptada durante
+   JWT_CLAVES_SOLAPAMIENTO (por defecto, la vida del Refresh Token), para no
+   invalidar los tokens ya emitidos.
+3. Las llaves con el solapamiento vencido se eliminan en la siguiente rotación.
+
+Cada token lleva el 'kid' en su cabecera: el verificador sabe con qué llave
+pública comprobarlo. Los workers detectan una rotación releyendo el
+manifiesto cuando cambia su fecha de modificación (sin reiniciar).
+"""
+
+import json
+import os
+import secrets
+import threading
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+import jwt
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.backends import TokenBackend
+from rest_framework_simplejwt.exceptions import TokenBackendError, TokenBackendExpiredToken
+
+MANIFIESTO = 'claves.json'
+ALGORITMOS_ASIMETRICOS = ('RS256', 'EdDSA')
+
+
+# ==============================================================================
+# 1. ALMACÉN DE LLAVES EN DISCO
+# ==============================================================================
+
+class AlmacenClaves:
+    """Lee, genera y rota las llaves de firma guardadas en 'directorio'."""
+
+    def __init__(self, directorio):
+        self.directorio = Path(directorio)
+        self._candado = threading.Lock()
+        self._firma_manifiesto = object()  # Distinto de cualquier firma: fuerza la primera lectura
+        self._estado = None
+
+    # --- LECTURA (CON CACHÉ POR FECHA DE MODIFICACIÓN) ---
+    def estado(self):
+        """
+        Devuelve {'activa': kid, 'claves': {kid: {...}}, 'jwks': {...}} con las
+        llaves ya cargadas. Solo relee el disco si el manifiesto cambió.
+        """
+        ruta = self.directorio / MANIFIESTO
+        try:
+            info = ruta.stat()
+            firma = (info.st_mtime_ns, info.st_size)
+        except FileNotFoundError:
+            firma = None
+
+        if firma != self._firma_manifiesto:
+            with self._candado:
+                if firma != self._firma_manifiesto:
+                    self._estado = self._leer() if firma else {'activa': None, 'claves': {}, 'jwks': {'keys': []}}
+                    self._firma_manifiesto = firma
+        return self._estado
+
+    def _leer(self):
+        manifiesto = json.loads((self.directorio / MANIFIESTO).read_text())
+        algoritmos = {alg: jwt.get_algorithm_by_name(alg) for alg in ALGORITMOS_ASIMETRICOS}
+        claves = {}
+        for meta in manifiesto['claves']:
+            privada = algoritmos[meta['alg']].prepare_key((self.directorio / f"{meta['kid']}.pem").read_bytes())
+            claves[meta['kid']] = dict(meta, privada=privada, publica=privada.public_key())
+
+        # JWKS: llaves públicas vigentes (activa + en solapamiento)
+        llaves = []
+        for kid, clave in claves.items():
+            jwk = algoritmos[clave['alg']].to_jwk(clave['publica'], as_dict=True)
+            jwk.update({'kid': kid, 'alg': clave['alg'], 'use': 'sig'})
+            llaves.append(jwk)
+        return {'activa': manifiesto['activa'], 'claves': claves, 'jwks': {'keys': llaves}}
+
+    def activa(self):
+        estado = self.estado()
+        if not estado['activa']:
+            raise ImproperlyConfigured(
+                f"No hay llave de firma activa en {self.directorio}. "
+                "Ejecutar 'manage.py rotate_signing_key'."
+            )
+        return estado['claves'][estado['activa']]
+
+    def jwks(self):
+        """JSON Web Key Set publicado en /.well-known/jwks.json."""
+        return self.estado()['jwks']
+
+    # --- ESCRITURA ---
+    def rotar(self, algoritmo, solapamiento, ahora=None):
+        """
+        Genera una llave nueva y la activa. La anterior queda publicada hasta
+        'ahora + solapamiento'. Devuelve (kid_nuevo, kids_eliminados).
+        """
+        ahora = ahora or datetime.now(dt_timezone.utc)
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        manifiesto = self._manifiesto_crudo()
+
+        # 1. Purgar llaves cuyo solapamiento ya venció
+        vigentes, eliminadas = [], []
+        for meta in manifiesto['claves']:
+            vence = meta.get('vence')
+            if vence and datetime.fromisoformat(vence) <= ahora:
+                eliminadas.append(meta['kid'])
+            else:
+                vigentes.append(meta)
+
+        # 2. Retirar la activa actual (sigue aceptándose hasta 'vence')
+        for meta in vigentes:
+            if meta['kid'] == manifiesto['activa']:
+                meta['retirada'] = ahora.isoformat()
+                meta['vence'] = (ahora + solapamiento).isoformat()
+
+        # 3. Llave nueva
+        kid = f"{ahora:%Y%m%d%H%M%S}-{secrets.token_hex(4)}"
+        self._escribir_privada(kid, self._generar(algoritmo))
+        vigentes.append({'kid': kid, 'alg': algoritmo, 'creada': ahora.isoformat(), 'retirada': None, 'vence': None})
+
+        # 4. Manifiesto nuevo de forma atómica (los workers nunca leen uno a medias)
+        self._escribir_manifiesto({'activa': kid, 'claves': vigentes})
+        for kid_viejo in eliminadas:
+            (self.directorio / f"{kid_viejo}.pem").unlink(missing_ok=True)
+        return kid, eliminadas
+
+    def _manifiesto_crudo(self):
+        ruta = self.directorio / MANIFIESTO
+        if not ruta.exists():
+            return {'activa': None, 'claves': []}
+        return json.loads(ruta.read_text())
+
+    @staticmethod
+    def _generar(algoritmo):
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+
+        if algoritmo == 'RS256':
+            privada = rsa.generate_private_key(public_exponent=65537, key_size=settings.JWT_RSA_BITS)
+        elif algoritmo == 'EdDSA':
+            privada = ed25519.Ed25519PrivateKey.generate()
+        else:
+            raise ValueError(f"Algoritmo no soportado: {algoritmo}")
+        return privada.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+
+    def _escribir_privada(self, kid, pem):
+        ruta = self.directorio / f"{kid}.pem"
+        descriptor = os.open(ruta, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(descriptor, 'wb') as archivo:
+            archivo.write(pem)
+
+    def _escribir_manifiesto(self, manifiesto):
+        temporal = self.directorio / f".{MANIFIESTO}.{secrets.token_hex(4)}"
+        temporal.write_text(json.dumps(manifiesto, indent=2))
+        os.replace(temporal, self.directorio / MANIFIESTO)
+
+
+_almacen = None
+
+
+def obtener_almacen():
+    """Almacén único por proceso, en settings.JWT_CLAVES_DIR."""
+    global _almacen
+    if _almacen is None:
+        _almacen = AlmacenClaves(settings.JWT_CLAVES_DIR)
+    return _almacen
+
+
+# ==============================================================================
+# 2. BACKEND DE TOKENS PARA SIMPLE_JWT
+# ==============================================================================
+
+class TokenBackendRotativo(TokenBackend):
+    """
+    TokenBackend de SimpleJWT que firma con la llave ACTIVA del almacén
+    (poniendo su 'kid' en la cabecera) y verifica con la llave pública que
+    indique el 'kid' del token. Se instala en CoreConfig.ready() cuando
+    JWT_FIRMA es RS256 o EdDSA.
+    """
+
+    def __init__(self, almacen, **kwargs):
+        super().__init__(settings.JWT_FIRMA, **kwargs)
+        self.almacen = almacen
+
+    def encode(self, payload):
+        jwt_payload = payload.copy()
+        if self.audience is not None:
+            jwt_payload['aud'] = self.audience
+        if self.issuer is not None:
+            jwt_payload['iss'] = self.issuer
+
+        clave = self.almacen.activa()
+        return jwt.encode(
+            jwt_payload,
+            clave['privada'],
+            algorithm=clave['alg'],
+            headers={'kid': clave['kid']},
+            json_encoder=self.json_encoder,
+        )
+
+    def decode(self, token, verify=True):
+        try:
+            kid = jwt.get_unverified_header(token).get('kid')
+            clave = self.almacen.estado()['claves'].get(kid)
+            if clave is None or (clave['vence'] and datetime.fromisoformat(clave['vence']) <= datetime.now(dt_timezone.utc)):
+                # 'kid' desconocido o llave retirada con el solapamiento vencido
+                raise TokenBackendError(_("Token is invalid"))
+            return jwt.decode(
+                token,
+                clave['publica'],
+                algorithms=[clave['alg']],
+                audience=self.audience,
+                issuer=self.issuer,
+                leeway=self.get_leeway(),
+                options={
+                    'verify_aud': self.audience is not None,
+                    'verify_signature': verify,
+                },
+            )
+        except jwt.ExpiredSignatureError as e:
+            raise TokenBackendExpiredToken(_("Token is expired")) from e
+        except jwt.InvalidTokenError as e:
+            raise TokenBackendError(_("Token is invalid")) from e
+
+
+def instalar_backend_rotativo():
+    """Reemplaza el TokenBackend global de SimpleJWT (lo leen todos los tokens)."""
+    from rest_framework_simplejwt import state
+    from rest_framework_simplejwt.settings import api_settings
+
+    state.token_backend = TokenBackendRotativo(
+        obtener_almacen(),
+        audience=api_settings.AUDIENCE,
+        issuer=api_settings.ISSUER,
+        leeway=api_settings.LEEWAY,
+        json_encoder=api_settings.JSON_ENCODER,
+    )
@@ -0,0 +1,65 @@
+"""
+CORE HASHERS - ALGORITMOS DE CONTRASEÑA CONFIGURABLES
+-----------------------------------------------------
+Versiones de los hashers nativos de Django cuyos parámetros de costo se leen
+desde settings (y por ende desde variables de entorno).
+
+OBJETIVO:
+Ajustar el costo de cada login al presupuesto de CPU del contenedor.
+Como el 'algorithm' es el mismo que el del hasher nativo, las contraseñas ya
+guardadas se siguen verificando; y si sus parámetros no coinciden con los
+actuales, Django las re-hashea de forma transparente en el siguiente login
+(ver BackendLoginAcotado en core/autenticacion.py).
+"""
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher,
+    PBKDF2PasswordHasher,
+    ScryptPasswordHasher,
+)
+
+
+class PBKDF2Ajustado(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 con iteraciones configurables (PASSWORD_PBKDF2_ITERACIONES)."""
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERACIONES
+
+
+class ScryptAjustado(ScryptPasswordHasher):
+    """Scrypt (memory-hard, sin dependencias extra) con N, r y p configurables."""
+
+    @property
+    def work_factor(self):
+        return settings.PASSWORD_SCRYPT_N
+
+    @property
+    def block_size(self):
+        return settings.PASSWORD_SCRYPT_R
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_SCRYPT_P
+
+    @property
+    def maxmem(self):
+        # hashlib exige margen sobre 128 * N * r bytes
+        return 256 * self.work_factor * self.block_size
+
+
+class Argon2Ajustado(Argon2PasswordHasher):
+    """Argon2id con costos configurables. Requiere el paquete 'argon2-cffi'."""
+
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2_PARALLELISM
@@ -0,0 +1,310 @@
+"""
+CORE IMPORTACIÓN - CARGA Y DESCARGA MASIVA DE PERTENENCIAS
+----------------------------------------------------------
+Alta de una empresa nueva o de la planilla de temporada sin pasar por el
+Admin usuario por usuario.
+
+FORMATO (CSV con encabezado, o JSONL con las mismas claves):
+    username, empresa, grupo, area, permisos_adicionales, email, first_name, last_name
+
+- empresa: Empresa.codigo | grupo: Group.name | area: Area.codigo (opcional)
+- permisos_adicionales: "app.codename" separados por '|' en CSV, o lista en
+  JSONL. Si la columna viene, REEMPLAZA las excepciones de esa Pertenencia;
+  si no viene (o es null en JSONL), no se tocan.
+- email/first_name/last_name: solo se usan al crear usuarios nuevos.
+
+ESTRATEGIA:
+1. Los catálogos (Empresas, Grupos, Áreas, Permisos) se cargan UNA vez en
+   diccionarios en memoria.
+2. El archivo se procesa en lotes: por lote, unas pocas consultas IN (...)
+   y escrituras bulk_create/bulk_update, incluida la tabla intermedia de
+   permisos_adicionales.
+3. Como las escrituras masivas no disparan señales, al final de cada lote se
+   sincroniza PermisoEfectivo de las Pertenencias tocadas y al final se
+   invalida el caché de permisos una sola vez.
+"""
+
+import csv
+import json
+from itertools import islice
+
+from django.contrib.auth.models import Group, Permission, User
+
+from .aprovisionamiento import crear_usuarios_en_bloque
+from .models import Area, Empresa, Pertenencia
+from .permisos import invalidar_permisos_globales, sincronizar_permisos_efectivos
+
+COLUMNAS = ('username', 'empresa', 'grupo', 'area', 'permisos_adicionales', 'email', 'first_name', 'last_name')
+SEPARADOR_PERMISOS = '|'
+
+
+class ErrorImportacion(Exception):
+    """Fila inválida. 'linea' es el número de línea del archivo (1 = encabezado en CSV)."""
+
+    def __init__(self, linea, mensaje):
+        super().__init__(f"Línea {linea}: {mensaje}")
+        self.linea = linea
+
+
+# ==============================================================================
+# 1. LECTURA EN STREAMING
+# ==============================================================================
+
+def leer_filas(archivo, formato):
+    """Genera (linea, dict) desde un archivo de texto CSV o JSONL, sin cargarlo completo."""
+    if formato == 'csv':
+        lector = csv.DictReader(archivo)
+        for fila in lector:
+            permisos = fila.get('permisos_adicionales')
+            if permisos is not None:
+                fila['permisos_adicionales'] = [p for p in permisos.split(SEPARADOR_PERMISOS) if p]
+            yield lector.line_num, fila
+    elif formato == 'jsonl':
+        for linea, texto in enumerate(archivo, start=1):
+            if texto.strip():
+                try:
+                    yield linea, json.loads(texto)
+                except ValueError as exc:
+                    raise ErrorImportacion(linea, f"JSON inválido ({exc})")
+    else:
+        raise ValueError(f"Formato desconocido: {formato}")
+
+
+def en_lotes(iterable, tamano):
+    iterador = iter(iterable)
+    while lote := list(islice(iterador, tamano)):
+        yield lote
+
+
+# ==============================================================================
+# 2. IMPORTACIÓN
+# ==============================================================================
+
+class ImportadorPertenencias:
+    """
+    Importa filas en lotes. Debe ejecutarse dentro de una transacción
+    (lo hace el comando import_pertenencias): ante un error, nada queda a medias.
+    """
+
+    def __init__(self, crear_usuarios=False, tamano_lote=2000):
+        self.crear_usuarios = crear_usuarios
+        self.tamano_lote = tamano_lote
+        self.contadores = dict.fromkeys(
+            ('filas', 'usuarios_creados', 'pertenencias_creadas', 'pertenencias_actualizadas', 'excepciones_cambiadas'), 0
+        )
+
+        # Mapas de búsqueda en memoria (catálogos chicos, una consulta cada uno)
+        self.empresas = dict(Empresa.objects.values_list('codigo', 'id'))
+        self.grupos = dict(Group.objects.values_list('name', 'id'))
+        self.areas = dict(Area.objects.values_list('codigo', 'id'))
+        self.permisos = {
+            f"{app}.{codename}": pk
+            for pk, app, codename in Permission.objects.values_list('pk', 'content_type__app_label', 'codename')
+        }
+
+    def importar(self, filas):
+        """filas: iterable de (linea, dict). Devuelve los contadores."""
+        for lote in en_lotes(filas, self.tamano_lote):
+            self._procesar_lote(lote)
+        invalidar_permisos_globales()
+        return self.contadores
+
+    # --------------------------------------------------------------------------
+    def _resolver(self, linea, fila):
+        """Valida y traduce una fila a IDs usando los mapas en memoria."""
+        username = (fila.get('username') or '').strip()
+        if not username:
+            raise ErrorImportacion(linea, "Falta 'username'.")
+
+        def buscar(mapa, campo, obligatorio=True):
+            valor = (fila.get(campo) or '').strip()
+            if not valor:
+                if obligatorio:
+                    raise ErrorImportacion(linea, f"Falta '{campo}'.")
+                return None
+            try:
+                return mapa[valor]
+            except KeyError:
+                raise ErrorImportacion(linea, f"{campo} '{valor}' no existe.")
+
+        permisos = fila.get('permisos_adicionales')
+        if permisos is not None:
+            if isinstance(permisos, str):
+                permisos = [p for p in permisos.split(SEPARADOR_PERMISOS) if p]
+            desconocidos = [p for p in permisos if p not in self.permisos]
+            if desconocidos:
+                raise ErrorImportacion(linea, f"Permisos inexistentes: {', '.join(desconocidos)}")
+            permisos = {self.permisos[p] for p in permisos}
+
+        return {
+            'username': username,
+            'empresa_id': buscar(self.empresas, 'empresa'),
+            'grupo_id': buscar(self.grupos, 'grupo'),
+            'area_id': buscar(self.areas, 'area', obligatorio=False),
+            'permisos': permisos,
+            'fila': fila,
+            'linea': linea,
+        }
+
+    def _procesar_lote(self, lote):
+        # Última aparición gana si el archivo repite (usuario, empresa)
+        datos = {}
+        for linea, fila in lote:
+            resuelta = self._resolver(linea, fila)
+            datos[(resuelta['username'], resuelta['empresa_id'])] = resuelta
+        self.contadores['filas'] += len(lote)
+
+        usuarios = self._usuarios(datos.values())
+
+        # Pertenencias existentes del lote: una consulta
+        existentes = {
+            (p.usuario_id, p.empresa_id): p
+            for p in Pertenencia.objects.filter(
+                usuario_id__in={usuarios[d['username']] for d in datos.values()},
+                empresa_id__in={d['empresa_id'] for d in datos.values()},
+            )
+        }
+
+        nuevas, cambiadas, permisos_por_clave = [], [], {}
+        for dato in datos.values():
+            clave = (usuarios[dato['username']], dato['empresa_id'])
+            pertenencia = existentes.get(clave)
+            if pertenencia is None:
+                pertenencia = Pertenencia(
+                    usuario_id=clave[0], empresa_id=clave[1], grupo_id=dato['grupo_id'], area_id=dato['area_id']
+                )
+                nuevas.append(pertenencia)
+                existentes[clave] = pertenencia
+            elif (pertenencia.grupo_id, pertenencia.area_id) != (dato['grupo_id'], dato['area_id']):
+                pertenencia.grupo_id, pertenencia.area_id = dato['grupo_id'], dato['area_id']
+                cambiadas.append(pertenencia)
+            if dato['permisos'] is not None:
+                permisos_por_clave[clave] = dato['permisos']
+
+        Pertenencia.objects.bulk_create(nuevas, batch_size=self.tamano_lote)
+        Pertenencia.objects.bulk_update(cambiadas, ['grupo', 'area'], batch_size=self.tamano_lote)
+        self.contadores['pertenencias_creadas'] += len(nuevas)
+        self.contadores['pertenencias_actualizadas'] += len(cambiadas)
+
+        con_excepciones_cambiadas = self._reemplazar_excepciones(
+            {existentes[c].pk: p for c, p in permisos_por_clave.items()}
+        )
+
+        # Las escrituras masivas no disparan señales: sincronizamos a mano
+        sincronizar_permisos_efectivos(
+            {p.pk for p in nuevas} | {p.pk for p in cambiadas} | con_excepciones_cambiadas
+        )
+
+    def _usuarios(self, datos):
+        """username -> id para el lote, creando los faltantes en bloque si se permite."""
+        usernames = {d['username'] for d in datos}
+        ids = dict(User.objects.filter(username__in=usernames).values_list('username', 'id'))
+        faltantes = [d for d in datos if d['username'] not in ids]
+        if not faltantes:
+            return ids
+
+        if not self.crear_usuarios:
+            nombres = sorted({d['username'] for d in faltantes})
+            raise ErrorImportacion(
+                min(d['linea'] for d in faltantes), f"Usuarios inexistentes (usar --crear-usuarios): {', '.join(nombres[:10])}"
+                     f"{'...' if len(nombres) > 10 else ''}"
+            )
+
+        nuevos, vistos = [], set()
+        for dato in faltantes:
+            if dato['username'] in vistos:
+                continue
+            vistos.add(dato['username'])
+            fila = dato['fila']
+            nuevos.append(User(
+                username=dato['username'],
+                email=(fila.get('email') or '').strip(),
+                first_name=(fila.get('first_name') or '').strip(),
+                last_name=(fila.get('last_name') or '').strip(),
+            ))
+        # Users + PerfilUsuario en bloque (bulk_create no dispara post_save).
+        # Sin clave utilizable: el usuario entra por "Olvidé mi contraseña".
+        crear_usuarios_en_bloque(nuevos, batch_size=self.tamano_lote)
+        self.contadores['usuarios_creados'] += len(nuevos)
+        ids.update((u.username, u.pk) for u in nuevos)
+        return ids
+
+    def _reemplazar_excepciones(self, deseadas):
+        """
+        Deja la tabla intermedia exactamente como 'deseadas' ({pertenencia_id: {permission_id}}).
+        Devuelve los IDs de las Pertenencias cuyas excepciones cambiaron.
+        """
+        if not deseadas:
+            return set()
+        Intermedia = Pertenencia.permisos_adicionales.through
+        actuales = {}
+        for pk, pertenencia_id, permission_id in Intermedia.objects.filter(
+            pertenencia_id__in=deseadas
+        ).values_list('pk', 'pertenencia_id', 'permission_id'):
+            actuales[(pertenencia_id, permission_id)] = pk
+
+        objetivo = {(pertenencia_id, permiso) for pertenencia_id, permisos in deseadas.items() for permiso in permisos}
+        sobrantes = {fila: pk for fila, pk in actuales.items() if fila not in objetivo}
+        faltantes = [
+            Intermedia(pertenencia_id=pertenencia_id, permission_id=permiso)
+            for pertenencia_id, permiso in objetivo if (pertenencia_id, permiso) not in actuales
+        ]
+        if sobrantes:
+            Intermedia.objects.filter(pk__in=list(sobrantes.values())).delete()
+        Intermedia.objects.bulk_create(faltantes, batch_size=self.tamano_lote, ignore_conflicts=True)
+        self.contadores['excepciones_cambiadas'] += len(sobrantes) + len(faltantes)
+        return (
+            {pertenencia_id for pertenencia_id, _ in sobrantes}
+            | {fila.pertenencia_id for fila in faltantes}
+        )
+
+
+# ==============================================================================
+# 3. EXPORTACIÓN EN STREAMING
+# ==============================================================================
+
+def exportar_pertenencias(salida, formato, tamano_lote=2000, empresa=None):
+    """
+    Escribe las Pertenencias en 'salida' (CSV o JSONL), en el mismo formato que
+    acepta la importación. Recorre por lotes de PK: memoria constante y dos
+    consultas por lote (Pertenencias con sus joins + excepciones del lote).
+    Devuelve la cantidad de filas escritas.
+    """
+    consulta = Pertenencia.objects.order_by('pk').values_list(
+        'pk', 'usuario__username', 'empresa__codigo', 'grupo__name', 'area__codigo',
+        'usuario__email', 'usuario__first_name', 'usuario__last_name',
+    )
+    if empresa:
+        consulta = consulta.filter(empresa__codigo=empresa)
+
+    Intermedia = Pertenencia.permisos_adicionales.through
+    escritor = None
+    if formato == 'csv':
+        escritor = csv.writer(salida)
+        escritor.writerow(COLUMNAS)
+
+    total, ultimo_pk = 0, 0
+    while True:
+        lote = list(consulta.filter(pk__gt=ultimo_pk)[:tamano_lote])
+        if not lote:
+            return total
+        ultimo_pk = lote[-1][0]
+
+        excepciones = {}
+        for pertenencia_id, app, codename in Intermedia.objects.filter(
+            pertenencia_id__in=[fila[0] for fila in lote]
+        ).values_list('pertenencia_id', 'permission__content_type__app_label', 'permission__codename'):
+            excepciones.setdefault(pertenencia_id, []).append(f"{app}.{codename}")
+
+        for pk, username, empresa_codigo, grupo, area, email, first_name, last_name in lote:
+            permisos = sorted(excepciones.get(pk, ()))
+            if escritor:
+                escritor.writerow((
+                    username, empresa_codigo, grupo, area or '', SEPARADOR_PERMISOS.join(permisos),
+                    email, first_name, last_name,
+                ))
+            else:
+                salida.write(json.dumps(dict(zip(COLUMNAS, (
+                    username, empresa_codigo, grupo, area, permisos, email, first_name, last_name,
+                ))), ensure_ascii=False) + '\n')
+        total += len(lote)
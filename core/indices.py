@@ -0,0 +1,35 @@
+"""
+CORE ÍNDICES - ÍNDICES EXCLUSIVOS DE POSTGRESQL
+-----------------------------------------------
+Producción corre sobre PostgreSQL, pero el desarrollo local y algunas
+pruebas pueden usar SQLite, donde BRIN y GIN no existen. Estas variantes
+solo generan DDL cuando el motor es PostgreSQL; en los demás quedan en los
+modelos y en el estado de las migraciones (makemigrations no ve diferencias)
+pero no se crean. Van en el modelo y no solo en la migración porque SQLite
+recrea la tabla completa, con todos sus índices, ante cualquier AlterField.
+"""
+
+from django.contrib.postgres.indexes import BrinIndex, GinIndex
+from django.db.backends.ddl_references import Statement
+
+
+class SoloPostgresMixin:
+    """create_sql / remove_sql sin efecto fuera de PostgreSQL."""
+
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        if schema_editor.connection.vendor != 'postgresql':
+            return Statement('')
+        return super().create_sql(model, schema_editor, using=using, **kwargs)
+
+    def remove_sql(self, model, schema_editor, **kwargs):
+        if schema_editor.connection.vendor != 'postgresql':
+            return Statement('')
+        return super().remove_sql(model, schema_editor, **kwargs)
+
+
+class BrinIndexPostgres(SoloPostgresMixin, BrinIndex):
+    pass
+
+
+class GinIndexPostgres(SoloPostgresMixin, GinIndex):
+    pass
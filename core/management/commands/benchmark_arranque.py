@@ -0,0 +1,62 @@
+import os
+import shlex
+import signal
+import statistics
+import subprocess
+import time
+import urllib.error
+import urllib.request
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el tiempo hasta la primera petición atendida: lanza el comando de arranque '
+        '(ej: sh entrypoint.sh), consulta la URL hasta recibir 200 y lo detiene. Repite N veces.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('comando', help="Comando de arranque entre comillas, ej: 'sh entrypoint.sh'")
+        parser.add_argument('--url', default='http://127.0.0.1:8000/readyz', help='URL a consultar (default: /readyz)')
+        parser.add_argument('--repeticiones', type=int, default=3, help='Arranques a medir (default: 3)')
+        parser.add_argument('--timeout', type=float, default=120.0, help='Segundos máximos por arranque')
+        parser.add_argument('--intervalo', type=float, default=0.05, help='Segundos entre consultas')
+
+    def handle(self, *args, **options):
+        tiempos = []
+        for i in range(1, options['repeticiones'] + 1):
+            segundos = self._medir(options)
+            tiempos.append(segundos)
+            self.stdout.write(f"  Arranque {i}: {segundos:.2f}s")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Tiempo a la primera petición: mediana {statistics.median(tiempos):.2f}s | "
+            f"mín {min(tiempos):.2f}s | máx {max(tiempos):.2f}s ({len(tiempos)} arranques)"
+        ))
+
+    def _medir(self, options):
+        # Grupo de procesos propio: al terminar se detiene Gunicorn junto con sus workers
+        proceso = subprocess.Popen(
+            shlex.split(options['comando']),
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True,
+        )
+        inicio = time.perf_counter()
+        try:
+            while time.perf_counter() - inicio < options['timeout']:
+                if proceso.poll() is not None:
+                    raise CommandError(f"El comando terminó antes de responder (código {proceso.returncode}).")
+                try:
+                    with urllib.request.urlopen(options['url'], timeout=2) as respuesta:
+                        if respuesta.status == 200:
+                            return time.perf_counter() - inicio
+                except (urllib.error.URLError, ConnectionError, TimeoutError):
+                    pass
+                time.sleep(options['intervalo'])
+            raise CommandError(f"Sin respuesta 200 en {options['timeout']}s.")
+        finally:
+            os.killpg(proceso.pid, signal.SIGTERM)
+            try:
+                proceso.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                os.killpg(proceso.pid, signal.SIGKILL)
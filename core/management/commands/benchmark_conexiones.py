@@ -0,0 +1,69 @@
+import json
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from core.servidor_prueba import ServidorNoListo, detener_gunicorn, levantar_gunicorn
+
+USUARIO = 'benchmark_conexiones'
+CLAVE = 'clave-de-benchmark-123'
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara la latencia (p50/p95/p99) de /api/login/ según DB_CONEXIONES: levanta Gunicorn '
+        'con cada modo contra la BD configurada y le aplica la misma carga.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modos', nargs='+', default=['ninguna', 'persistentes', 'pool'],
+                            choices=['ninguna', 'persistentes', 'pool', 'pgbouncer'])
+        parser.add_argument('--puerto', type=int, default=8765)
+        parser.add_argument('--workers', type=int, default=2, help='Workers de Gunicorn (default: 2)')
+        parser.add_argument('--concurrencia', type=int, default=8)
+        parser.add_argument('--peticiones', type=int, default=2000)
+        parser.add_argument(
+            '--iteraciones', type=int, default=1000,
+            help='Iteraciones PBKDF2 del usuario de prueba: bajas para que la latencia refleje la BD y no el hash'
+        )
+
+    def handle(self, *args, **options):
+        self._preparar_usuario(options['iteraciones'])
+        try:
+            for modo in options['modos']:
+                self.stdout.write(self.style.MIGRATE_HEADING(f"\n=== DB_CONEXIONES={modo} ==="))
+                proceso = self._levantar(modo, options)
+                try:
+                    call_command(
+                        'benchmark_http', f"http://127.0.0.1:{options['puerto']}/api/login/",
+                        json=json.dumps({'username': USUARIO, 'password': CLAVE}),
+                        concurrencia=options['concurrencia'], peticiones=options['peticiones'],
+                        stdout=self.stdout,
+                    )
+                finally:
+                    detener_gunicorn(proceso)
+        finally:
+            User.objects.filter(username=USUARIO).delete()
+
+    def _preparar_usuario(self, iteraciones):
+        # Mismas iteraciones que usará el servidor: así el login no dispara el re-hash
+        with override_settings(PASSWORD_PBKDF2_ITERACIONES=iteraciones,
+                               PASSWORD_HASHERS=['core.hashers.PBKDF2Ajustado']):
+            clave = make_password(CLAVE)
+        User.objects.update_or_create(username=USUARIO, defaults={'password': clave, 'is_active': True})
+
+    def _levantar(self, modo, options):
+        try:
+            return levantar_gunicorn(options['puerto'], {
+                'DB_CONEXIONES': modo,
+                'SERVIDOR_MODO': 'wsgi',
+                'PASSWORD_HASHER': 'pbkdf2',
+                'PASSWORD_PBKDF2_ITERACIONES': str(options['iteraciones']),
+                'THROTTLE_ANON': '1000000/minute',
+                'GUNICORN_WORKERS': str(options['workers']),
+            })
+        except ServidorNoListo as exc:
+            raise CommandError(str(exc))
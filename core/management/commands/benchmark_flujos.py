@@ -0,0 +1,272 @@
+import http.client
+import json
+import re
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.contrib.auth.models import User
+from django.contrib.auth.tokens import default_token_generator
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from core.servidor_prueba import ServidorNoListo, detener_gunicorn, levantar_gunicorn
+from core.sintetico import casos_de_delegacion, permisos_delegables
+
+PASOS = ('login', 'select-empresa', 'delegar-permiso', 'password-reset', 'password-reset-confirm')
+
+# Cabecera Server-Timing de InstrumentacionMiddleware: bd;dur=...;desc="N consultas"
+CONSULTAS = re.compile(r'desc="(\d+) consultas"')
+
+
+class Command(BaseCommand):
+    help = (
+        'Recorre los flujos reales de identidad sobre la organización sintética (sembrar_organizacion): '
+        'login -> select-empresa -> delegar-permiso (add/remove) -> password-reset -> confirmación. '
+        'Reporta throughput, p50/p95/p99 y consultas SQL por paso; --comparar falla ante regresiones. '
+        'Con --levantar --modos wsgi asgi recorre el mismo escenario en cada SERVIDOR_MODO y los compara.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Backend ya levantado (default: %(default)s)')
+        parser.add_argument('--levantar', action='store_true',
+                            help='Levantar Gunicorn (gunicorn.conf.py) en --puerto contra la BD configurada')
+        parser.add_argument('--puerto', type=int, default=8766)
+        parser.add_argument('--modos', nargs='+', choices=['wsgi', 'asgi'], default=['wsgi'],
+                            help='SERVIDOR_MODO con --levantar; varios = comparación (default: wsgi)')
+        parser.add_argument('--workers', type=int, help='GUNICORN_WORKERS con --levantar (default: automático)')
+        parser.add_argument('--concurrencia', type=int, default=8, help='Flujos simultáneos (default: 8)')
+        parser.add_argument('--flujos', type=int, default=200, help='Flujos completos a recorrer (default: 200)')
+        parser.add_argument('--clave', default='clave-sintetica-123', help='La de sembrar_organizacion')
+        parser.add_argument('--timeout', type=float, default=30.0, help='Timeout por petición en segundos')
+        parser.add_argument('--json', action='store_true', help='Reporte en JSON')
+        parser.add_argument('--guardar', help='Guardar el reporte como línea base (JSON)')
+        parser.add_argument('--comparar', help='Línea base: falla si p95 o consultas empeoran')
+        parser.add_argument('--tolerancia', type=float, default=0.25,
+                            help='Aumento de p95 permitido frente a la línea base (default: 0.25 = 25%%)')
+
+    def handle(self, *args, **options):
+        casos = casos_de_delegacion(limite=max(options['flujos'], 1))
+        if not casos:
+            raise CommandError("No hay organización sintética: ejecutar 'manage.py sembrar_organizacion' primero.")
+        permisos = permisos_delegables()
+        if not permisos:
+            raise CommandError("No hay permisos con codename único para delegar.")
+        correos = dict(User.objects.filter(pk__in={c[2] for c in casos}).values_list('pk', 'email'))
+
+        modos = list(dict.fromkeys(options['modos']))
+        if len(modos) > 1:
+            if not options['levantar']:
+                raise CommandError("Comparar --modos requiere --levantar (el backend de --url tiene un solo modo).")
+            if options['guardar'] or options['comparar']:
+                raise CommandError("--guardar/--comparar trabajan con un solo modo: usar --modos wsgi o --modos asgi.")
+
+        reportes = {}
+        for modo in modos:
+            if len(modos) > 1 and not options['json']:
+                self.stdout.write(self.style.MIGRATE_HEADING(f"\n=== SERVIDOR_MODO={modo} ==="))
+            reportes[modo] = self._medir(casos, permisos, correos, modo, options)
+            if not options['json']:
+                self._imprimir(reportes[modo])
+
+        reporte = reportes[modos[0]]
+        if len(modos) > 1:
+            if options['json']:
+                self.stdout.write(json.dumps({'modos': reportes}, indent=2))
+            else:
+                self._imprimir_comparacion(reportes)
+        elif options['json']:
+            self.stdout.write(json.dumps(reporte, indent=2))
+        if options['guardar']:
+            with open(options['guardar'], 'w', encoding='utf-8') as archivo:
+                json.dump(reporte, archivo, indent=2)
+        if options['comparar']:
+            self._comparar(reporte, options['comparar'], options['tolerancia'])
+
+    def _medir(self, casos, permisos, correos, modo, options):
+        """Reporte de un recorrido completo; con --levantar, contra un Gunicorn en SERVIDOR_MODO=modo."""
+        proceso = None
+        if options['levantar']:
+            options['url'] = f"http://127.0.0.1:{options['puerto']}"
+            # DB_CONEXIONES no se fija: cada modo usa su default (persistentes / pool) salvo que venga en el entorno
+            entorno = {'SERVIDOR_MODO': modo, 'THROTTLE_ANON': '1000000/minute',
+                       'THROTTLE_USER': '1000000/minute', 'METRICAS_SERVER_TIMING': 'True'}
+            if options['workers']:
+                entorno['GUNICORN_WORKERS'] = str(options['workers'])
+            try:
+                proceso = levantar_gunicorn(options['puerto'], entorno)
+            except ServidorNoListo as exc:
+                raise CommandError(str(exc))
+        try:
+            resultados = self._ejecutar(casos, permisos, correos, options)
+        finally:
+            if proceso is not None:
+                detener_gunicorn(proceso)
+        return {'modo': modo if options['levantar'] else None, **self._resumir(resultados, options)}
+
+    # --------------------------------------------------------------------------
+    # CLIENTE HTTP (UNA CONEXIÓN KEEP-ALIVE POR HILO)
+    # --------------------------------------------------------------------------
+    def _post(self, ruta, cuerpo, token=None):
+        """(codigo, json, consultas o None, segundos). Reabre la conexión si el servidor la cerró."""
+        conexion = getattr(self._local, 'conexion', None)
+        if conexion is None:
+            conexion = self._local.conexion = http.client.HTTPConnection(
+                self._destino.hostname, self._destino.port or 80, timeout=self._timeout
+            )
+        cabeceras = {'Content-Type': 'application/json'}
+        if token:
+            cabeceras['Authorization'] = f"Bearer {token}"
+
+        inicio = time.perf_counter()
+        try:
+            conexion.request('POST', ruta, json.dumps(cuerpo), cabeceras)
+            respuesta = conexion.getresponse()
+            contenido = respuesta.read()
+        except (OSError, http.client.HTTPException) as exc:
+            conexion.close()
+            self._local.conexion = None
+            return type(exc).__name__, None, None, time.perf_counter() - inicio
+        segundos = time.perf_counter() - inicio
+
+        consultas = CONSULTAS.search(respuesta.getheader('Server-Timing') or '')
+        try:
+            datos = json.loads(contenido)
+        except ValueError:
+            datos = None
+        return respuesta.status, datos, int(consultas.group(1)) if consultas else None, segundos
+
+    # --------------------------------------------------------------------------
+    # FLUJO COMPLETO
+    # --------------------------------------------------------------------------
+    def _ejecutar(self, casos, permisos, correos, options):
+        self._local = threading.local()
+        self._destino = urlsplit(options['url'])
+        self._timeout = options['timeout']
+        medidas = {paso: [] for paso in PASOS}
+        clave = options['clave']
+
+        def anotar(paso, resultado):
+            codigo, datos, consultas, segundos = resultado
+            medidas[paso].append((codigo, consultas, segundos))
+            return codigo, datos
+
+        def flujo(n):
+            jefe, empresa_id, empleado_id = casos[n % len(casos)]
+            try:
+                codigo, datos = anotar('login', self._post('/api/login/', {'username': jefe, 'password': clave}))
+                if codigo != 200:
+                    return
+                token = datos['access']
+                anotar('select-empresa', self._post('/api/select-empresa/', {'empresa_id': empresa_id}, token))
+
+                permiso = permisos[n % len(permisos)]
+                for accion in ('add', 'remove'):
+                    anotar('delegar-permiso', self._post('/api/delegar-permiso/', {
+                        'usuario_destino_id': empleado_id, 'empresa_id': empresa_id,
+                        'permiso_codename': permiso, 'accion': accion,
+                    }, token))
+
+                anotar('password-reset', self._post('/api/password-reset/', {'email': correos[empleado_id]}))
+                # El enlace del correo se arma aquí mismo (misma SECRET_KEY y BD que el servidor)
+                empleado = User.objects.get(pk=empleado_id)
+                anotar('password-reset-confirm', self._post('/api/password-reset-confirm/', {
+                    'uidb64': urlsafe_base64_encode(force_bytes(empleado.pk)),
+                    'token': default_token_generator.make_token(empleado),
+                    'password': clave,
+                }))
+            finally:
+                connections.close_all()
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrencia']) as pool:
+            list(pool.map(flujo, range(options['flujos'])))
+        return {'transcurrido': time.perf_counter() - inicio, 'medidas': medidas}
+
+    # --------------------------------------------------------------------------
+    # REPORTE Y COMPARACIÓN
+    # --------------------------------------------------------------------------
+    @staticmethod
+    def _resumir(resultados, options):
+        transcurrido = resultados['transcurrido']
+
+        def percentil(valores, p):
+            return valores[min(len(valores) - 1, int(len(valores) * p))] if valores else None
+
+        pasos = {}
+        for paso, medidas in resultados['medidas'].items():
+            latencias = sorted(s * 1000 for _, _, s in medidas)
+            consultas = sorted(c for _, c, _ in medidas if c is not None)
+            pasos[paso] = {
+                'peticiones': len(medidas),
+                'req_seg': round(len(medidas) / transcurrido, 1),
+                'p50_ms': round(percentil(latencias, 0.50) or 0, 1),
+                'p95_ms': round(percentil(latencias, 0.95) or 0, 1),
+                'p99_ms': round(percentil(latencias, 0.99) or 0, 1),
+                'consultas_p50': percentil(consultas, 0.50),
+                'consultas_max': consultas[-1] if consultas else None,
+                'codigos': dict(Counter(str(c) for c, _, _ in medidas)),
+            }
+        return {
+            'url': options['url'],
+            'concurrencia': options['concurrencia'],
+            'flujos': options['flujos'],
+            'segundos': round(transcurrido, 2),
+            'flujos_seg': round(options['flujos'] / transcurrido, 1),
+            'pasos': pasos,
+        }
+
+    def _imprimir(self, reporte):
+        self.stdout.write(
+            f"URL: {reporte['url']} | Concurrencia: {reporte['concurrencia']} | Flujos: {reporte['flujos']}"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Throughput: {reporte['flujos_seg']} flujos/seg en {reporte['segundos']}s"
+        ))
+        self.stdout.write(
+            f"{'Paso':<24}{'n':>6}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'SQL p50/máx':>13}  Respuestas"
+        )
+        for paso, datos in reporte['pasos'].items():
+            consultas = f"{datos['consultas_p50'] if datos['consultas_p50'] is not None else '-'}/" \
+                        f"{datos['consultas_max'] if datos['consultas_max'] is not None else '-'}"
+            codigos = ', '.join(f"{k}={v}" for k, v in sorted(datos['codigos'].items()))
+            self.stdout.write(
+                f"{paso:<24}{datos['peticiones']:>6}{datos['req_seg']:>8}{datos['p50_ms']:>9}"
+                f"{datos['p95_ms']:>9}{datos['p99_ms']:>9}{consultas:>13}  {codigos}"
+            )
+
+    def _imprimir_comparacion(self, reportes):
+        """Una fila por paso: p50/p95 y req/s de cada modo, lado a lado."""
+        modos = list(reportes)
+        self.stdout.write(self.style.MIGRATE_HEADING("\n=== Comparación por modo ==="))
+        self.stdout.write('Flujos/seg: ' + ' | '.join(f"{m}={reportes[m]['flujos_seg']}" for m in modos))
+        encabezado = ''.join(f"{f'{m} p50/p95 ms':>22}{f'{m} req/s':>12}" for m in modos)
+        self.stdout.write(f"{'Paso':<24}{encabezado}")
+        for paso in reportes[modos[0]]['pasos']:
+            fila = ''
+            for modo in modos:
+                datos = reportes[modo]['pasos'][paso]
+                fila += f"{datos['p50_ms']:>13}/{datos['p95_ms']:<8}{datos['req_seg']:>12}"
+            self.stdout.write(f"{paso:<24}{fila}")
+
+    def _comparar(self, reporte, ruta, tolerancia):
+        with open(ruta, encoding='utf-8') as archivo:
+            base = json.load(archivo)
+
+        regresiones = []
+        for paso, previo in base.get('pasos', {}).items():
+            actual = reporte['pasos'].get(paso)
+            if not actual or not actual['peticiones']:
+                continue
+            if previo.get('p95_ms') and actual['p95_ms'] > previo['p95_ms'] * (1 + tolerancia):
+                regresiones.append(f"{paso}: p95 {previo['p95_ms']} ms -> {actual['p95_ms']} ms")
+            if previo.get('consultas_max') is not None and (actual['consultas_max'] or 0) > previo['consultas_max']:
+                regresiones.append(f"{paso}: consultas máx {previo['consultas_max']} -> {actual['consultas_max']}")
+
+        if regresiones:
+            raise CommandError("Regresiones frente a la línea base:\n  " + "\n  ".join(regresiones))
+        self.stdout.write(self.style.SUCCESS(f"[OK] Sin regresiones frente a {ruta} (tolerancia p95 {tolerancia:.0%})."))
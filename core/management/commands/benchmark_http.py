@@ -0,0 +1,133 @@
+import asyncio
+import json
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de carga HTTP contra un servidor YA levantado (WSGI o ASGI). '
+        'Usa un cliente asyncio propio para sostener miles de conexiones simultáneas.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='Ej: http://localhost:8000/api/select-empresa/')
+        parser.add_argument('--json', default='{}', help='Cuerpo JSON del POST (default: {})')
+        parser.add_argument('--login', help="'usuario:clave' para obtener un Bearer token en /api/login/ antes de medir")
+        parser.add_argument('--token', help='Bearer token a enviar (alternativa a --login)')
+        parser.add_argument('--concurrencia', type=int, default=50, help='Conexiones simultáneas (default: 50)')
+        parser.add_argument('--peticiones', type=int, default=1000, help='Total de peticiones (default: 1000)')
+        parser.add_argument(
+            '--cliente-lento', type=float, default=0.0,
+            help='Segundos que cada cliente tarda en enviar el cuerpo (simula redes lentas)'
+        )
+        parser.add_argument('--timeout', type=float, default=30.0, help='Timeout por petición en segundos')
+
+    def handle(self, *args, **options):
+        resultados = asyncio.run(self._ejecutar(options))
+        self._reportar(resultados, options)
+
+    # --------------------------------------------------------------------------
+    # CLIENTE HTTP MÍNIMO (HTTP/1.1, una conexión por petición)
+    # --------------------------------------------------------------------------
+    @staticmethod
+    async def _post(url, cuerpo, token=None, retraso=0.0):
+        partes = urlsplit(url)
+        seguro = partes.scheme == 'https'
+        puerto = partes.port or (443 if seguro else 80)
+        ruta = partes.path or '/'
+        if partes.query:
+            ruta += f'?{partes.query}'
+
+        reader, writer = await asyncio.open_connection(partes.hostname, puerto, ssl=seguro or None)
+        try:
+            cabeceras = [
+                f'POST {ruta} HTTP/1.1',
+                f'Host: {partes.netloc}',
+                'Content-Type: application/json',
+                f'Content-Length: {len(cuerpo)}',
+                'Connection: close',
+            ]
+            if token:
+                cabeceras.append(f'Authorization: Bearer {token}')
+            writer.write(('\r\n'.join(cabeceras) + '\r\n\r\n').encode())
+            await writer.drain()
+            if retraso:
+                await asyncio.sleep(retraso)
+            writer.write(cuerpo)
+            await writer.drain()
+
+            linea_estado = await reader.readline()
+            respuesta = await reader.read()
+        finally:
+            writer.close()
+
+        codigo = int(linea_estado.split()[1]) if linea_estado else 0
+        _, _, contenido = respuesta.partition(b'\r\n\r\n')
+        return codigo, contenido
+
+    async def _ejecutar(self, options):
+        token = options['token']
+        if options['login']:
+            usuario, _, clave = options['login'].partition(':')
+            partes = urlsplit(options['url'])
+            url_login = f"{partes.scheme}://{partes.netloc}/api/login/"
+            codigo, contenido = await self._post(
+                url_login, json.dumps({'username': usuario, 'password': clave}).encode()
+            )
+            if codigo != 200:
+                raise CommandError(f"Login de preparación falló ({codigo}): {contenido[:200]!r}")
+            token = json.loads(contenido)['access']
+
+        cuerpo = options['json'].encode()
+        pendientes = iter(range(options['peticiones']))
+        latencias = []
+        codigos = Counter()
+
+        async def cliente():
+            for _ in pendientes:
+                inicio = time.perf_counter()
+                try:
+                    codigo, _ = await asyncio.wait_for(
+                        self._post(options['url'], cuerpo, token, options['cliente_lento']),
+                        options['timeout'],
+                    )
+                except (OSError, asyncio.TimeoutError, ValueError, IndexError) as exc:
+                    codigos[type(exc).__name__] += 1
+                    continue
+                latencias.append(time.perf_counter() - inicio)
+                codigos[codigo] += 1
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(cliente() for _ in range(options['concurrencia'])))
+        return {
+            'transcurrido': time.perf_counter() - inicio,
+            'latencias': sorted(latencias),
+            'codigos': codigos,
+        }
+
+    def _reportar(self, resultados, options):
+        latencias = resultados['latencias']
+        transcurrido = resultados['transcurrido']
+
+        def percentil(p):
+            if not latencias:
+                return 0.0
+            return latencias[min(len(latencias) - 1, int(len(latencias) * p))] * 1000
+
+        self.stdout.write(f"URL: {options['url']}")
+        self.stdout.write(
+            f"Concurrencia: {options['concurrencia']} | Peticiones: {options['peticiones']} | "
+            f"Cliente lento: {options['cliente_lento']}s"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Throughput: {len(latencias) / transcurrido:.1f} req/seg en {transcurrido:.2f}s"
+        ))
+        self.stdout.write(
+            f"Latencia p50: {percentil(0.50):.1f} ms | p95: {percentil(0.95):.1f} ms | "
+            f"p99: {percentil(0.99):.1f} ms"
+        )
+        self.stdout.write("Respuestas: " + ", ".join(f"{k}={v}" for k, v in sorted(resultados['codigos'].items(), key=str)))
@@ -0,0 +1,83 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import get_hasher, make_password, verify_password
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from core.autenticacion import LoginSaturadoError, ejecutar_hash
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el throughput de verificación de claves (logins/seg y logins/seg por núcleo) '
+        'a través del pool acotado, para el hasher y parámetros actuales o indicados.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hasher', choices=['pbkdf2', 'scrypt', 'argon2'], help='Hasher a medir (default: el preferido en settings)')
+        parser.add_argument('--concurrencia', type=int, default=os.cpu_count() or 1, help='Clientes simultáneos (default: núcleos)')
+        parser.add_argument('--duracion', type=float, default=10.0, help='Segundos de medición (default: 10)')
+        parser.add_argument('--hilos-pool', type=int, help='Sobrescribe LOGIN_HASH_WORKERS durante la medición')
+        parser.add_argument('--cola-max', type=int, help='Sobrescribe LOGIN_HASH_COLA_MAX durante la medición')
+
+    def handle(self, *args, **options):
+        ajustes = {}
+        if options['hasher']:
+            ajustes['PASSWORD_HASHERS'] = [{
+                'pbkdf2': 'core.hashers.PBKDF2Ajustado',
+                'scrypt': 'core.hashers.ScryptAjustado',
+                'argon2': 'core.hashers.Argon2Ajustado',
+            }[options['hasher']]]
+        if options['hilos_pool']:
+            ajustes['LOGIN_HASH_WORKERS'] = options['hilos_pool']
+        if options['cola_max'] is not None:
+            ajustes['LOGIN_HASH_COLA_MAX'] = options['cola_max']
+
+        with override_settings(**ajustes):
+            self._medir(options['concurrencia'], options['duracion'])
+
+    def _medir(self, concurrencia, duracion):
+        # El pool se crea perezosamente con los settings vigentes en ese momento
+        import core.autenticacion as autenticacion
+        autenticacion._pool = autenticacion._cupos = None
+
+        hasher = get_hasher('default')
+        encoded = make_password('clave-de-benchmark-123')
+        self.stdout.write(f"Hasher: {hasher.algorithm} | {hasher.safe_summary(encoded)}")
+        self.stdout.write(f"Concurrencia: {concurrencia} | Duración: {duracion}s | Núcleos: {os.cpu_count()}")
+
+        fin = time.perf_counter() + duracion
+
+        def cliente():
+            ok = rechazados = 0
+            latencias = []
+            while time.perf_counter() < fin:
+                inicio = time.perf_counter()
+                try:
+                    ejecutar_hash(verify_password, 'clave-de-benchmark-123', encoded)
+                    ok += 1
+                    latencias.append(time.perf_counter() - inicio)
+                except LoginSaturadoError:
+                    rechazados += 1
+                    time.sleep(0.01)  # Un cliente real esperaría el Retry-After
+            return ok, rechazados, latencias
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrencia) as clientes:
+            resultados = list(clientes.map(lambda _: cliente(), range(concurrencia)))
+        transcurrido = time.perf_counter() - inicio
+
+        total_ok = sum(r[0] for r in resultados)
+        total_rechazados = sum(r[1] for r in resultados)
+        latencias = sorted(l for r in resultados for l in r[2])
+
+        por_segundo = total_ok / transcurrido
+        self.stdout.write(self.style.SUCCESS(f"\nLogins verificados: {total_ok} ({por_segundo:.1f}/seg)"))
+        self.stdout.write(f"Logins/seg por núcleo: {por_segundo / (os.cpu_count() or 1):.2f}")
+        self.stdout.write(f"Rechazados por saturación (503): {total_rechazados}")
+        if latencias:
+            p50 = latencias[len(latencias) // 2] * 1000
+            p99 = latencias[min(len(latencias) - 1, int(len(latencias) * 0.99))] * 1000
+            self.stdout.write(f"Latencia p50: {p50:.1f} ms | p99: {p99:.1f} ms")
@@ -0,0 +1,87 @@
+import random
+import time
+
+import jwt
+from django.contrib.auth.models import Permission
+from django.core.management.base import BaseCommand
+from rest_framework_simplejwt.tokens import AccessToken
+
+from hub_pasaporte import ClaveCompartida, RegistroEstatico, VerificadorPasaporte
+from hub_pasaporte.compacto import codificar_bits, expandir_bits
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara el Pasaporte con permisos como lista "app.codename" contra el formato '
+        'compacto (mapa de bits): tamaño de la cabecera Authorization y velocidad de '
+        'codificar/expandir. No escribe en la BD.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--registro', type=int, help='Tamaño del registro (default: todos los Permission; se rellena con permisos sintéticos si es mayor)')
+        parser.add_argument('--permisos', type=int, nargs='+', default=[10, 50, 200], help='Permisos por usuario a medir (default: 10 50 200)')
+        parser.add_argument('--iteraciones', type=int, default=20000, help='Repeticiones por medición (default: 20000)')
+
+    def handle(self, *args, **options):
+        nombres = sorted(
+            f"{app}.{codename}"
+            for app, codename in Permission.objects.values_list('content_type__app_label', 'codename')
+        )
+        tamano = options['registro'] or len(nombres)
+        nombres += [f"core.modulo_sintetico_{i:05d}" for i in range(tamano - len(nombres))]
+        nombres = nombres[:tamano]
+        indices = {nombre: bit for bit, nombre in enumerate(nombres)}
+
+        clave = 'clave-de-benchmark'
+        verificador = VerificadorPasaporte(ClaveCompartida(clave), tamano_cache=0, registro=RegistroEstatico(nombres))
+        iteraciones = options['iteraciones']
+        rng = random.Random(42)
+
+        self.stdout.write(f"Registro: {len(nombres)} permisos | Iteraciones: {iteraciones}")
+        for cantidad in options['permisos']:
+            permisos = sorted(rng.sample(nombres, min(cantidad, len(nombres))))
+
+            lista = self._token(clave, permisos=permisos)
+            bits = codificar_bits(indices[p] for p in permisos)
+            compacto = self._token(clave, permisos_bits=bits, permisos_reg=len(nombres))
+
+            t_cod_lista = self._medir(iteraciones, lambda: list(permisos))
+            t_cod_bits = self._medir(iteraciones, lambda: codificar_bits(indices[p] for p in permisos))
+            t_exp_lista = self._medir(iteraciones, lambda: frozenset(permisos))
+            t_exp_bits = self._medir(iteraciones, lambda: expandir_bits(bits, nombres))
+            t_ver_lista = self._medir(iteraciones // 10, lambda: verificador.verificar(lista))
+            t_ver_bits = self._medir(iteraciones // 10, lambda: verificador.verificar(compacto))
+
+            cab_lista = len(f"Bearer {lista}")
+            cab_bits = len(f"Bearer {compacto}")
+            self.stdout.write(self.style.SUCCESS(f"\n{len(permisos)} permisos por usuario"))
+            self.stdout.write(
+                f"  Cabecera Authorization: lista {cab_lista} B | compacto {cab_bits} B "
+                f"({100 * (1 - cab_bits / cab_lista):.1f}% menos)"
+            )
+            self.stdout.write(f"  Codificar claim:  lista {t_cod_lista:.2f} µs | compacto {t_cod_bits:.2f} µs")
+            self.stdout.write(f"  Expandir a set:   lista {t_exp_lista:.2f} µs | compacto {t_exp_bits:.2f} µs")
+            self.stdout.write(f"  Verificar token:  lista {t_ver_lista:.2f} µs | compacto {t_ver_bits:.2f} µs")
+
+    @staticmethod
+    def _token(clave, **claims):
+        """Pasaporte con claims representativos (mismos que emitir_pasaporte)."""
+        token = AccessToken()
+        token['user_id'] = 12345
+        token.payload.update({
+            'empresa_id': 1, 'empresa_codigo': 'PROVEFRUT', 'empresa_nombre': 'Provefrut S.A.',
+            'rol_nombre': 'Jefe de Compras', 'username': 'jperez',
+            'email': 'jperez@provefrut.com', 'nombre_completo': 'Juan Perez',
+        })
+        token.payload.update(claims)
+        # Firmado con la clave del benchmark para verificarlo fuera de SIMPLE_JWT
+        return jwt.encode(token.payload, clave, algorithm='HS256')
+
+    @staticmethod
+    def _medir(iteraciones, funcion):
+        """Microsegundos promedio por llamada."""
+        iteraciones = max(iteraciones, 1)
+        inicio = time.perf_counter()
+        for _ in range(iteraciones):
+            funcion()
+        return (time.perf_counter() - inicio) / iteraciones * 1e6
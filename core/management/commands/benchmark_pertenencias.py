@@ -0,0 +1,113 @@
+import csv
+import io
+import json
+import os
+import random
+import tempfile
+import time
+
+from django.contrib.auth.models import Group, Permission
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from core.importacion import COLUMNAS, ImportadorPertenencias, exportar_pertenencias, leer_filas
+from core.models import Area, Empresa, PerfilGrupo
+
+
+class Rollback(Exception):
+    """Deshace todo lo creado por el benchmark."""
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide import_pertenencias / export_pertenencias con datos sintéticos '
+        '(default: 50.000 filas). Todo se ejecuta en una transacción que se revierte al final.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, default=50000, help='Filas a importar (default: 50000)')
+        parser.add_argument('--empresas', type=int, default=5, help='Empresas sintéticas (default: 5)')
+        parser.add_argument('--lote', type=int, default=2000, help='Filas por lote (default: 2000)')
+        parser.add_argument('--formato', choices=['csv', 'jsonl'], default='csv')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._ejecutar(options)
+                raise Rollback()
+        except Rollback:
+            self.stdout.write("\n(Datos sintéticos revertidos)")
+
+    def _ejecutar(self, options):
+        filas, lote, formato = options['filas'], options['lote'], options['formato']
+
+        # 1. Catálogos sintéticos
+        area = Area.objects.create(nombre='BENCH Área', codigo='BENCH')
+        empresas = [
+            Empresa.objects.create(nombre=f'BENCH Empresa {i}', codigo=f'BN{i:03d}')
+            for i in range(options['empresas'])
+        ]
+        grupos = []
+        for i in range(4):
+            grupo = Group.objects.create(name=f'BENCH_ROL_{i}')
+            grupo.permissions.set(Permission.objects.order_by('?')[:5])
+            PerfilGrupo.objects.create(grupo=grupo, area=area)
+            grupos.append(grupo.name)
+        permisos = [f"{app}.{codename}" for app, codename in Permission.objects.values_list('content_type__app_label', 'codename')[:30]]
+
+        # 2. Archivo sintético: cada usuario pertenece a todas las empresas
+        rng = random.Random(7)
+        usuarios = -(-filas // len(empresas))
+        descriptor, ruta = tempfile.mkstemp(suffix=f'.{formato}')
+        with os.fdopen(descriptor, 'w', encoding='utf-8', newline='') as archivo:
+            escritor = csv.writer(archivo)
+            if formato == 'csv':
+                escritor.writerow(COLUMNAS)
+            for n in range(filas):
+                u, e = divmod(n, len(empresas))
+                extra = rng.sample(permisos, 2) if n % 10 == 0 else []
+                valores = (
+                    f'bench_u{u:06d}', empresas[e].codigo, rng.choice(grupos), 'BENCH', '|'.join(extra),
+                    f'bench_u{u:06d}@provefrut.com', 'Usuario', f'Bench {u}',
+                )
+                if formato == 'csv':
+                    escritor.writerow(valores)
+                else:
+                    fila = dict(zip(COLUMNAS, valores))
+                    fila['permisos_adicionales'] = extra
+                    archivo.write(json.dumps(fila) + '\n')
+        self.stdout.write(f"Archivo: {filas} filas, {usuarios} usuarios x {len(empresas)} empresas ({os.path.getsize(ruta) / 1e6:.1f} MB)")
+
+        try:
+            # 3. Importación inicial (crea usuarios + perfiles + pertenencias + excepciones)
+            self._medir_importacion("Importación (altas)", ruta, formato, lote)
+            # 4. Reimportación del mismo archivo (camino de actualización, sin cambios)
+            self._medir_importacion("Reimportación (sin cambios)", ruta, formato, lote)
+        finally:
+            os.remove(ruta)
+
+        # 5. Exportación
+        salida = io.StringIO()
+        with CaptureQueriesContext(connection) as consultas:
+            inicio = time.perf_counter()
+            total = exportar_pertenencias(salida, formato, lote)
+            transcurrido = time.perf_counter() - inicio
+        self._reportar("Exportación", total, transcurrido, len(consultas))
+
+    def _medir_importacion(self, titulo, ruta, formato, lote):
+        with open(ruta, encoding='utf-8', newline='') as archivo, CaptureQueriesContext(connection) as consultas:
+            inicio = time.perf_counter()
+            contadores = ImportadorPertenencias(crear_usuarios=True, tamano_lote=lote).importar(leer_filas(archivo, formato))
+            transcurrido = time.perf_counter() - inicio
+        self._reportar(titulo, contadores['filas'], transcurrido, len(consultas))
+        self.stdout.write(
+            f"   usuarios creados={contadores['usuarios_creados']} creadas={contadores['pertenencias_creadas']} "
+            f"actualizadas={contadores['pertenencias_actualizadas']} excepciones={contadores['excepciones_cambiadas']}"
+        )
+
+    def _reportar(self, titulo, filas, transcurrido, consultas):
+        self.stdout.write(self.style.SUCCESS(
+            f"{titulo}: {filas} filas en {transcurrido:.2f}s "
+            f"({filas / transcurrido:.0f} filas/seg) | {consultas} consultas SQL"
+        ))
@@ -0,0 +1,38 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.delegacion import vencer_delegaciones
+
+
+class Command(BaseCommand):
+    help = (
+        'Revoca las delegaciones temporales vencidas (vence_en) en lotes: auditoría, PermisoEfectivo y caché. '
+        'Idempotente; pensado para cron cada minuto o como worker con --continuo.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=2000, help='Revocaciones por transacción (default: 2000)')
+        parser.add_argument('--continuo', action='store_true', help='No terminar: revisar cada --intervalo segundos')
+        parser.add_argument('--intervalo', type=float, default=60.0, help='Segundos entre revisiones con --continuo')
+
+    def handle(self, *args, **options):
+        self.detener = False
+        signal.signal(signal.SIGTERM, self._senal_detener)
+        signal.signal(signal.SIGINT, self._senal_detener)
+
+        while not self.detener:
+            close_old_connections()
+            inicio = time.perf_counter()
+            revocadas = vencer_delegaciones(tamano_lote=options['lote'])
+            if revocadas or not options['continuo']:
+                self.stdout.write(f"Delegaciones vencidas revocadas: {revocadas} ({time.perf_counter() - inicio:.2f}s)")
+            if not options['continuo']:
+                break
+            time.sleep(options['intervalo'])
+
+    def _senal_detener(self, *args):
+        # Terminamos el lote en curso y salimos limpio
+        self.detener = True
@@ -0,0 +1,41 @@
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.auditoria import exportar_eventos
+
+
+def _fecha(texto):
+    """'2026-01-31' o '2026-01-31T08:00' (hora local del servidor)."""
+    try:
+        valor = datetime.fromisoformat(texto)
+    except ValueError:
+        raise CommandError(f"Fecha inválida: {texto}")
+    if len(texto) == 10:
+        valor = datetime.combine(valor.date(), time.min)
+    return timezone.make_aware(valor) if timezone.is_naive(valor) else valor
+
+
+class Command(BaseCommand):
+    help = 'Exporta el historial de auditoría en streaming como JSONL (un evento por línea) para el SIEM.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', nargs='?', default='-', help="Ruta de salida (default: stdout)")
+        parser.add_argument('--desde', type=_fecha, help='Fecha/hora inicial (incluida), ISO 8601')
+        parser.add_argument('--hasta', type=_fecha, help='Fecha/hora final (excluida), ISO 8601')
+        parser.add_argument('--desde-id', type=int, help='Solo eventos con id mayor (exportación incremental)')
+        parser.add_argument('--lote', type=int, default=2000, help='Eventos por consulta (default: 2000)')
+
+    def handle(self, *args, **options):
+        filtros = dict(desde=options['desde'], hasta=options['hasta'], desde_id=options['desde_id'], tamano_lote=options['lote'])
+
+        if options['archivo'] == '-':
+            exportar_eventos(self.stdout, **filtros)
+            return
+
+        with open(options['archivo'], 'w', encoding='utf-8') as salida:
+            total, ultimo_id = exportar_eventos(salida, **filtros)
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {total} eventos exportados a {options['archivo']} (último id: {ultimo_id}; usar --desde-id {ultimo_id} la próxima vez)"
+        ))
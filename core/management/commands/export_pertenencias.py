@@ -0,0 +1,26 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from core.importacion import exportar_pertenencias
+
+
+class Command(BaseCommand):
+    help = 'Exporta las Pertenencias en streaming (CSV o JSONL), en el formato que acepta import_pertenencias.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', nargs='?', default='-', help="Ruta de salida (default: stdout)")
+        parser.add_argument('--formato', choices=['csv', 'jsonl'], help='Default: según la extensión del archivo (stdout: csv)')
+        parser.add_argument('--empresa', help='Solo las Pertenencias de esta Empresa (código)')
+        parser.add_argument('--lote', type=int, default=2000, help='Filas por consulta (default: 2000)')
+
+    def handle(self, *args, **options):
+        formato = options['formato'] or ('jsonl' if options['archivo'].endswith(('.jsonl', '.ndjson')) else 'csv')
+
+        if options['archivo'] == '-':
+            total = exportar_pertenencias(self.stdout, formato, options['lote'], options['empresa'])
+            return
+
+        with open(options['archivo'], 'w', encoding='utf-8', newline='') as salida:
+            total = exportar_pertenencias(salida, formato, options['lote'], options['empresa'])
+        self.stdout.write(self.style.SUCCESS(f"✅ {total} Pertenencias exportadas a {options['archivo']}"))
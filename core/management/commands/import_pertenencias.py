@@ -0,0 +1,59 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.importacion import ErrorImportacion, ImportadorPertenencias, leer_filas
+
+
+class DryRun(Exception):
+    """Fuerza el ROLLBACK de la transacción en --dry-run."""
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa Pertenencias (usuario, empresa, grupo, área, excepciones) desde CSV o JSONL, '
+        'en lotes con escrituras masivas y dentro de una sola transacción.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help="Ruta del archivo, o '-' para stdin")
+        parser.add_argument('--formato', choices=['csv', 'jsonl'], help='Default: según la extensión del archivo')
+        parser.add_argument('--lote', type=int, default=2000, help='Filas por lote (default: 2000)')
+        parser.add_argument('--crear-usuarios', action='store_true', help='Crear los usuarios que no existan (sin clave utilizable)')
+        parser.add_argument('--dry-run', action='store_true', help='Validar y contar sin guardar nada')
+
+    def handle(self, *args, **options):
+        formato = options['formato'] or ('jsonl' if options['archivo'].endswith(('.jsonl', '.ndjson')) else 'csv')
+        archivo = sys.stdin if options['archivo'] == '-' else open(options['archivo'], encoding='utf-8', newline='')
+
+        inicio = time.perf_counter()
+        try:
+            with transaction.atomic():
+                importador = ImportadorPertenencias(
+                    crear_usuarios=options['crear_usuarios'], tamano_lote=options['lote']
+                )
+                contadores = importador.importar(leer_filas(archivo, formato))
+                if options['dry_run']:
+                    raise DryRun()
+        except DryRun:
+            pass
+        except ErrorImportacion as exc:
+            raise CommandError(f"{exc} No se guardó ningún cambio.")
+        finally:
+            if archivo is not sys.stdin:
+                archivo.close()
+        transcurrido = time.perf_counter() - inicio
+
+        prefijo = "[DRY-RUN] " if options['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefijo}✅ {contadores['filas']} filas en {transcurrido:.2f}s "
+            f"({contadores['filas'] / transcurrido if transcurrido else 0:.0f} filas/seg)"
+        ))
+        self.stdout.write(
+            f"   Usuarios creados: {contadores['usuarios_creados']} | "
+            f"Pertenencias creadas: {contadores['pertenencias_creadas']} | "
+            f"actualizadas: {contadores['pertenencias_actualizadas']} | "
+            f"Excepciones cambiadas: {contadores['excepciones_cambiadas']}"
+        )
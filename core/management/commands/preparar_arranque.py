@@ -0,0 +1,47 @@
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.arranque import calcular_huella, guardar_huella, huella_guardada
+
+# Clave del advisory lock de Postgres: un solo contenedor migra a la vez
+CANDADO_ARRANQUE = 0x4855_4241  # "HUBA"
+
+
+class Command(BaseCommand):
+    help = (
+        'Prepara el arranque del contenedor: migrate + sync_permisos_full solo si cambió la huella '
+        '(migraciones + permisos declarados), y la llave de firma si falta. Uso: entrypoint.sh'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--forzar', action='store_true', help='Aplicar aunque la huella no haya cambiado')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        huella = calcular_huella()
+
+        if not options['forzar'] and huella == huella_guardada():
+            self.stdout.write(f"⏩ Esquema y permisos sin cambios (huella {huella[:12]}): se omite migrate.")
+        else:
+            with connection.cursor() as cursor:
+                # Si escalan varios contenedores a la vez, el resto espera aquí y luego ve la huella nueva
+                cursor.execute("SELECT pg_advisory_lock(%s)", [CANDADO_ARRANQUE])
+                try:
+                    if options['forzar'] or huella != huella_guardada():
+                        self.stdout.write("📦 Aplicando migraciones...")
+                        call_command('migrate', interactive=False, verbosity=options['verbosity'])
+                        self.stdout.write("🛡️ Sincronizando permisos...")
+                        call_command('sync_permisos_full', verbosity=options['verbosity'])
+                        guardar_huella(huella)
+                finally:
+                    cursor.execute("SELECT pg_advisory_unlock(%s)", [CANDADO_ARRANQUE])
+
+        # Llave de firma del Pasaporte (solo RS256/EdDSA; no rota si ya existe una)
+        if settings.JWT_FIRMA != 'HS256':
+            call_command('rotate_signing_key', si_falta=True, verbosity=options['verbosity'])
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Arranque preparado en {time.perf_counter() - inicio:.2f}s"))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.models import PermisoEfectivo
+from core.permisos import calcular_filas_desde_origen, invalidar_permisos_globales
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye en bloque la tabla PermisoEfectivo desde Grupos + Excepciones.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Filas por INSERT masivo (default: 5000)')
+
+    def handle(self, *args, **options):
+        self.stdout.write("Recalculando permisos efectivos desde el origen...")
+        filas = calcular_filas_desde_origen()
+
+        # Todo o nada: los lectores ven la tabla vieja hasta el COMMIT.
+        with transaction.atomic():
+            borradas, _ = PermisoEfectivo.objects.all().delete()
+            PermisoEfectivo.objects.bulk_create(
+                (
+                    PermisoEfectivo(pertenencia_id=pk, usuario_id=usuario_id, empresa_id=empresa_id, permiso=permiso)
+                    for pk, usuario_id, empresa_id, permiso in filas
+                ),
+                batch_size=options['batch_size'],
+            )
+            invalidar_permisos_globales()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Tabla reconstruida: {borradas} filas eliminadas, {len(filas)} filas insertadas."
+        ))
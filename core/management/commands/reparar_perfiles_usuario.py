@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from core.aprovisionamiento import reparar_perfiles, usuarios_sin_perfil
+
+
+class Command(BaseCommand):
+    help = (
+        'Crea el PerfilUsuario de los usuarios que no lo tienen (p. ej. creados con bulk_create), '
+        'detectándolos con una sola consulta anti-join.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Solo listar los usuarios afectados')
+        parser.add_argument(
+            '--sin-forzar-cambio', action='store_true',
+            help='Crear los perfiles con debe_cambiar_password=False (default: se fuerza el cambio)'
+        )
+        parser.add_argument('--mostrar', type=int, default=20, help='Máximo de usuarios a listar (default: 20)')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            afectados = list(usuarios_sin_perfil().order_by('pk').values_list('username', flat=True))
+            for username in afectados[:options['mostrar']]:
+                self.stdout.write(f"  Sin perfil: {username}")
+            self.stdout.write(self.style.WARNING(f"[DRY-RUN] {len(afectados)} usuarios sin PerfilUsuario."))
+            return
+
+        reparados = reparar_perfiles(debe_cambiar_password=not options['sin_forzar_cambio'])
+        self.stdout.write(self.style.SUCCESS(f"✅ {len(reparados)} perfiles creados."))
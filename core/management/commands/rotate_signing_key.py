@@ -0,0 +1,57 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.firmas import ALGORITMOS_ASIMETRICOS, obtener_almacen
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera una nueva llave de firma del Pasaporte (RS256/EdDSA) y la activa. '
+        'La llave anterior sigue publicada en el JWKS y aceptada durante el solapamiento.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--algoritmo', choices=ALGORITMOS_ASIMETRICOS,
+            help='Algoritmo de la llave nueva (default: JWT_FIRMA, o RS256 si JWT_FIRMA=HS256)'
+        )
+        parser.add_argument(
+            '--solapamiento', type=int,
+            help='Segundos que la llave saliente sigue aceptándose (default: JWT_CLAVES_SOLAPAMIENTO)'
+        )
+        parser.add_argument('--si-falta', action='store_true', help='Solo crear una llave si no hay ninguna activa (uso en el arranque)')
+        parser.add_argument('--listar', action='store_true', help='Solo mostrar las llaves actuales, sin rotar')
+
+    def handle(self, *args, **options):
+        almacen = obtener_almacen()
+
+        if options['listar'] or (options['si_falta'] and almacen.estado()['activa']):
+            self._listar(almacen)
+            return
+
+        algoritmo = options['algoritmo'] or (settings.JWT_FIRMA if settings.JWT_FIRMA in ALGORITMOS_ASIMETRICOS else 'RS256')
+        solapamiento = (
+            timedelta(seconds=options['solapamiento']) if options['solapamiento'] is not None
+            else settings.JWT_CLAVES_SOLAPAMIENTO
+        )
+
+        kid, eliminadas = almacen.rotar(algoritmo, solapamiento)
+        self.stdout.write(self.style.SUCCESS(f"Nueva llave activa: {kid} ({algoritmo})"))
+        for kid_viejo in eliminadas:
+            self.stdout.write(f"  Eliminada (solapamiento vencido): {kid_viejo}")
+        if settings.JWT_FIRMA == 'HS256':
+            self.stdout.write(self.style.WARNING(
+                "JWT_FIRMA=HS256: la llave no se usará hasta configurar JWT_FIRMA=RS256 o EdDSA."
+            ))
+        self._listar(almacen)
+
+    def _listar(self, almacen):
+        estado = almacen.estado()
+        if not estado['claves']:
+            self.stdout.write("No hay llaves en " + str(almacen.directorio))
+            return
+        for kid, clave in estado['claves'].items():
+            situacion = 'ACTIVA' if kid == estado['activa'] else f"retirada, aceptada hasta {clave['vence']}"
+            self.stdout.write(f"  {kid} [{clave['alg']}] {situacion}")
@@ -0,0 +1,42 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.correo import LimitadorTasa, procesar_lote
+
+
+class Command(BaseCommand):
+    help = 'Worker de la bandeja de salida: envía los correos encolados en lotes (reintentos + límite de tasa).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--una-vez', action='store_true', help='Vacía la cola disponible y termina (útil para cron/pruebas)')
+        parser.add_argument('--lote', type=int, default=settings.CORREO_LOTE, help='Correos por lote / conexión SMTP')
+        parser.add_argument('--intervalo', type=float, default=5.0, help='Segundos de espera cuando la cola está vacía')
+        parser.add_argument('--max-por-segundo', type=float, default=settings.CORREO_MAX_POR_SEGUNDO, help='Límite de envíos por segundo (0 = sin límite)')
+
+    def handle(self, *args, **options):
+        self.detener = False
+        signal.signal(signal.SIGTERM, self._senal_detener)
+        signal.signal(signal.SIGINT, self._senal_detener)
+
+        limitador = LimitadorTasa(options['max_por_segundo'])
+        self.stdout.write("📮 Worker de correos iniciado.")
+
+        while not self.detener:
+            close_old_connections()
+            enviados, fallidos = procesar_lote(options['lote'], limitador)
+            if enviados or fallidos:
+                self.stdout.write(f"Lote procesado: {enviados} enviados, {fallidos} con error.")
+                continue
+            if options['una_vez']:
+                break
+            time.sleep(options['intervalo'])
+
+        self.stdout.write(self.style.SUCCESS("Worker de correos detenido."))
+
+    def _senal_detener(self, *args):
+        # Terminamos el lote en curso y salimos limpio
+        self.detener = True
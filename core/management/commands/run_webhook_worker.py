@@ -0,0 +1,43 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.webhooks import procesar_lote
+
+
+class Command(BaseCommand):
+    help = 'Worker de webhooks: envía los eventos de permisos encolados, en lotes firmados y en orden por suscriptor.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--una-vez', action='store_true', help='Vacía la cola disponible y termina (útil para cron/pruebas)')
+        parser.add_argument('--lote', type=int, default=settings.WEBHOOK_LOTE, help='Eventos por POST')
+        parser.add_argument('--intervalo', type=float, default=2.0, help='Segundos de espera cuando no hay nada que enviar')
+
+    def handle(self, *args, **options):
+        self.detener = False
+        signal.signal(signal.SIGTERM, self._senal_detener)
+        signal.signal(signal.SIGINT, self._senal_detener)
+
+        self.stdout.write("📡 Worker de webhooks iniciado.")
+
+        while not self.detener:
+            close_old_connections()
+            entregados, fallidos = procesar_lote(options['lote'])
+            if entregados:
+                self.stdout.write(f"Lotes enviados: {entregados} eventos entregados, {fallidos} con error.")
+                continue
+            if fallidos:
+                # Los suscriptores que fallaron esperan su backoff: no insistimos en caliente
+                self.stdout.write(f"{fallidos} eventos con error (se reintentan con backoff).")
+            if options['una_vez']:
+                break
+            time.sleep(options['intervalo'])
+
+        self.stdout.write(self.style.SUCCESS("Worker de webhooks detenido."))
+
+    def _senal_detener(self, *args):
+        # Terminamos el lote en curso y salimos limpio
+        self.detener = True
@@ -0,0 +1,44 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.sintetico import limpiar_organizacion, sembrar_organizacion
+
+
+class Command(BaseCommand):
+    help = (
+        'Siembra una organización sintética (usuarios syn_uNNNNN, empresas SYNNN, áreas y roles SYN_*) '
+        'para benchmark_flujos. Determinista por semilla; repetirla solo completa lo que falta.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, default=2000)
+        parser.add_argument('--empresas', type=int, default=20)
+        parser.add_argument('--areas', type=int, default=8)
+        parser.add_argument('--roles-por-area', type=int, default=4, help='El primero de cada área es gerencial')
+        parser.add_argument('--empresas-por-usuario', type=int, default=3)
+        parser.add_argument('--tasa-excepciones', type=float, default=0.2,
+                            help='Fracción de Pertenencias con permisos_adicionales (default: 0.2)')
+        parser.add_argument('--clave', default='clave-sintetica-123', help='Clave común de los usuarios sintéticos')
+        parser.add_argument('--semilla', type=int, default=7)
+        parser.add_argument('--limpiar', action='store_true', help='Borrar la organización sintética en vez de sembrarla')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        if options['limpiar']:
+            conteos = limpiar_organizacion()
+        else:
+            if options['empresas_por_usuario'] > options['empresas']:
+                raise CommandError("--empresas-por-usuario no puede superar a --empresas.")
+            try:
+                conteos = sembrar_organizacion(
+                    usuarios=options['usuarios'], empresas=options['empresas'], areas=options['areas'],
+                    roles_por_area=options['roles_por_area'], empresas_por_usuario=options['empresas_por_usuario'],
+                    tasa_excepciones=options['tasa_excepciones'], clave=options['clave'], semilla=options['semilla'],
+                )
+            except ValueError as exc:
+                raise CommandError(str(exc))
+
+        self.stdout.write(json.dumps(conteos, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"[OK] {time.perf_counter() - inicio:.1f}s"))
@@ -1,74 +1,55 @@
+import json
+
 from django.core.management.base import BaseCommand
-from django.contrib.auth.models import Permission
-from django.contrib.contenttypes.models import ContentType
 
-# 1. IMPORTS: Solo traemos los modelos que existen realmente en models.py
-# (Ya quitamos ModuloInventario de aquí)
-from core.models import (
-    ModuloChatbot, 
-    ModuloCompras, 
-    ModuloSistema
+from core.sincronizacion import (
+    aplicar_sincronizacion,
+    contenedores_de_permisos,
+    plan_vacio,
+    planificar_sincronizacion,
 )
 
-class Command(BaseCommand):
-    help = 'Sincroniza permisos de TODOS los módulos definidos (Crea, Actualiza y Pura)'
-
-    def handle(self, *args, **options):
-        self.stdout.write("Iniciando Sincronización Maestra de Permisos...")
-
-        # 2. LISTA MAESTRA: Solo los modelos activos
-        # (Ya quitamos ModuloInventario de aquí también)
-        MODELOS_A_SINCRONIZAR = [
-            ModuloChatbot,
-            ModuloCompras,
-            ModuloSistema,
-        ]
 
-        total_creados = 0
-        total_borrados = 0
-
-        # 3. EL BUCLE (Lógica Genérica - No cambia)
-        for modelo_clase in MODELOS_A_SINCRONIZAR:
-            nombre_modelo = modelo_clase.__name__
-            self.stdout.write(f"\nProcesando: {nombre_modelo}...")
-
-            try:
-                # Obtener ContentType
-                ct = ContentType.objects.get_for_model(modelo_clase)
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f"Error obteniendo ContentType para {nombre_modelo}: {e}"))
-                continue
-
-            # Obtener permisos del código
-            permisos_codigo = dict(modelo_clase._meta.permissions)
-            
-            # A. CREAR O ACTUALIZAR
-            codenames_activos = []
-            for codename, name in permisos_codigo.items():
-                obj, created = Permission.objects.update_or_create(
-                    codename=codename,
-                    content_type=ct,
-                    defaults={'name': name}
-                )
-                codenames_activos.append(codename)
-                if created:
-                    self.stdout.write(self.style.SUCCESS(f"  [+] Creado: {codename}"))
-                    total_creados += 1
+class Command(BaseCommand):
+    help = (
+        'Sincroniza los permisos de TODOS los modelos fantasma (managed=False) con el código: '
+        'crea, renombra y purga por diferencia, en bloque y en una sola transacción.'
+    )
 
-            # B. BORRAR ZOMBIES (Dentro de este módulo específico)
-            zombies = Permission.objects.filter(content_type=ct).exclude(
-                codename__in=codenames_activos
-            )
-            
-            count_zombies = zombies.count()
-            if count_zombies > 0:
-                self.stdout.write(self.style.WARNING(f"  [-] Eliminando {count_zombies} permisos obsoletos..."))
-                zombies.delete()
-                total_borrados += 1
-            else:
-                self.stdout.write(self.style.SUCCESS("  [OK] Limpio."))
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Solo mostrar el plan, sin escribir')
+        parser.add_argument('--json', action='store_true', help='Salida en JSON (plan + conteos) para CI/deploy')
 
-        # RESUMEN FINAL
-        self.stdout.write(self.style.SUCCESS(f"\n--- PROCESO TERMINADO ---"))
-        self.stdout.write(f"Permisos Nuevos: {total_creados}")
-        self.stdout.write(f"Permisos Borrados: {total_borrados}")
\ No newline at end of file
+    def handle(self, *args, **options):
+        modelos = contenedores_de_permisos()
+        plan = planificar_sincronizacion(modelos)
+        aplicado = not options['dry_run'] and not plan_vacio(plan)
+        conteos = aplicar_sincronizacion(plan) if aplicado else {operacion: len(filas) for operacion, filas in plan.items()}
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'dry_run': options['dry_run'],
+                'aplicado': aplicado,
+                'contenedores': [m._meta.label for m in modelos],
+                'conteos': conteos,
+                'plan': plan,
+            }, ensure_ascii=False, indent=2))
+            return
+
+        self.stdout.write(f"Contenedores: {', '.join(m._meta.label for m in modelos)}")
+        for p in plan['crear']:
+            self.stdout.write(self.style.SUCCESS(f"  [+] {p['app']}.{p['codename']} ({p['modelo']}): {p['nombre']}"))
+        for p in plan['renombrar']:
+            self.stdout.write(f"  [~] {p['app']}.{p['codename']}: '{p['nombre_anterior']}' -> '{p['nombre']}'")
+        for p in plan['borrar']:
+            self.stdout.write(self.style.WARNING(f"  [-] {p['app']}.{p['codename']} ({p['modelo']})"))
+
+        if plan_vacio(plan):
+            self.stdout.write(self.style.SUCCESS("[OK] Permisos al día, sin cambios."))
+            return
+
+        resumen = f"Nuevos: {conteos['crear']} | Renombrados: {conteos['renombrar']} | Borrados: {conteos['borrar']}"
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"[DRY-RUN] {resumen}. No se guardó ningún cambio."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"--- PROCESO TERMINADO --- {resumen}"))
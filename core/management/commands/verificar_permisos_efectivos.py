@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import PermisoEfectivo
+from core.permisos import calcular_filas_desde_origen
+
+
+class Command(BaseCommand):
+    help = 'Compara la tabla PermisoEfectivo contra un recálculo desde cero (solo lectura).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mostrar', type=int, default=20, help='Máximo de diferencias a listar por tipo (default: 20)')
+
+    def handle(self, *args, **options):
+        esperadas = calcular_filas_desde_origen()
+        actuales = set(
+            PermisoEfectivo.objects.values_list('pertenencia_id', 'usuario_id', 'empresa_id', 'permiso')
+            .iterator(chunk_size=5000)
+        )
+
+        faltantes = esperadas - actuales
+        sobrantes = actuales - esperadas
+
+        self.stdout.write(f"Filas esperadas: {len(esperadas)} | Filas en tabla: {len(actuales)}")
+
+        for titulo, diferencias in (("Faltan", faltantes), ("Sobran", sobrantes)):
+            for pertenencia_id, usuario_id, empresa_id, permiso in sorted(diferencias)[:options['mostrar']]:
+                self.stdout.write(self.style.WARNING(
+                    f"  [{titulo}] pertenencia={pertenencia_id} usuario={usuario_id} empresa={empresa_id} {permiso}"
+                ))
+
+        if faltantes or sobrantes:
+            raise CommandError(
+                f"Tabla inconsistente: {len(faltantes)} faltantes, {len(sobrantes)} sobrantes. "
+                f"Ejecute 'manage.py reconstruir_permisos_efectivos'."
+            )
+
+        self.stdout.write(self.style.SUCCESS("✅ Tabla PermisoEfectivo consistente."))
@@ -0,0 +1,209 @@
+"""
+CORE MÉTRICAS - INSTRUMENTACIÓN POR PETICIÓN (PROMETHEUS + SERVER-TIMING)
+-------------------------------------------------------------------------
+Mide en qué se va el tiempo de cada petición, agrupado por ruta:
+
+1. Tiempo total, número de consultas y tiempo en la BD (un execute_wrapper
+   que se instala en cada conexión al abrirse).
+2. Lecturas de caché: aciertos (capa local / compartida) y fallos
+   (core/cache.py llama a anotar_cache()).
+3. Tiempo de hash de la contraseña en el login, incluida la espera en la
+   cola del pool acotado (core/autenticacion.py).
+
+La medición de la petición en curso vive en un ContextVar: la ven tanto el
+hilo de la petición (WSGI) como las corrutinas y los sync_to_async de ASGI.
+
+SALIDAS (ver InstrumentacionMiddleware en core/middleware.py):
+- Histogramas Prometheus en /metrics.
+- Cabecera Server-Timing (la muestran las DevTools del navegador).
+- Un WARNING cuando una vista supera su presupuesto de consultas (N+1).
+
+VARIOS WORKERS:
+Cada worker de Gunicorn tiene sus propios contadores. Con la variable
+PROMETHEUS_MULTIPROC_DIR (gunicorn.conf.py la define) prometheus_client los
+escribe en archivos compartidos y /metrics devuelve la suma de todos.
+"""
+
+import contextvars
+import logging
+import os
+import time
+from collections import Counter as ContadorSQL
+
+from django.db.backends.signals import connection_created
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+
+# ==============================================================================
+# 1. MÉTRICAS PROMETHEUS
+# ==============================================================================
+PETICION_SEGUNDOS = Histogram(
+    'hub_peticion_segundos', 'Duración total de la petición',
+    ['ruta', 'metodo', 'estado'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+PETICION_CONSULTAS = Histogram(
+    'hub_peticion_consultas_bd', 'Consultas SQL ejecutadas por petición',
+    ['ruta'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100),
+)
+PETICION_BD_SEGUNDOS = Histogram(
+    'hub_peticion_bd_segundos', 'Tiempo acumulado en la BD por petición',
+    ['ruta'],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+HASH_SEGUNDOS = Histogram(
+    'hub_hash_clave_segundos', 'Verificación/cálculo del hash de la clave (incluye la cola del pool)',
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.35, 0.5, 0.75, 1, 2, 5, 10),
+)
+CACHE_LECTURAS = Counter(
+    'hub_cache_lecturas', 'Lecturas del caché de dos niveles por resultado',
+    ['resultado'],  # acierto_local | acierto_compartido | fallo
+)
+SOBRE_PRESUPUESTO = Counter(
+    'hub_peticion_sobre_presupuesto', 'Peticiones que superaron el presupuesto de consultas',
+    ['ruta'],
+)
+
+
+def exponer():
+    """Texto de exposición Prometheus (sumando todos los workers en modo multiproceso)."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+    else:
+        registro = REGISTRY
+    return generate_latest(registro)
+
+
+# ==============================================================================
+# 2. MEDICIÓN DE LA PETICIÓN EN CURSO
+# ==============================================================================
+
+class Medicion:
+    """Acumuladores de una petición. Solo se suma: no necesita candado."""
+
+    __slots__ = ('inicio', 'consultas', 'bd_segundos', 'sentencias', 'cache_aciertos', 'cache_fallos', 'hash_segundos')
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.bd_segundos = 0.0
+        self.sentencias = ContadorSQL()  # SQL (con %s, sin valores) -> veces; delata los N+1
+        self.cache_aciertos = 0
+        self.cache_fallos = 0
+        self.hash_segundos = 0.0
+
+    @property
+    def duracion(self):
+        return time.perf_counter() - self.inicio
+
+
+_medicion_actual = contextvars.ContextVar('hub_medicion_actual', default=None)
+
+
+def iniciar_medicion():
+    """Abre la medición de una petición. Devuelve (medicion, token para cerrar_medicion)."""
+    medicion = Medicion()
+    return medicion, _medicion_actual.set(medicion)
+
+
+def cerrar_medicion(token):
+    _medicion_actual.reset(token)
+
+
+# ==============================================================================
+# 3. FUENTES (BD, CACHÉ, HASH)
+# ==============================================================================
+
+def _envoltura_bd(execute, sql, params, many, context):
+    medicion = _medicion_actual.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        medicion.bd_segundos += time.perf_counter() - inicio
+        medicion.consultas += 1
+        medicion.sentencias[sql] += 1
+
+
+def _instalar_en_conexion(sender, connection, **kwargs):
+    # connection_created se dispara en cada reconexión del mismo DatabaseWrapper
+    if _envoltura_bd not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_envoltura_bd)
+
+
+def instalar_medicion_bd():
+    """Se llama una vez desde CoreConfig.ready()."""
+    connection_created.connect(_instalar_en_conexion, dispatch_uid='core.metricas.bd')
+
+
+def anotar_cache(resultado, cantidad=1):
+    """resultado: 'acierto_local' | 'acierto_compartido' | 'fallo'."""
+    if not cantidad:
+        return
+    CACHE_LECTURAS.labels(resultado).inc(cantidad)
+    medicion = _medicion_actual.get()
+    if medicion is not None:
+        if resultado == 'fallo':
+            medicion.cache_fallos += cantidad
+        else:
+            medicion.cache_aciertos += cantidad
+
+
+def anotar_hash(segundos):
+    HASH_SEGUNDOS.observe(segundos)
+    medicion = _medicion_actual.get()
+    if medicion is not None:
+        medicion.hash_segundos += segundos
+
+
+# ==============================================================================
+# 4. CIERRE: HISTOGRAMAS, SERVER-TIMING Y PRESUPUESTO
+# ==============================================================================
+
+def registrar_peticion(medicion, ruta, metodo, estado):
+    PETICION_SEGUNDOS.labels(ruta, metodo, str(estado)).observe(medicion.duracion)
+    PETICION_CONSULTAS.labels(ruta).observe(medicion.consultas)
+    PETICION_BD_SEGUNDOS.labels(ruta).observe(medicion.bd_segundos)
+
+
+def server_timing(medicion):
+    """Valor de la cabecera Server-Timing (duraciones en ms)."""
+    partes = [
+        f"total;dur={medicion.duracion * 1000:.1f}",
+        f'bd;dur={medicion.bd_segundos * 1000:.1f};desc="{medicion.consultas} consultas"',
+    ]
+    if medicion.cache_aciertos or medicion.cache_fallos:
+        partes.append(f'cache;desc="{medicion.cache_aciertos} aciertos, {medicion.cache_fallos} fallos"')
+    if medicion.hash_segundos:
+        partes.append(f"hash;dur={medicion.hash_segundos * 1000:.1f}")
+    return ', '.join(partes)
+
+
+def revisar_presupuesto(medicion, ruta, presupuesto):
+    """WARNING con la sentencia más repetida si la petición hizo más consultas que 'presupuesto'."""
+    if not presupuesto or medicion.consultas <= presupuesto:
+        return False
+    SOBRE_PRESUPUESTO.labels(ruta).inc()
+    sql, veces = medicion.sentencias.most_common(1)[0]
+    logger.warning(
+        "Presupuesto de consultas superado en %s: %s consultas (máx %s), %.1f ms en BD.%s",
+        ruta, medicion.consultas, presupuesto, medicion.bd_segundos * 1000,
+        f" Posible N+1 ({veces}x): {sql[:300]}" if veces > 1 else '',
+    )
+    return True
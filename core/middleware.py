@@ -0,0 +1,151 @@
+"""
+CORE MIDDLEWARE - TUBERÍA PROPIA DEL HUB
+----------------------------------------
+1. SondasSaludMiddleware: /healthz y /readyz para el orquestador (App Runner,
+   ECS, Kubernetes). Va PRIMERO en MIDDLEWARE: responde antes de la validación
+   de ALLOWED_HOSTS, la redirección HTTPS y la autenticación, porque las sondas
+   llegan por la IP interna del contenedor y sin credenciales.
+2. InstrumentacionMiddleware: tiempo, consultas, caché y hash por ruta
+   (core/metricas.py) y el endpoint /metrics para Prometheus. Va justo después
+   de las sondas, por la misma razón: el scraper entra por la IP interna.
+"""
+
+import hmac
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.http import HttpResponse, JsonResponse
+
+from . import metricas
+from .arranque import migraciones_pendientes
+
+
+# ==============================================================================
+# 1. SONDAS DE SALUD (LIVENESS / READINESS)
+# ==============================================================================
+
+class SondasSaludMiddleware:
+    """
+    /healthz (liveness): el proceso responde. No toca la BD: si la BD cae, el
+    orquestador no debe reiniciar contenedores sanos.
+    /readyz (readiness): BD alcanzable y sin migraciones pendientes. Hasta que
+    responda 200 el contenedor no recibe tráfico.
+    """
+
+    sync_capable = True
+    async_capable = True  # En ASGI no obliga a Django a pasar cada petición por un hilo
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+        # El esquema no cambia bajo un proceso ya listo: se verifica hasta la primera vez que está al día
+        self._esquema_al_dia = False
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self.__acall__(request)
+        if request.path == '/healthz':
+            return JsonResponse({'estado': 'ok'})
+        if request.path == '/readyz':
+            return self.listo()
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if request.path == '/healthz':
+            return JsonResponse({'estado': 'ok'})
+        if request.path == '/readyz':
+            return await sync_to_async(self.listo)()
+        return await self.get_response(request)
+
+    def listo(self):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if not self._esquema_al_dia:
+                pendientes = migraciones_pendientes()
+                if pendientes:
+                    return JsonResponse({'estado': 'no_listo', 'migraciones_pendientes': pendientes}, status=503)
+                self._esquema_al_dia = True
+        except Exception as exc:
+            return JsonResponse({'estado': 'no_listo', 'error': f"{type(exc).__name__}: {exc}"}, status=503)
+        return JsonResponse({'estado': 'ok'})
+
+
+# ==============================================================================
+# 2. INSTRUMENTACIÓN (PROMETHEUS + SERVER-TIMING)
+# ==============================================================================
+
+class InstrumentacionMiddleware:
+    """
+    Abre una Medicion por petición y al terminar:
+    - observa los histogramas de la ruta (patrón de URL, no la URL concreta,
+      para no disparar la cardinalidad: 'api/auditoria/' y no '?cursor=...');
+    - agrega la cabecera Server-Timing (METRICAS_SERVER_TIMING);
+    - avisa si se pasó del presupuesto de consultas. Una vista puede declarar
+      el suyo con el atributo 'presupuesto_consultas'.
+
+    GET /metrics devuelve la exposición Prometheus y exige 'Authorization:
+    Bearer <METRICAS_TOKEN>'. Sin token configurado solo responde con DEBUG:
+    en producción da 404 (este middleware corre antes de ALLOWED_HOSTS y
+    Gunicorn puede estar expuesto directo, p. ej. App Runner).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICAS_ACTIVAS:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.asincrono = iscoroutinefunction(get_response)
+        if self.asincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.asincrono:
+            return self.__acall__(request)
+        if request.path == settings.METRICAS_RUTA:
+            return self.exposicion(request)
+        medicion, token = metricas.iniciar_medicion()
+        try:
+            response = self.get_response(request)
+        finally:
+            metricas.cerrar_medicion(token)
+        return self.cerrar(request, response, medicion)
+
+    async def __acall__(self, request):
+        if request.path == settings.METRICAS_RUTA:
+            return self.exposicion(request)
+        medicion, token = metricas.iniciar_medicion()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metricas.cerrar_medicion(token)
+        return self.cerrar(request, response, medicion)
+
+    def exposicion(self, request):
+        if not settings.METRICAS_TOKEN:
+            if not settings.DEBUG:
+                return HttpResponse(status=404)  # Falla cerrado: sin token no se publica
+        else:
+            esperado = f"Bearer {settings.METRICAS_TOKEN}"
+            if not hmac.compare_digest(request.headers.get('Authorization', ''), esperado):
+                return HttpResponse(status=401)
+        return HttpResponse(metricas.exponer(), content_type=metricas.CONTENT_TYPE)
+
+    def cerrar(self, request, response, medicion):
+        coincidencia = request.resolver_match
+        ruta = coincidencia.route if coincidencia else 'sin_ruta'
+        metricas.registrar_peticion(medicion, ruta, request.method, response.status_code)
+
+        vista = getattr(coincidencia.func, 'view_class', None) if coincidencia else None
+        presupuesto = getattr(vista, 'presupuesto_consultas', settings.METRICAS_PRESUPUESTO_CONSULTAS)
+        metricas.revisar_presupuesto(medicion, ruta, presupuesto)
+
+        if settings.METRICAS_SERVER_TIMING:
+            response['Server-Timing'] = metricas.server_timing(medicion)
+        return response
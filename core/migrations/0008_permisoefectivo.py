@@ -0,0 +1,57 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def poblar_permisos_efectivos(apps, schema_editor):
+    """Carga inicial de la tabla desnormalizada con los permisos ya asignados."""
+    Pertenencia = apps.get_model('core', 'Pertenencia')
+    PermisoEfectivo = apps.get_model('core', 'PermisoEfectivo')
+
+    filas = set()
+    for relacion in ('grupo__permissions', 'permisos_adicionales'):
+        consulta = Pertenencia.objects.values_list(
+            'pk', 'usuario_id', 'empresa_id',
+            f'{relacion}__content_type__app_label', f'{relacion}__codename',
+        )
+        for pk, usuario_id, empresa_id, app, codename in consulta.iterator(chunk_size=5000):
+            if codename is not None:
+                filas.add((pk, usuario_id, empresa_id, f"{app}.{codename}"))
+
+    PermisoEfectivo.objects.bulk_create(
+        (
+            PermisoEfectivo(pertenencia_id=pk, usuario_id=usuario_id, empresa_id=empresa_id, permiso=permiso)
+            for pk, usuario_id, empresa_id, permiso in filas
+        ),
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0007_perfilusuario'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PermisoEfectivo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('permiso', models.CharField(max_length=255)),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.empresa')),
+                ('pertenencia', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='permisos_efectivos', to='core.pertenencia')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Permiso Efectivo',
+                'verbose_name_plural': 'Permisos Efectivos',
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'empresa', 'permiso'), name='permiso_efectivo_unico')],
+            },
+        ),
+        migrations.RunPython(poblar_permisos_efectivos, migrations.RunPython.noop),
+    ]
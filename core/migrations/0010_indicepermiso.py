@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_correopendiente'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndicePermiso',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('permiso', models.CharField(max_length=255, unique=True)),
+                ('bit', models.PositiveIntegerField(unique=True)),
+            ],
+            options={
+                'verbose_name': 'Índice de Permiso',
+                'verbose_name_plural': 'Registro de Índices de Permisos',
+                'ordering': ['bit'],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:03
+
+import core.indices
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_indicepermiso'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historialcambiosrol',
+            name='datos',
+            field=models.JSONField(blank=True, default=dict, help_text="Evento estructurado: accion, permiso ('app.codename'), empresa (código), empresa_id..."),
+        ),
+        migrations.AlterField(
+            model_name='historialcambiosrol',
+            name='fecha',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='historialcambiosrol',
+            index=core.indices.BrinIndexPostgres(autosummarize=True, fields=['fecha'], name='core_historial_fecha_brin'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:05
+
+import core.indices
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_historial_estructurado_brin'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='historialcambiosrol',
+            name='actor',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='auditoria_actor', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='historialcambiosrol',
+            name='usuario_afectado',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='auditoria_afectado', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='historialcambiosrol',
+            index=models.Index(fields=['fecha', 'id'], name='core_historial_fecha_id'),
+        ),
+        migrations.AddIndex(
+            model_name='historialcambiosrol',
+            index=models.Index(fields=['actor', 'fecha', 'id'], name='core_historial_actor_fecha'),
+        ),
+        migrations.AddIndex(
+            model_name='historialcambiosrol',
+            index=models.Index(fields=['usuario_afectado', 'fecha', 'id'], name='core_historial_afectado_fecha'),
+        ),
+        migrations.AddIndex(
+            model_name='historialcambiosrol',
+            index=core.indices.GinIndexPostgres(django.contrib.postgres.search.SearchVector('detalle', config='simple'), name='core_historial_detalle_fts'),
+        ),
+    ]
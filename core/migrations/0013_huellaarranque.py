@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_historial_indices_consulta'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HuellaArranque',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('componente', models.CharField(max_length=50, unique=True)),
+                ('huella', models.CharField(max_length=64)),
+                ('actualizada', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,63 @@
+"""
+Declara la tabla intermedia de Pertenencia.permisos_adicionales como el modelo
+ExcepcionPermiso SIN recrearla: SeparateDatabaseAndState solo cambia el estado
+de Django (la tabla, sus columnas y su restricción única ya existen). Después,
+columnas nuevas nulas (vence_en, otorgada_por) e índice parcial de vencimiento:
+las filas existentes quedan como excepciones permanentes.
+"""
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0013_huellaarranque'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='ExcepcionPermiso',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('pertenencia', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='excepciones', to='core.pertenencia')),
+                        ('permission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='auth.permission')),
+                    ],
+                    options={
+                        'db_table': 'core_pertenencia_permisos_adicionales',
+                        'unique_together': {('pertenencia', 'permission')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='pertenencia',
+                    name='permisos_adicionales',
+                    field=models.ManyToManyField(blank=True, help_text='Excepciones específicas para este usuario en esta empresa (se suman al rol base).', through='core.ExcepcionPermiso', to='auth.permission'),
+                ),
+            ],
+            database_operations=[],
+        ),
+        migrations.AlterModelOptions(
+            name='excepcionpermiso',
+            options={'verbose_name': 'Excepción de Permiso', 'verbose_name_plural': 'Excepciones de Permisos'},
+        ),
+        migrations.AddField(
+            model_name='excepcionpermiso',
+            name='vence_en',
+            field=models.DateTimeField(blank=True, help_text='Vacío = permanente.', null=True),
+        ),
+        migrations.AddField(
+            model_name='excepcionpermiso',
+            name='otorgada_por',
+            field=models.ForeignKey(blank=True, help_text='Quien delegó (firma la revocación automática en la auditoría).', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='excepcionpermiso',
+            index=models.Index(condition=models.Q(('vence_en__isnull', False)), fields=['vence_en'], name='excepcion_vence_idx'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:48
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_revocacion_tokens'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SuscriptorWebhook',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100, unique=True)),
+                ('url', models.URLField(max_length=500)),
+                ('secreto', models.CharField(max_length=128)),
+                ('activo', models.BooleanField(default=True)),
+                ('tipos', models.JSONField(blank=True, default=list, help_text='Tipos de evento a recibir (ej: ["permisos.delegacion"]). Vacío = todos.')),
+                ('proximo_intento', models.DateTimeField(default=django.utils.timezone.now)),
+                ('fallos_consecutivos', models.PositiveIntegerField(default=0)),
+                ('ultimo_error', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name': 'Suscriptor de Webhooks',
+                'verbose_name_plural': 'Suscriptores de Webhooks',
+            },
+        ),
+        migrations.CreateModel(
+            name='EntregaWebhook',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=50)),
+                ('datos', models.JSONField(default=dict)),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('ENTREGADO', 'Entregado'), ('FALLIDO', 'Fallido (sin más reintentos)')], default='PENDIENTE', max_length=10)),
+                ('intentos', models.PositiveIntegerField(default=0)),
+                ('creado', models.DateTimeField(default=django.utils.timezone.now)),
+                ('entregado_en', models.DateTimeField(blank=True, null=True)),
+                ('suscriptor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entregas', to='core.suscriptorwebhook')),
+            ],
+            options={
+                'verbose_name': 'Entrega de Webhook',
+                'verbose_name_plural': 'Entregas de Webhooks',
+                'indexes': [models.Index(condition=models.Q(('estado', 'PENDIENTE')), fields=['suscriptor', 'id'], name='webhook_cola_idx')],
+            },
+        ),
+    ]
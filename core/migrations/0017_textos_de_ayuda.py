@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-17 00:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_webhooks'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='area',
+            name='codigo',
+            field=models.CharField(help_text='Código corto para referencias internas. Ej: FIN, LOG, IT', max_length=20, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='perfilgrupo',
+            name='es_gerencial',
+            field=models.BooleanField(default=False, help_text='Si es True, este rol tiene capacidades de gestión sobre subordinados.'),
+        ),
+        migrations.AlterField(
+            model_name='perfilusuario',
+            name='debe_cambiar_password',
+            field=models.BooleanField(default=True, help_text='Si es True, el frontend bloqueará el acceso al Dashboard hasta que cambie la clave.'),
+        ),
+    ]
@@ -12,9 +12,19 @@ ARQUITECTURA:
 """
 
 from django.db import models
-from django.db.models.signals import post_save
+from django.utils import timezone
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
 from django.dispatch import receiver
 from django.contrib.auth.models import User, Group, Permission
+from django.contrib.postgres.search import SearchVector
+
+from .indices import BrinIndexPostgres, GinIndexPostgres
+from .permisos import (
+    invalidar_permisos,
+    invalidar_permisos_globales,
+    sincronizar_permisos_efectivos,
+)
+from .revocacion import cortar_sesiones
 
 # ==============================================================================
 # 1. ESTRUCTURA ORGANIZACIONAL
@@ -145,6 +155,7 @@ class Pertenencia(models.Model):
     permisos_adicionales = models.ManyToManyField(
         Permission, 
         blank=True, 
+        through='ExcepcionPermiso',
         help_text="Excepciones específicas para este usuario en esta empresa (se suman al rol base)."
     )
 
@@ -158,6 +169,88 @@ class Pertenencia(models.Model):
         return f"{self.usuario.username} -> {self.empresa.codigo} [{self.grupo.name}]"
 
 
+class ExcepcionPermiso(models.Model):
+    """
+    Tabla intermedia de 'permisos_adicionales' (la misma tabla de siempre,
+    ahora declarada para sumarle el vencimiento).
+
+    Una excepción con 'vence_en' es una delegación TEMPORAL: 'manage.py
+    expire_delegations' la revoca cuando llega la hora (ver core/delegacion.py).
+    Sin 'vence_en' es permanente. El índice parcial solo contiene las
+    temporales, así que buscar "lo vencido" no recorre las permanentes.
+    """
+    pertenencia = models.ForeignKey(Pertenencia, on_delete=models.CASCADE, related_name='excepciones')
+    permission = models.ForeignKey(Permission, on_delete=models.CASCADE, related_name='+')
+    vence_en = models.DateTimeField(null=True, blank=True, help_text="Vacío = permanente.")
+    otorgada_por = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+',
+        help_text="Quien delegó (firma la revocación automática en la auditoría).",
+    )
+
+    class Meta:
+        db_table = 'core_pertenencia_permisos_adicionales'
+        unique_together = ('pertenencia', 'permission')
+        indexes = [
+            models.Index(
+                fields=['vence_en'], name='excepcion_vence_idx', condition=models.Q(vence_en__isnull=False)
+            ),
+        ]
+        verbose_name = "Excepción de Permiso"
+        verbose_name_plural = "Excepciones de Permisos"
+
+    def __str__(self):
+        return f"{self.pertenencia_id}: {self.permission_id} (vence: {self.vence_en or 'nunca'})"
+
+
+class PermisoEfectivo(models.Model):
+    """
+    Tabla DESNORMALIZADA: una fila por (Usuario, Empresa, "app.codename").
+
+    Es el resultado aplanado de Rol Base + Excepciones de cada Pertenencia.
+    Se mantiene incrementalmente con señales (ver sección 10 y core/permisos.py),
+    de modo que responder "¿qué puede hacer X en la empresa Y?" es un solo
+    recorrido por índice en lugar de un JOIN multi-tabla con UNION.
+
+    NO editar a mano: se reconstruye con 'manage.py reconstruir_permisos_efectivos'.
+    """
+    pertenencia = models.ForeignKey(Pertenencia, on_delete=models.CASCADE, related_name='permisos_efectivos')
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name='+')
+    permiso = models.CharField(max_length=255)  # Ej: "core.compras_aprobar_orden"
+
+    class Meta:
+        constraints = [
+            # El índice único (usuario, empresa, permiso) es además el índice de lectura
+            models.UniqueConstraint(fields=['usuario', 'empresa', 'permiso'], name='permiso_efectivo_unico'),
+        ]
+        verbose_name = "Permiso Efectivo"
+        verbose_name_plural = "Permisos Efectivos"
+
+    def __str__(self):
+        return f"{self.usuario_id}@{self.empresa_id}: {self.permiso}"
+
+
+class IndicePermiso(models.Model):
+    """
+    Registro VERSIONADO de índices de bit para el Pasaporte compacto.
+
+    Cada "app.codename" recibe un bit estable (0, 1, 2, ...). Es de SOLO
+    AGREGADO: un bit nunca se reasigna, ni siquiera si el Permission se borra,
+    así que la versión del registro es simplemente la cantidad de filas.
+    Se completa solo al emitir Pasaportes (ver core/permisos.py, sección 5).
+    """
+    permiso = models.CharField(max_length=255, unique=True)  # Ej: "core.compras_aprobar_orden"
+    bit = models.PositiveIntegerField(unique=True)
+
+    class Meta:
+        ordering = ['bit']
+        verbose_name = "Índice de Permiso"
+        verbose_name_plural = "Registro de Índices de Permisos"
+
+    def __str__(self):
+        return f"{self.bit}: {self.permiso}"
+
+
 # ==============================================================================
 # 6. AUDITORÍA DE SEGURIDAD
 # ==============================================================================
@@ -165,13 +258,39 @@ class HistorialCambiosRol(models.Model):
     """
     Log inmutable de cambios críticos en permisos.
     Permite responder: "¿Quién le dio permiso de admin a Juan Pérez el martes?"
+
+    Solo se agrega (nunca se edita ni se borra): se escribe en lotes a través de
+    core/auditoria.py. 'fecha' es la hora del EVENTO (no la del INSERT del lote)
+    y crece con el orden físico de la tabla, por eso basta un índice BRIN
+    (unos pocos KB aunque la tabla tenga millones de filas) para filtrar por rango.
     """
-    fecha = models.DateTimeField(auto_now_add=True)
-    actor = models.ForeignKey(User, related_name='auditoria_actor', on_delete=models.PROTECT)
-    usuario_afectado = models.ForeignKey(User, related_name='auditoria_afectado', on_delete=models.PROTECT)
-    accion = models.CharField(max_length=255) # Ej: "Delegación Temporal", "Revocación"
+    fecha = models.DateTimeField(default=timezone.now, editable=False)
+    # Sin índice propio: los cubren los compuestos (usuario, fecha, id) de Meta
+    actor = models.ForeignKey(User, related_name='auditoria_actor', on_delete=models.PROTECT, db_index=False)
+    usuario_afectado = models.ForeignKey(User, related_name='auditoria_afectado', on_delete=models.PROTECT, db_index=False)
+    accion = models.CharField(max_length=255) # Ej: "Delegación (add)", "Revocación"
     detalle = models.TextField()
-    
+    datos = models.JSONField(
+        default=dict, blank=True,
+        help_text="Evento estructurado: accion, permiso ('app.codename'), empresa (código), empresa_id..."
+    )
+
+    class Meta:
+        indexes = [
+            BrinIndexPostgres(fields=['fecha'], name='core_historial_fecha_brin', autosummarize=True),
+            # Paginación por cursor (fecha, id) de /api/auditoria/, global y por usuario
+            models.Index(fields=['fecha', 'id'], name='core_historial_fecha_id'),
+            models.Index(fields=['actor', 'fecha', 'id'], name='core_historial_actor_fecha'),
+            models.Index(fields=['usuario_afectado', 'fecha', 'id'], name='core_historial_afectado_fecha'),
+            # Búsqueda de texto en 'detalle' (debe coincidir con core.auditoria.VECTOR_DETALLE)
+            GinIndexPostgres(SearchVector('detalle', config='simple'), name='core_historial_detalle_fts'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("El historial de auditoría es de solo agregado: no se puede modificar.")
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.fecha} - {self.actor} modificó a {self.usuario_afectado}"
 
@@ -196,7 +315,171 @@ class PerfilUsuario(models.Model):
 
 
 # ==============================================================================
-# 8. AUTOMATIZACIÓN (SEÑALES)
+# 8. REVOCACIÓN DE TOKENS (ver core/revocacion.py)
+# ==============================================================================
+class TokenRevocado(models.Model):
+    """
+    Un JWT (por su 'jti') que deja de valer antes de su 'exp'. Ej: logout.
+    Es el respaldo durable de la lista en caché; la fila sobra cuando el
+    token expira y se purga sola (core.revocacion.cargar_revocaciones).
+    """
+    jti = models.CharField(max_length=64, unique=True)
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    expira = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = "Token Revocado"
+        verbose_name_plural = "Tokens Revocados"
+
+    def __str__(self):
+        return f"{self.jti} (expira {self.expira})"
+
+
+class CorteSesion(models.Model):
+    """
+    "No antes de": todo token del usuario emitido ANTES de 'no_antes' deja de
+    valer (en una empresa, o en todas si 'empresa' es nula). Se registra al
+    quitar un permiso delegado, al desactivar al usuario, etc.
+
+    Solo se agrega: el corte vigente es el más reciente. Una fila sobra cuando
+    ya expiró el token más longevo que pudo emitirse antes del corte.
+    """
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    no_antes = models.DateTimeField(db_index=True)
+
+    class Meta:
+        verbose_name = "Corte de Sesiones"
+        verbose_name_plural = "Cortes de Sesiones"
+
+    def __str__(self):
+        return f"{self.usuario_id}@{self.empresa_id or '*'}: no antes de {self.no_antes}"
+
+
+# ==============================================================================
+# 9. INFRAESTRUCTURA: BANDEJAS DE SALIDA (CORREOS, WEBHOOKS) Y ARRANQUE
+# ==============================================================================
+class CorreoPendiente(models.Model):
+    """
+    Bandeja de salida persistente (Outbox).
+
+    Las vistas NO hablan con el servidor SMTP: solo insertan una fila aquí
+    (costo constante) y el worker 'manage.py run_mail_worker' los envía en
+    lotes, con una sola conexión SMTP por lote, reintentos y límite de tasa.
+    """
+    class Estado(models.TextChoices):
+        PENDIENTE = 'PENDIENTE', 'Pendiente'
+        ENVIADO = 'ENVIADO', 'Enviado'
+        FALLIDO = 'FALLIDO', 'Fallido (sin más reintentos)'
+
+    destinatario = models.EmailField()
+    asunto = models.CharField(max_length=255)
+    cuerpo = models.TextField()
+
+    estado = models.CharField(max_length=10, choices=Estado.choices, default=Estado.PENDIENTE)
+    intentos = models.PositiveIntegerField(default=0)
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    ultimo_error = models.TextField(blank=True)
+
+    creado = models.DateTimeField(auto_now_add=True)
+    enviado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Lo que consulta el worker: "pendientes cuyo turno ya llegó"
+            models.Index(fields=['estado', 'proximo_intento'], name='correo_cola_idx'),
+        ]
+        verbose_name = "Correo en Cola"
+        verbose_name_plural = "Correos en Cola"
+
+    def __str__(self):
+        return f"{self.destinatario} - {self.asunto} [{self.estado}]"
+
+
+class SuscriptorWebhook(models.Model):
+    """
+    App satélite que recibe los eventos de permisos por webhook (ver core/webhooks.py).
+    Firma: HMAC-SHA256 con 'secreto' (hub_pasaporte.webhooks.verificar_firma).
+
+    El estado de reintento vive aquí y no en cada entrega: mientras el lote más
+    viejo no se entregue, los siguientes esperan (orden por suscriptor).
+    """
+    nombre = models.CharField(max_length=100, unique=True)
+    url = models.URLField(max_length=500)
+    secreto = models.CharField(max_length=128)
+    activo = models.BooleanField(default=True)
+    tipos = models.JSONField(
+        default=list, blank=True,
+        help_text='Tipos de evento a recibir (ej: ["permisos.delegacion"]). Vacío = todos.'
+    )
+
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    fallos_consecutivos = models.PositiveIntegerField(default=0)
+    ultimo_error = models.TextField(blank=True)
+
+    class Meta:
+        verbose_name = "Suscriptor de Webhooks"
+        verbose_name_plural = "Suscriptores de Webhooks"
+
+    def __str__(self):
+        return f"{self.nombre} -> {self.url}"
+
+
+class EntregaWebhook(models.Model):
+    """
+    Bandeja de salida (Outbox) de eventos: una fila por evento y suscriptor.
+
+    Se inserta en la MISMA transacción que el cambio de permisos: si el cambio
+    se revierte, el evento no existe. 'manage.py run_webhook_worker' las envía
+    en lotes y en orden de 'id' (la 'secuencia' que ve el suscriptor).
+    """
+    class Estado(models.TextChoices):
+        PENDIENTE = 'PENDIENTE', 'Pendiente'
+        ENTREGADO = 'ENTREGADO', 'Entregado'
+        FALLIDO = 'FALLIDO', 'Fallido (sin más reintentos)'
+
+    suscriptor = models.ForeignKey(SuscriptorWebhook, on_delete=models.CASCADE, related_name='entregas')
+    tipo = models.CharField(max_length=50)  # Ej: "permisos.delegacion", "permisos.rol"
+    datos = models.JSONField(default=dict)
+
+    estado = models.CharField(max_length=10, choices=Estado.choices, default=Estado.PENDIENTE)
+    intentos = models.PositiveIntegerField(default=0)
+    creado = models.DateTimeField(default=timezone.now)
+    entregado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Lo que consulta el worker: "lo pendiente de este suscriptor, en orden"
+            models.Index(
+                fields=['suscriptor', 'id'], name='webhook_cola_idx',
+                condition=models.Q(estado='PENDIENTE'),
+            ),
+        ]
+        verbose_name = "Entrega de Webhook"
+        verbose_name_plural = "Entregas de Webhooks"
+
+    def __str__(self):
+        return f"#{self.pk} {self.tipo} -> {self.suscriptor_id} [{self.estado}]"
+
+
+class HuellaArranque(models.Model):
+    """
+    Huella (sha256) de lo último que preparó 'manage.py preparar_arranque':
+    migraciones de todas las apps + permisos declarados por los modelos fantasma.
+
+    Si la imagen nueva trae la misma huella, el contenedor arranca sin correr
+    'migrate' ni 'sync_permisos_full' (arranques en frío y escalado más rápidos).
+    """
+    componente = models.CharField(max_length=50, unique=True)
+    huella = models.CharField(max_length=64)
+    actualizada = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.componente}: {self.huella[:12]}"
+
+
+# ==============================================================================
+# 10. AUTOMATIZACIÓN (SEÑALES)
 # ==============================================================================
 @receiver(post_save, sender=User)
 def crear_perfil_usuario(sender, instance, created, **kwargs):
@@ -205,4 +488,120 @@ def crear_perfil_usuario(sender, instance, created, **kwargs):
     Garantiza que todo usuario nuevo nazca con un PerfilUsuario asociado.
     """
     if created:
-        PerfilUsuario.objects.create(usuario=instance)
\ No newline at end of file
+        PerfilUsuario.objects.create(usuario=instance)
+
+
+# --- MANTENIMIENTO DE PERMISOS EFECTIVOS (TABLA + CACHÉ) ---
+# Cualquier cambio que altere "qué puede hacer" un usuario en una empresa
+# debe re-sincronizar la tabla PermisoEfectivo de las Pertenencias afectadas
+# (dentro de la misma transacción) e invalidar el caché del Pasaporte.
+
+@receiver(m2m_changed, sender=Pertenencia.permisos_adicionales.through)
+def sincronizar_por_excepciones(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Signal: Excepciones agregadas/quitadas a una Pertenencia.
+    Desde el lado del Permiso (reverse) las afectadas vienen en pk_set,
+    salvo en 'clear', donde las capturamos antes de borrar.
+    """
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            sincronizar_permisos_efectivos([instance.pk])
+            invalidar_permisos(instance.usuario_id, instance.empresa_id)
+        return
+
+    if action == 'pre_clear':
+        instance._pertenencias_afectadas = list(instance.pertenencia_set.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        sincronizar_permisos_efectivos(pk_set)
+        invalidar_permisos_globales()
+    elif action == 'post_clear':
+        sincronizar_permisos_efectivos(getattr(instance, '_pertenencias_afectadas', []))
+        invalidar_permisos_globales()
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def sincronizar_por_permisos_de_grupo(sender, instance, action, reverse, pk_set, **kwargs):
+    """Signal: Cambió el set de permisos de un Rol (afecta a todos sus miembros)."""
+    if reverse:
+        # instance es un Permission; pk_set son Grupos
+        if action == 'pre_clear':
+            instance._grupos_afectados = list(instance.group_set.values_list('pk', flat=True))
+            return
+        grupos = pk_set if action != 'post_clear' else getattr(instance, '_grupos_afectados', [])
+    else:
+        grupos = [instance.pk]
+
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        sincronizar_permisos_efectivos(
+            Pertenencia.objects.filter(grupo_id__in=grupos).values_list('pk', flat=True)
+        )
+        invalidar_permisos_globales()
+
+        # Aviso a las apps satélite (import diferido: core.webhooks importa estos modelos)
+        from .webhooks import encolar_cambio_de_rol
+        operacion = action.removeprefix('post_')
+        if reverse:
+            # Desde el lado del Permiso, 'clear' = se quitó ese permiso de sus grupos
+            operacion, permisos = ('remove' if operacion == 'clear' else operacion), [instance.pk]
+        else:
+            permisos = None if operacion == 'clear' else pk_set
+        encolar_cambio_de_rol(grupos, operacion, permisos)
+
+
+@receiver(post_save, sender=Pertenencia)
+def sincronizar_por_pertenencia(sender, instance, **kwargs):
+    """Signal: Alta o cambio de Rol Base de la asignación."""
+    sincronizar_permisos_efectivos([instance.pk])
+    invalidar_permisos(instance.usuario_id, instance.empresa_id)
+
+
+@receiver(post_delete, sender=Pertenencia)
+def invalidar_por_baja_de_pertenencia(sender, instance, **kwargs):
+    """Signal: Baja de la asignación (las filas materializadas caen en cascada)."""
+    invalidar_permisos(instance.usuario_id, instance.empresa_id)
+    cortar_sesiones([(instance.usuario_id, instance.empresa_id)])
+
+
+@receiver(post_save, sender=User)
+def cortar_sesiones_de_usuario_inactivo(sender, instance, created, update_fields=None, **kwargs):
+    """Signal: Usuario desactivado. Sus tokens ya emitidos dejan de valer en el Hub."""
+    if created or instance.is_active:
+        return
+    if update_fields is not None and 'is_active' not in update_fields:
+        return  # Ej: update_last_login()
+    cortar_sesiones([(instance.pk, None)])
+
+
+@receiver(pre_delete, sender=Permission)
+def capturar_afectados_por_permiso(sender, instance, **kwargs):
+    """Signal: Antes de borrar un Permiso, anotamos a quién se lo quitaremos."""
+    instance._pertenencias_afectadas = _pertenencias_con_permiso(instance)
+
+
+@receiver(post_delete, sender=Permission)
+def sincronizar_por_baja_de_permiso(sender, instance, **kwargs):
+    sincronizar_permisos_efectivos(getattr(instance, '_pertenencias_afectadas', []))
+    invalidar_permisos_globales()
+
+
+@receiver(post_save, sender=Permission)
+def sincronizar_por_cambio_de_permiso(sender, instance, created, **kwargs):
+    """Signal: Un Permiso renombrado cambia el texto "app.codename" materializado."""
+    if not created:
+        sincronizar_permisos_efectivos(_pertenencias_con_permiso(instance))
+    invalidar_permisos_globales()
+
+
+@receiver(post_save, sender=PerfilGrupo)
+@receiver(post_delete, sender=PerfilGrupo)
+@receiver(post_delete, sender=Group)
+def invalidar_por_catalogo(sender, **kwargs):
+    """Signal: Cambios en la configuración de los Roles."""
+    invalidar_permisos_globales()
+
+
+def _pertenencias_con_permiso(permiso):
+    """IDs de Pertenencias que reciben 'permiso' por su Rol o por Excepción."""
+    por_grupo = Pertenencia.objects.filter(grupo__permissions=permiso).values_list('pk', flat=True)
+    por_excepcion = Pertenencia.objects.filter(permisos_adicionales=permiso).values_list('pk', flat=True)
+    return list(por_grupo.union(por_excepcion))
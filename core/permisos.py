@@ -0,0 +1,301 @@
+"""
+CORE PERMISOS - MOTOR DE PERMISOS EFECTIVOS
+-------------------------------------------
+Este módulo calcula y cachea la lista plana de permisos ("app.codename") que
+tiene un usuario dentro de una empresa (Rol Base + Excepciones).
+
+ESTRATEGIA DE CACHÉ (VERSIONADA):
+1. Cada entrada se guarda por (usuario, empresa) junto con la 'versión global'
+   y la 'generación' de esa Pertenencia con las que fue calculada.
+2. Cambios que afectan a muchos usuarios (permisos de un Grupo, PerfilGrupo,
+   catálogo de Permisos) solo incrementan la versión global: todas las entradas
+   anteriores quedan obsoletas sin tener que recorrerlas.
+3. Cambios puntuales (Excepciones de una Pertenencia) incrementan solo su
+   generación.
+4. La lectura trae versión + generación + entrada en UN solo viaje al caché
+   (get_many).
+
+Las invalidaciones se ejecutan al confirmar la transacción (on_commit) para que
+ningún lector vuelva a cachear datos que todavía no son definitivos. Y como el
+lector sella la entrada con lo que leyó ANTES de calcular, un lector lento que
+calculó con el estado anterior no puede pisar una invalidación ya hecha: su
+entrada queda con un sello viejo y se descarta en la siguiente lectura.
+
+TABLA MATERIALIZADA (PermisoEfectivo):
+Detrás del caché no se recalcula el JOIN: se lee la tabla desnormalizada, que
+las señales de core/models.py mantienen al día Pertenencia por Pertenencia.
+
+PASAPORTE COMPACTO:
+Con PASAPORTE_PERMISOS_COMPACTOS=True el Pasaporte lleva un mapa de bits en
+vez de la lista de textos. Los bits salen del registro IndicePermiso (sección 5).
+"""
+
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+
+from hub_pasaporte.compacto import codificar_bits
+
+
+CLAVE_VERSION = 'permisos_efectivos:version'
+
+
+def _cache():
+    return caches[getattr(settings, 'PERMISOS_CACHE_ALIAS', 'default')]
+
+
+def _clave_entrada(usuario_id, empresa_id):
+    return f'permisos_efectivos:{usuario_id}:{empresa_id}'
+
+
+def _clave_generacion(usuario_id, empresa_id):
+    return f'permisos_efectivos:generacion:{usuario_id}:{empresa_id}'
+
+
+# ==============================================================================
+# 1. CÁLCULO DESDE EL ORIGEN (FUENTE DE VERDAD)
+# ==============================================================================
+
+def calcular_filas_desde_origen(pertenencia_ids=None):
+    """
+    Recalcula desde cero las filas (pertenencia, usuario, empresa, "app.codename")
+    a partir de Grupos y Excepciones. Dos consultas planas, sin N+1.
+    Si pertenencia_ids es None, calcula para TODAS las Pertenencias.
+    """
+    from .models import Pertenencia
+
+    pertenencias = Pertenencia.objects.all()
+    if pertenencia_ids is not None:
+        pertenencias = pertenencias.filter(pk__in=pertenencia_ids)
+
+    filas = set()
+    for relacion in ('grupo__permissions', 'permisos_adicionales'):
+        consulta = pertenencias.values_list(
+            'pk', 'usuario_id', 'empresa_id',
+            f'{relacion}__content_type__app_label', f'{relacion}__codename',
+        )
+        for pk, usuario_id, empresa_id, app, codename in consulta.iterator(chunk_size=5000):
+            if codename is not None:  # LEFT JOIN: Pertenencia sin permisos por esta vía
+                filas.add((pk, usuario_id, empresa_id, f"{app}.{codename}"))
+    return filas
+
+
+def calcular_permisos_efectivos(pertenencia):
+    """
+    Lee los permisos desde la tabla materializada: un recorrido por el índice
+    único (usuario, empresa, permiso), ya ordenado y aplanado a texto.
+    """
+    from .models import PermisoEfectivo
+
+    return list(
+        PermisoEfectivo.objects.filter(
+            usuario_id=pertenencia.usuario_id,
+            empresa_id=pertenencia.empresa_id,
+        ).order_by('permiso').values_list('permiso', flat=True)
+    )
+
+
+def tiene_permiso(usuario_id, empresa_id, permiso):
+    """Consulta puntual de autorización ("app.codename") contra la tabla materializada."""
+    from .models import PermisoEfectivo
+
+    return PermisoEfectivo.objects.filter(
+        usuario_id=usuario_id, empresa_id=empresa_id, permiso=permiso
+    ).exists()
+
+
+# ==============================================================================
+# 2. MANTENIMIENTO INCREMENTAL DE LA TABLA
+# ==============================================================================
+
+def sincronizar_permisos_efectivos(pertenencia_ids):
+    """
+    Lleva la tabla PermisoEfectivo de las Pertenencias indicadas a su estado
+    correcto aplicando SOLO la diferencia (altas y bajas en bloque).
+    Debe llamarse dentro de la transacción que originó el cambio.
+    """
+    from .models import PermisoEfectivo
+
+    pertenencia_ids = list(pertenencia_ids)
+    if not pertenencia_ids:
+        return 0, 0
+
+    deseadas = calcular_filas_desde_origen(pertenencia_ids)
+    actuales = {
+        (pertenencia_id, usuario_id, empresa_id, permiso): pk
+        for pk, pertenencia_id, usuario_id, empresa_id, permiso in
+        PermisoEfectivo.objects.filter(pertenencia_id__in=pertenencia_ids).values_list(
+            'pk', 'pertenencia_id', 'usuario_id', 'empresa_id', 'permiso'
+        )
+    }
+
+    sobrantes = [pk for fila, pk in actuales.items() if fila not in deseadas]
+    faltantes = [
+        PermisoEfectivo(pertenencia_id=pk, usuario_id=usuario_id, empresa_id=empresa_id, permiso=permiso)
+        for pk, usuario_id, empresa_id, permiso in deseadas
+        if (pk, usuario_id, empresa_id, permiso) not in actuales
+    ]
+
+    if sobrantes:
+        PermisoEfectivo.objects.filter(pk__in=sobrantes).delete()
+    if faltantes:
+        PermisoEfectivo.objects.bulk_create(faltantes, batch_size=1000, ignore_conflicts=True)
+    return len(faltantes), len(sobrantes)
+
+
+# ==============================================================================
+# 3. LECTURA CACHEADA
+# ==============================================================================
+
+def obtener_permisos_efectivos(pertenencia):
+    """
+    Devuelve la lista de permisos de la Pertenencia.
+    Camino rápido: una lectura al caché. Camino lento: lectura de la tabla
+    materializada + escritura en caché.
+    """
+    cache = _cache()
+    clave = _clave_entrada(pertenencia.usuario_id, pertenencia.empresa_id)
+    clave_generacion = _clave_generacion(pertenencia.usuario_id, pertenencia.empresa_id)
+
+    valores = cache.get_many([CLAVE_VERSION, clave_generacion, clave])
+    permisos = _entrada_vigente(valores, clave, clave_generacion)
+    if permisos is None:
+        permisos = _recalcular(cache, pertenencia, valores, clave, clave_generacion)
+    return permisos
+
+
+async def aobtener_permisos_efectivos(pertenencia):
+    """
+    Versión asíncrona para las vistas ASGI: el camino rápido usa el caché
+    async; el lento es el mismo de obtener_permisos_efectivos() en un hilo.
+    """
+    cache = _cache()
+    clave = _clave_entrada(pertenencia.usuario_id, pertenencia.empresa_id)
+    clave_generacion = _clave_generacion(pertenencia.usuario_id, pertenencia.empresa_id)
+
+    valores = await cache.aget_many([CLAVE_VERSION, clave_generacion, clave])
+    permisos = _entrada_vigente(valores, clave, clave_generacion)
+    if permisos is None:
+        permisos = await sync_to_async(_recalcular)(cache, pertenencia, valores, clave, clave_generacion)
+    return permisos
+
+
+def _entrada_vigente(valores, clave, clave_generacion):
+    """Los permisos cacheados si la entrada lleva la versión y generación actuales; si no, None."""
+    entrada = valores.get(clave)
+    if (
+        entrada is None
+        or entrada['version'] != valores.get(CLAVE_VERSION)
+        or entrada['generacion'] != valores.get(clave_generacion)
+    ):
+        return None
+    return entrada['permisos']
+
+
+def _recalcular(cache, pertenencia, valores, clave, clave_generacion):
+    """
+    Lee la tabla y guarda la entrada sellada con la versión y la generación
+    leídas ANTES de calcular: si una invalidación llega en medio, la entrada
+    nace con un sello viejo y el siguiente lector la descarta.
+    """
+    sello = {}
+    for nombre in (CLAVE_VERSION, clave_generacion):
+        valor = valores.get(nombre)
+        if valor is None:
+            # Valor nuevo y único: nunca coincide con entradas de un valor perdido.
+            valor = time.time_ns()
+            if not cache.add(nombre, valor, None):
+                valor = cache.get(nombre, valor)
+        sello[nombre] = valor
+
+    permisos = calcular_permisos_efectivos(pertenencia)
+    cache.set(
+        clave,
+        {'version': sello[CLAVE_VERSION], 'generacion': sello[clave_generacion], 'permisos': permisos},
+        settings.PERMISOS_CACHE_TIMEOUT
+    )
+    return permisos
+
+
+# ==============================================================================
+# 4. INVALIDACIÓN DEL CACHÉ
+# ==============================================================================
+
+def invalidar_permisos(usuario_id, empresa_id):
+    """Deja obsoleta la entrada de una sola Pertenencia (al confirmar la transacción)."""
+    invalidar_permisos_en_bloque([(usuario_id, empresa_id)])
+
+
+def invalidar_permisos_en_bloque(pares):
+    """Como invalidar_permisos() para varias (usuario_id, empresa_id): un solo set_many."""
+    claves = [_clave_generacion(usuario_id, empresa_id) for usuario_id, empresa_id in pares]
+    if claves:
+        transaction.on_commit(lambda: _cache().set_many(dict.fromkeys(claves, time.time_ns()), None))
+
+
+def invalidar_permisos_globales():
+    """Deja obsoletas TODAS las entradas incrementando la versión global."""
+    transaction.on_commit(lambda: _cache().set(CLAVE_VERSION, time.time_ns(), None))
+
+
+# ==============================================================================
+# 5. REGISTRO DE BITS (PASAPORTE COMPACTO)
+# ==============================================================================
+# Copia en memoria del registro IndicePermiso: (nombres por bit, bit por nombre).
+# Como el registro es de solo agregado, una copia vieja sigue siendo correcta
+# para los permisos que contiene; solo se recarga cuando aparece uno nuevo.
+_registro = ((), {})
+
+
+def obtener_registro(recargar=False):
+    """Devuelve (nombres, indices) del registro, leyéndolo de la BD si hace falta."""
+    global _registro
+    if recargar or not _registro[0]:
+        from .models import IndicePermiso
+
+        nombres = tuple(IndicePermiso.objects.order_by('bit').values_list('permiso', flat=True))
+        _registro = (nombres, {nombre: bit for bit, nombre in enumerate(nombres)})
+    return _registro
+
+
+def registro_cubre(permisos):
+    """True si la copia en memoria ya tiene bit para todos los permisos (sin BD)."""
+    indices = _registro[1]
+    return all(permiso in indices for permiso in permisos)
+
+
+def asegurar_registro(permisos):
+    """
+    Garantiza que todos los permisos tengan bit, registrando los faltantes al
+    final del registro. Devuelve (nombres, indices) actualizados.
+    """
+    from .models import IndicePermiso
+
+    if registro_cubre(permisos):
+        return _registro
+    nombres, indices = obtener_registro(recargar=True)
+    faltantes = sorted(set(permisos) - indices.keys())
+
+    while faltantes:
+        # bit = siguiente libre. Si otro worker registró en paralelo, la
+        # restricción única salta y reintentamos con el registro recargado.
+        try:
+            with transaction.atomic():
+                IndicePermiso.objects.bulk_create([
+                    IndicePermiso(permiso=permiso, bit=len(nombres) + posicion)
+                    for posicion, permiso in enumerate(faltantes)
+                ])
+        except IntegrityError:
+            pass
+        nombres, indices = obtener_registro(recargar=True)
+        faltantes = sorted(set(permisos) - indices.keys())
+    return nombres, indices
+
+
+def codificar_permisos(permisos):
+    """Lista "app.codename" -> (mapa de bits base64url, versión del registro)."""
+    nombres, indices = asegurar_registro(permisos)
+    return codificar_bits(indices[permiso] for permiso in permisos), len(nombres)
@@ -0,0 +1,359 @@
+"""
+CORE REVOCACIÓN - TOKENS QUE DEJAN DE VALER ANTES DE SU 'exp'
+-------------------------------------------------------------
+El Pasaporte dura ACCESS_TOKEN_LIFETIME (8 h). Sin esto, quitarle un permiso
+a alguien o desactivarlo no tenía efecto hasta que su token expiraba.
+
+Dos tipos de entrada:
+1. Por 'jti': un token puntual (logout). Dura hasta el 'exp' de ese token.
+2. Corte "no antes de" por usuario (y opcionalmente por empresa): todo token
+   emitido antes del corte deja de valer. Se compara en microsegundos contra
+   el claim 'iat_us' (ver marcar_emision): 'iat' es entero y un login hecho
+   en el mismo segundo, justo DESPUÉS del corte, no debe caer. Lo registran las bajas de
+   permisos delegados (también las vencidas), la desactivación del usuario,
+   la baja de una Pertenencia y el reseteo de clave.
+
+DÓNDE VIVE:
+- La BD (TokenRevocado, CorteSesion) es la fuente durable.
+- El caché REVOCACION_CACHE_ALIAS tiene una copia completa. AutenticacionJWT
+  la consulta en cada petición con UN get_many (jti + cortes + marca de
+  carga): O(1), sin tocar la BD.
+- La marca de carga dura REVOCACION_RECARGA segundos. Cuando vence, UNA
+  petición (candado con cache.add) recarga la copia desde la BD y de paso
+  purga lo que ya expiró; así la lista no crece. Si la copia sigue en el
+  caché, la recarga va en un hilo y todas siguen leyendo la copia; si el
+  caché se vació (reinicio de Redis), la que tiene el candado recarga y las
+  demás consultan solo su token en la BD hasta que la copia vuelva.
+
+ROTACIÓN DEL REFRESH (sección 4): cada Refresh sirve UNA vez. Usarlo revoca
+su 'jti' y emite uno nuevo de la misma 'familia' (claim que nace en el login
+y heredan sus Access y Pasaportes). Presentar un Refresh ya usado es señal de
+robo: se revoca la familia entera, y con ella toda la sesión derivada.
+
+Las apps satélite verifican el Pasaporte offline (hub_pasaporte): esta
+lista solo la aplica el Hub.
+"""
+
+import math
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+# v2: los cortes pasaron de segundos a microsegundos (fuerza la recarga tras el deploy)
+CLAVE_CARGADA = 'revocacion:cargada:v2'
+CLAVE_COPIA = 'revocacion:copia:v2'   # Sin vencimiento: está mientras el caché conserve la copia
+CLAVE_CARGANDO = 'revocacion:cargando'  # Candado: una sola recarga a la vez en todo el clúster
+CLAIM_FAMILIA = 'familia'
+CLAIM_EMISION = 'iat_us'
+EPOCA = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+# Las entradas del caché se agrupan por minuto de vencimiento (set_many por grupo)
+GRANULARIDAD = 60
+
+
+def _cache():
+    return caches[settings.REVOCACION_CACHE_ALIAS]
+
+
+def _clave_jti(jti):
+    return f'revocacion:jti:{jti}'
+
+
+def _clave_corte(usuario_id, empresa_id=None):
+    return f'revocacion:corte_us:{usuario_id}:{empresa_id or "*"}'
+
+
+def _microsegundos(momento):
+    """Epoch en microsegundos, exacto (sin pasar por float)."""
+    return (momento - EPOCA) // timedelta(microseconds=1)
+
+
+def marcar_emision(token):
+    """Agrega 'iat_us' (emisión con microsegundos) a un token recién creado."""
+    token[CLAIM_EMISION] = _microsegundos(token.current_time)
+    return token
+
+
+def emision_us(token):
+    """Momento de emisión en microsegundos; los tokens sin 'iat_us' usan 'iat' (piso del segundo)."""
+    if CLAIM_EMISION in token:
+        return token[CLAIM_EMISION]
+    return token.get('iat', 0) * 1_000_000
+
+
+def _jti_familia(familia):
+    # Una familia revocada se guarda como un 'jti' más: misma tabla, misma carga
+    return f'familia:{familia}'
+
+
+def vida_maxima():
+    """Lo que puede durar el token más longevo: un corte más viejo que esto ya no afecta a nadie."""
+    return max(jwt_settings.ACCESS_TOKEN_LIFETIME, jwt_settings.REFRESH_TOKEN_LIFETIME)
+
+
+def _timeout(vence, ahora):
+    """Segundos de caché hasta 'vence', redondeados hacia arriba al minuto."""
+    return max(GRANULARIDAD, math.ceil((vence - ahora).total_seconds() / GRANULARIDAD) * GRANULARIDAD)
+
+
+# ==============================================================================
+# 1. REGISTRO
+# ==============================================================================
+
+def revocar_token(token):
+    """Revoca UN token ya validado (AccessToken/RefreshToken de simplejwt) por su 'jti'."""
+    from .models import TokenRevocado
+
+    jti = token.get(jwt_settings.JTI_CLAIM)
+    if not jti:
+        return
+    expira = datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc)
+    TokenRevocado.objects.bulk_create(
+        [TokenRevocado(jti=jti, usuario_id=token.get(jwt_settings.USER_ID_CLAIM), expira=expira)],
+        ignore_conflicts=True,
+    )
+    _registrar_jti(jti, expira)
+
+
+def _registrar_jti(jti, expira):
+    timeout = _timeout(expira, timezone.now())
+    transaction.on_commit(lambda: _cache().set(_clave_jti(jti), True, timeout))
+
+
+def revocar_familia(familia, usuario_id):
+    """Revoca todo lo emitido a partir de un mismo login: Refresh, Access y Pasaportes."""
+    from .models import TokenRevocado
+
+    # Ningún token de la familia vive más que esto (ya no se pueden emitir nuevos)
+    expira = timezone.now() + vida_maxima()
+    jti = _jti_familia(familia)
+    TokenRevocado.objects.bulk_create(
+        [TokenRevocado(jti=jti, usuario_id=usuario_id, expira=expira)], ignore_conflicts=True
+    )
+    _registrar_jti(jti, expira)
+
+
+def cortar_sesiones(pares):
+    """
+    Invalida los tokens ya emitidos de cada (usuario_id, empresa_id); con
+    empresa_id=None, todos los del usuario. Un INSERT en bloque y un set_many
+    al confirmar la transacción, sin importar cuántos pares vengan.
+    """
+    from .models import CorteSesion
+
+    pares = set(pares)
+    if not pares:
+        return
+    no_antes = timezone.now()
+    CorteSesion.objects.bulk_create(
+        [CorteSesion(usuario_id=usuario_id, empresa_id=empresa_id, no_antes=no_antes) for usuario_id, empresa_id in pares]
+    )
+    corte = _microsegundos(no_antes)
+    valores = {_clave_corte(usuario_id, empresa_id): corte for usuario_id, empresa_id in pares}
+    timeout = _timeout(no_antes + vida_maxima(), no_antes)
+    transaction.on_commit(lambda: _cache().set_many(valores, timeout))
+
+
+# ==============================================================================
+# 2. COPIA EN CACHÉ: CARGA Y PURGA
+# ==============================================================================
+
+def cargar_revocaciones():
+    """
+    Purga lo vencido en la BD y vuelve a copiar lo vigente al caché. Devuelve
+    cuántas entradas copió. La llama verificar_token() cuando falta la marca.
+    """
+    from .models import CorteSesion, TokenRevocado
+
+    cache = _cache()
+    ahora = timezone.now()
+    limite_cortes = ahora - vida_maxima()
+    TokenRevocado.objects.filter(expira__lte=ahora).delete()
+    CorteSesion.objects.filter(no_antes__lte=limite_cortes).delete()
+
+    por_timeout = defaultdict(dict)
+    for jti, expira in TokenRevocado.objects.values_list('jti', 'expira').iterator(chunk_size=5000):
+        por_timeout[_timeout(expira, ahora)][_clave_jti(jti)] = True
+
+    # Solo importa el corte más reciente de cada (usuario, empresa)
+    vigentes = {}
+    for usuario_id, empresa_id, no_antes in CorteSesion.objects.values_list(
+        'usuario_id', 'empresa_id', 'no_antes'
+    ).iterator(chunk_size=5000):
+        clave = _clave_corte(usuario_id, empresa_id)
+        if clave not in vigentes or no_antes > vigentes[clave]:
+            vigentes[clave] = no_antes
+    for clave, no_antes in vigentes.items():
+        por_timeout[_timeout(no_antes + vida_maxima(), ahora)][clave] = _microsegundos(no_antes)
+
+    for timeout, valores in por_timeout.items():
+        cache.set_many(valores, timeout)
+    cache.set(CLAVE_COPIA, True, None)
+    cache.set(CLAVE_CARGADA, time.time(), settings.REVOCACION_RECARGA)
+    return sum(len(valores) for valores in por_timeout.values())
+
+
+# ==============================================================================
+# 3. VERIFICACIÓN (EN CADA PETICIÓN AUTENTICADA)
+# ==============================================================================
+
+def motivo_revocacion(token):
+    """None si el token sigue valiendo; si no, 'jti', 'familia' o 'corte'."""
+    usuario_id = token.get(jwt_settings.USER_ID_CLAIM)
+    empresa_id = token.get('empresa_id')
+    familia = token.get(CLAIM_FAMILIA)
+    clave_jti = _clave_jti(token.get(jwt_settings.JTI_CLAIM))
+    clave_familia = _clave_jti(_jti_familia(familia)) if familia else None
+    cortes = [_clave_corte(usuario_id)]
+    if empresa_id:
+        cortes.append(_clave_corte(usuario_id, empresa_id))
+
+    cache = _cache()
+    claves = [CLAVE_CARGADA, CLAVE_COPIA, clave_jti, *cortes]
+    if clave_familia:
+        claves.append(clave_familia)
+    valores = cache.get_many(claves)
+    if CLAVE_CARGADA not in valores:
+        copia_presente = CLAVE_COPIA in valores
+        if _recargar(cache, en_fondo=copia_presente):
+            if not copia_presente:
+                valores = cache.get_many(claves)
+        elif not copia_presente:
+            # Caché vacío (reinicio/desalojo) y otro proceso recargando: esta
+            # petición no espera la copia, consulta solo lo suyo en la BD
+            return _motivo_en_bd(token, usuario_id, empresa_id, familia)
+        # Con la copia presente se sigue sirviendo de ella mientras se recarga
+
+    if clave_jti in valores:
+        return 'jti'
+    if clave_familia in valores:
+        return 'familia'
+    corte = max((valores[clave] for clave in cortes if clave in valores), default=None)
+    if corte is not None and emision_us(token) < corte:
+        return 'corte'
+    return None
+
+
+def _recargar(cache, en_fondo):
+    """
+    Recarga la copia si nadie más lo está haciendo (candado con cache.add).
+    Devuelve False si otro proceso tiene el candado. 'en_fondo': en un hilo,
+    para que la petición que lo toma no pague la recarga completa.
+    """
+    if not cache.add(CLAVE_CARGANDO, True, settings.REVOCACION_RECARGA):
+        return False
+
+    def recargar():
+        try:
+            cargar_revocaciones()
+        finally:
+            cache.delete(CLAVE_CARGANDO)
+            if en_fondo:
+                connection.close()  # El hilo tiene su propia conexión
+
+    if en_fondo:
+        threading.Thread(target=recargar, name='recarga-revocaciones', daemon=True).start()
+    else:
+        recargar()
+    return True
+
+
+def _motivo_en_bd(token, usuario_id, empresa_id, familia):
+    """Lo mismo que motivo_revocacion() pero leyendo la BD (dos consultas por índice)."""
+    from .models import CorteSesion, TokenRevocado
+
+    jti = token.get(jwt_settings.JTI_CLAIM)
+    revocados = set(TokenRevocado.objects.filter(
+        jti__in=[jti, _jti_familia(familia)] if familia else [jti], expira__gt=timezone.now()
+    ).values_list('jti', flat=True))
+    if jti in revocados:
+        return 'jti'
+    if revocados:
+        return 'familia'
+    ambito = Q(empresa__isnull=True)
+    if empresa_id:
+        ambito |= Q(empresa_id=empresa_id)
+    corte = CorteSesion.objects.filter(ambito, usuario_id=usuario_id).aggregate(ultimo=Max('no_antes'))['ultimo']
+    if corte is not None and emision_us(token) < _microsegundos(corte):
+        return 'corte'
+    return None
+
+
+def verificar_token(token):
+    """Lanza InvalidToken si el token fue revocado (por 'jti', por su familia o por un corte posterior a su 'iat')."""
+    motivo = motivo_revocacion(token)
+    if motivo == 'corte':
+        raise InvalidToken("El token fue revocado: inicia sesión nuevamente.")
+    if motivo:
+        raise InvalidToken("El token fue revocado.")
+
+
+class AutenticacionJWT(JWTAuthentication):
+    """JWTAuthentication de simplejwt + la lista de revocación (DEFAULT_AUTHENTICATION_CLASSES)."""
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        verificar_token(token)
+        return token
+
+
+# ==============================================================================
+# 4. ROTACIÓN DEL REFRESH (DETECCIÓN DE REUSO)
+# ==============================================================================
+
+class RefreshReutilizado(InvalidToken):
+    """Se presentó un Refresh que ya había sido usado: la familia quedó revocada."""
+
+
+def nuevo_refresh(user, familia=None):
+    """RefreshToken de 'user' con su familia (una nueva en el login; la heredada al rotar)."""
+    refresh = marcar_emision(RefreshToken.for_user(user))
+    refresh[CLAIM_FAMILIA] = familia or uuid.uuid4().hex
+    return refresh
+
+
+def consumir_refresh(refresh):
+    """
+    Gasta un Refresh ya validado (firma y 'exp') y devuelve su familia para
+    emitir el siguiente. Lanza InvalidToken si fue revocado y
+    RefreshReutilizado si ya se había usado (revocando la familia). Llamarla
+    FUERA de una transacción: si no, el rollback se llevaría la revocación.
+    """
+    from .models import TokenRevocado
+
+    jti = refresh[jwt_settings.JTI_CLAIM]
+    usuario_id = refresh.get(jwt_settings.USER_ID_CLAIM)
+    familia = refresh.get(CLAIM_FAMILIA) or jti  # Refresh emitidos antes de la rotación
+
+    motivo = motivo_revocacion(refresh)
+    if motivo == 'jti':
+        _reuso(familia, usuario_id)
+    if motivo:
+        raise InvalidToken("El token fue revocado: inicia sesión nuevamente.")
+
+    # La fila es el candado: de dos rotaciones simultáneas con el mismo Refresh, una sola gana
+    expira = datetime.fromtimestamp(refresh['exp'], tz=dt_timezone.utc)
+    try:
+        with transaction.atomic():
+            TokenRevocado.objects.create(jti=jti, usuario_id=usuario_id, expira=expira)
+    except IntegrityError:
+        _reuso(familia, usuario_id)
+    _registrar_jti(jti, expira)
+    return familia
+
+
+def _reuso(familia, usuario_id):
+    revocar_familia(familia, usuario_id)
+    raise RefreshReutilizado("El Refresh ya fue usado: se cerraron todas las sesiones derivadas de ese login.")
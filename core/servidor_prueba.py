@@ -0,0 +1,108 @@
+"""
+CORE SERVIDOR DE PRUEBA - SERVIDORES LOCALES PARA BENCHMARKS Y PRUEBAS
+----------------------------------------------------------------------
+1. levantar_gunicorn(): el backend con gunicorn.conf.py (la misma
+   configuración que en producción) contra la BD configurada; espera a que
+   /readyz responda. Lo usan 'benchmark_conexiones' y 'benchmark_flujos'.
+   Las variables de 'entorno' se suman a las del proceso actual: así cada
+   benchmark elige el modo (DB_CONEXIONES, SERVIDOR_MODO...) sin tocar el .env.
+2. ReceptorWebhooks: una app satélite de mentira para core/webhooks.py.
+   Guarda cada POST recibido y puede fallar los primeros N.
+"""
+
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.conf import settings
+
+
+# ==============================================================================
+# 1. GUNICORN
+# ==============================================================================
+
+class ServidorNoListo(RuntimeError):
+    """Gunicorn terminó o no respondió /readyz a tiempo."""
+
+
+def levantar_gunicorn(puerto, entorno=None, espera=60):
+    """Inicia Gunicorn en 127.0.0.1:puerto y devuelve el proceso ya listo."""
+    variables = dict(os.environ, GUNICORN_BIND=f"127.0.0.1:{puerto}", GUNICORN_ACCESSLOG='')
+    variables.update(entorno or {})
+    proceso = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', str(settings.BASE_DIR / 'gunicorn.conf.py')],
+        cwd=settings.BASE_DIR, env=variables, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        start_new_session=True,  # Grupo propio: detener_gunicorn() alcanza a maestro y workers
+    )
+    limite = time.monotonic() + espera
+    while time.monotonic() < limite:
+        if proceso.poll() is not None:
+            raise ServidorNoListo(f"Gunicorn terminó al arrancar (código {proceso.returncode}).")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{puerto}/readyz", timeout=2):
+                return proceso
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.1)
+    detener_gunicorn(proceso)
+    raise ServidorNoListo(f"Gunicorn no quedó listo en {espera}s.")
+
+
+def detener_gunicorn(proceso):
+    os.killpg(proceso.pid, signal.SIGTERM)
+    try:
+        proceso.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        os.killpg(proceso.pid, signal.SIGKILL)
+
+
+# ==============================================================================
+# 2. RECEPTOR DE WEBHOOKS
+# ==============================================================================
+
+class ReceptorWebhooks:
+    """
+    Servidor HTTP en un hilo, en 127.0.0.1 y un puerto libre:
+
+        with ReceptorWebhooks(fallar=1) as receptor:
+            SuscriptorWebhook.objects.create(nombre='x', url=receptor.url, secreto='s')
+            ...
+            cabeceras, cuerpo = receptor.recibidos[0]
+
+    Responde 500 a los primeros 'fallar' POST y 204 a los demás.
+    """
+
+    def __init__(self, fallar=0):
+        self.fallar = fallar
+        self.recibidos = []  # [(cabeceras, cuerpo)] en orden de llegada
+        receptor = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            def do_POST(self):
+                cuerpo = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                receptor.recibidos.append((self.headers, cuerpo))
+                if receptor.fallar > 0:
+                    receptor.fallar -= 1
+                    self.send_response(500)
+                else:
+                    self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.servidor = ThreadingHTTPServer(('127.0.0.1', 0), Manejador)
+        self.url = f"http://127.0.0.1:{self.servidor.server_port}/webhook"
+
+    def __enter__(self):
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.servidor.shutdown()
+        self.servidor.server_close()
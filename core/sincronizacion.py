@@ -0,0 +1,139 @@
+"""
+CORE SINCRONIZACIÓN - CATÁLOGO DE PERMISOS DE LOS MODELOS FANTASMA
+------------------------------------------------------------------
+Lleva la tabla auth_permission al estado que declara el código (Meta.permissions
+de los modelos 'managed=False', ver core/models.py sección 3) por diferencia:
+
+1. contenedores_de_permisos(): descubre los modelos fantasma de todas las apps
+   instaladas (ya no hay una lista a mano que mantener).
+2. planificar_sincronizacion(): UNA consulta para los ContentTypes y UNA para
+   los permisos existentes; el diff (crear / renombrar / borrar) se arma en memoria.
+3. aplicar_sincronizacion(): aplica el plan en una transacción con
+   operaciones en bloque. Sin cambios pendientes no escribe nada.
+
+Lo usa 'manage.py sync_permisos_full' (y el entrypoint en cada deploy).
+"""
+
+from django.apps import apps
+from django.contrib.auth import get_permission_codename
+from django.contrib.auth.models import Permission
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+
+from .permisos import invalidar_permisos_globales
+
+
+# ==============================================================================
+# 1. DESCUBRIMIENTO
+# ==============================================================================
+
+def contenedores_de_permisos():
+    """Modelos 'managed=False' (no proxy) de las apps instaladas, en orden estable."""
+    modelos = [
+        modelo for modelo in apps.get_models()
+        if not modelo._meta.managed and not modelo._meta.proxy
+    ]
+    return sorted(modelos, key=lambda m: (m._meta.app_label, m._meta.model_name))
+
+
+def permisos_declarados(modelo):
+    """{codename: nombre} que Django generaría para 'modelo' (default_permissions + Meta.permissions)."""
+    opts = modelo._meta
+    declarados = {
+        get_permission_codename(accion, opts): f"Can {accion} {opts.verbose_name_raw}"
+        for accion in opts.default_permissions
+    }
+    declarados.update(dict(opts.permissions))
+    return declarados
+
+
+# ==============================================================================
+# 2. PLAN (DIFF EN MEMORIA)
+# ==============================================================================
+
+def planificar_sincronizacion(modelos=None):
+    """
+    Devuelve {'crear': [...], 'renombrar': [...], 'borrar': [...]} con un dict
+    por permiso ('app', 'modelo', 'codename', 'nombre'...). No escribe nada.
+    """
+    modelos = contenedores_de_permisos() if modelos is None else list(modelos)
+    claves = {(m._meta.app_label, m._meta.model_name): m for m in modelos}
+
+    # Consulta 1: ContentTypes de todos los contenedores (los que falten se crean al aplicar)
+    tipos = {
+        (ct.app_label, ct.model): ct
+        for ct in ContentType.objects.filter(
+            app_label__in={app for app, _ in claves},
+            model__in={modelo for _, modelo in claves},
+        )
+        if (ct.app_label, ct.model) in claves
+    }
+
+    # Consulta 2: todos los permisos existentes de esos ContentTypes
+    existentes = {}
+    for pk, ct_id, codename, nombre in Permission.objects.filter(
+        content_type__in=list(tipos.values())
+    ).values_list('pk', 'content_type_id', 'codename', 'name'):
+        existentes.setdefault(ct_id, {})[codename] = (pk, nombre)
+
+    plan = {'crear': [], 'renombrar': [], 'borrar': []}
+    for (app, modelo), clase in claves.items():
+        ct = tipos.get((app, modelo))
+        actuales = existentes.get(ct.pk, {}) if ct else {}
+        declarados = permisos_declarados(clase)
+
+        for codename, nombre in declarados.items():
+            if codename not in actuales:
+                plan['crear'].append({'app': app, 'modelo': modelo, 'codename': codename, 'nombre': nombre})
+            elif actuales[codename][1] != nombre:
+                plan['renombrar'].append({
+                    'id': actuales[codename][0], 'app': app, 'modelo': modelo, 'codename': codename,
+                    'nombre_anterior': actuales[codename][1], 'nombre': nombre,
+                })
+        for codename, (pk, nombre) in actuales.items():
+            if codename not in declarados:
+                plan['borrar'].append({'id': pk, 'app': app, 'modelo': modelo, 'codename': codename, 'nombre': nombre})
+    return plan
+
+
+def plan_vacio(plan):
+    return not any(plan.values())
+
+
+# ==============================================================================
+# 3. APLICACIÓN (EN BLOQUE, UNA TRANSACCIÓN)
+# ==============================================================================
+
+@transaction.atomic
+def aplicar_sincronizacion(plan):
+    """Aplica un plan de planificar_sincronizacion(). Devuelve los conteos por operación."""
+    if plan_vacio(plan):
+        return {operacion: 0 for operacion in plan}
+
+    if plan['crear']:
+        modelos = {(p['app'], p['modelo']) for p in plan['crear']}
+        # get_for_models(): una consulta y crea los ContentTypes que falten
+        tipos = {
+            (ct.app_label, ct.model): ct
+            for ct in ContentType.objects.get_for_models(
+                *(apps.get_model(app, modelo) for app, modelo in modelos), for_concrete_models=False
+            ).values()
+        }
+        Permission.objects.bulk_create([
+            Permission(content_type=tipos[(p['app'], p['modelo'])], codename=p['codename'], name=p['nombre'])
+            for p in plan['crear']
+        ])
+
+    if plan['renombrar']:
+        # Solo cambia 'name': el "app.codename" de los Pasaportes no se altera
+        Permission.objects.bulk_update(
+            [Permission(pk=p['id'], name=p['nombre']) for p in plan['renombrar']], ['name']
+        )
+
+    if plan['borrar']:
+        # Un DELETE ... WHERE id IN (...); las señales de Permission recalculan
+        # los permisos efectivos de quienes los tenían (core/models.py sección 9)
+        Permission.objects.filter(pk__in=[p['id'] for p in plan['borrar']]).delete()
+
+    invalidar_permisos_globales()
+    return {operacion: len(filas) for operacion, filas in plan.items()}
@@ -0,0 +1,217 @@
+"""
+CORE SINTÉTICO - ORGANIZACIÓN DE PRUEBA PARA BENCHMARKS
+-------------------------------------------------------
+Siembra una organización ficticia con la forma de la real (miles de usuarios,
+decenas de Empresas, Áreas y Roles, jefaturas y excepciones) para medir los
+flujos de identidad con datos de tamaño realista:
+
+1. sembrar_organizacion(): determinista (misma semilla = misma organización)
+   y en bloque: unos pocos INSERT masivos + sincronización de PermisoEfectivo.
+2. limpiar_organizacion(): borra todo lo sintético. El historial de auditoría
+   es de solo agregado, así que los usuarios que ya tienen eventos no se
+   borran: se desactivan y una nueva siembra los reutiliza.
+3. casos_de_delegacion(): pares (jefe, empleado, empresa) válidos para
+   /api/delegar-permiso/.
+
+Todo lo sintético lleva el prefijo 'syn' (usuarios syn_u00001, empresas SY001,
+roles SYN_A01_R1...) y correos @sintetico.invalid (dominio reservado, nunca se
+entregan). Lo usan 'manage.py sembrar_organizacion', 'benchmark_flujos' y las
+pruebas de core/tests.py.
+"""
+
+import random
+from collections import Counter
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, Permission, User
+from django.db import transaction
+from django.db.models import Count
+
+from .aprovisionamiento import crear_usuarios_en_bloque
+from .models import Area, CorreoPendiente, Empresa, HistorialCambiosRol, PerfilGrupo, Pertenencia
+from .permisos import invalidar_permisos_globales, sincronizar_permisos_efectivos
+
+PREFIJO_USUARIO = 'syn_u'
+PREFIJO_EMPRESA = 'SY'
+PREFIJO_AREA = 'SYN_A'
+PREFIJO_GRUPO = 'SYN_'
+DOMINIO_CORREO = 'sintetico.invalid'
+
+
+def nombre_usuario(n):
+    return f"{PREFIJO_USUARIO}{n:05d}"
+
+
+def correo_usuario(n):
+    return f"{nombre_usuario(n)}@{DOMINIO_CORREO}"
+
+
+def permisos_delegables():
+    """Permisos cuyo codename es único (delegables sin calificar con la app)."""
+    return list(
+        Permission.objects.values('codename').annotate(n=Count('id')).filter(n=1)
+        .order_by('codename').values_list('codename', flat=True)
+    )
+
+
+# ==============================================================================
+# 1. SIEMBRA
+# ==============================================================================
+
+@transaction.atomic
+def sembrar_organizacion(usuarios=2000, empresas=20, areas=8, roles_por_area=4, empresas_por_usuario=3,
+                         tasa_excepciones=0.2, clave='clave-sintetica-123', hash_clave=None, semilla=7):
+    """
+    Crea (o completa) la organización sintética. Devuelve los conteos.
+
+    - Cada usuario vive en UN área y pertenece a 'empresas_por_usuario' empresas,
+      con un rol de su área. El rol 1 de cada área es gerencial (~1 de cada 10).
+    - 'tasa_excepciones': fracción de Pertenencias con 1 a 3 permisos_adicionales.
+    - hash_clave: hash ya calculado para 'clave' (ej: con pocas iteraciones); si
+      no viene se calcula UNA vez con el hasher preferido y se comparte.
+    """
+    # Un generador por fase: repetir la siembra consume la misma secuencia
+    # aunque los catálogos ya existan (misma semilla = mismas asignaciones)
+    rng_roles, rng = random.Random(f"{semilla}-roles"), random.Random(f"{semilla}-asignacion")
+    catalogo = sorted(Permission.objects.values_list('pk', flat=True))
+    if not catalogo:
+        raise ValueError("No hay Permisos: ejecutar migrate/sync_permisos_full antes de sembrar.")
+
+    # 1. Catálogos (idempotente: se reutiliza lo sembrado antes)
+    lista_areas = [
+        Area.objects.get_or_create(codigo=f"{PREFIJO_AREA}{a:02d}", defaults={'nombre': f"Área Sintética {a:02d}"})[0]
+        for a in range(1, areas + 1)
+    ]
+    lista_empresas = [
+        Empresa.objects.get_or_create(codigo=f"{PREFIJO_EMPRESA}{e:03d}", defaults={'nombre': f"Empresa Sintética {e:03d}"})[0]
+        for e in range(1, empresas + 1)
+    ]
+    roles_por_area_id = {}
+    for area in lista_areas:
+        roles = []
+        for r in range(1, roles_por_area + 1):
+            grupo, creado = Group.objects.get_or_create(name=f"{PREFIJO_GRUPO}{area.codigo[len(PREFIJO_AREA):]}_R{r}")
+            permisos = rng_roles.sample(catalogo, min(len(catalogo), rng_roles.randint(5, 15)))
+            if creado:
+                grupo.permissions.set(permisos)
+                PerfilGrupo.objects.create(grupo=grupo, area=area, es_gerencial=(r == 1))
+            roles.append(grupo)
+        roles_por_area_id[area.pk] = roles
+
+    # 2. Usuarios: los que quedaron de una siembra anterior se reactivan
+    hash_clave = hash_clave or make_password(clave)
+    nombres = [nombre_usuario(n) for n in range(1, usuarios + 1)]
+    existentes = User.objects.filter(username__in=nombres)
+    existentes.update(password=hash_clave, is_active=True)
+    ids = dict(existentes.values_list('username', 'id'))
+    nuevos = [
+        User(username=nombre, email=correo_usuario(n), first_name='Usuario', last_name=f"Sintético {n}", password=hash_clave)
+        for n, nombre in enumerate(nombres, start=1) if nombre not in ids
+    ]
+    crear_usuarios_en_bloque(nuevos, debe_cambiar_password=False, batch_size=2000)
+    ids.update((u.username, u.pk) for u in nuevos)
+
+    # 3. Pertenencias (solo las que faltan) + excepciones
+    ya_asignadas = set(
+        Pertenencia.objects.filter(usuario_id__in=ids.values()).values_list('usuario_id', 'empresa_id')
+    )
+    nuevas = []
+    for nombre in nombres:
+        area = rng.choice(lista_areas)
+        roles = roles_por_area_id[area.pk]
+        for empresa in rng.sample(lista_empresas, min(empresas_por_usuario, len(lista_empresas))):
+            # ~10% jefaturas: el rol gerencial del área
+            grupo = roles[0] if rng.random() < 0.1 else rng.choice(roles[1:] or roles)
+            if (ids[nombre], empresa.pk) in ya_asignadas:
+                continue
+            nuevas.append(Pertenencia(usuario_id=ids[nombre], empresa_id=empresa.pk, grupo_id=grupo.pk, area_id=area.pk))
+    Pertenencia.objects.bulk_create(nuevas, batch_size=2000)
+
+    Excepcion = Pertenencia.permisos_adicionales.through
+    excepciones = [
+        Excepcion(pertenencia_id=p.pk, permission_id=permiso)
+        for p in nuevas if rng.random() < tasa_excepciones
+        for permiso in rng.sample(catalogo, min(len(catalogo), rng.randint(1, 3)))
+    ]
+    Excepcion.objects.bulk_create(excepciones, batch_size=5000, ignore_conflicts=True)
+
+    # bulk_create no dispara señales: materializamos a mano
+    altas, _ = sincronizar_permisos_efectivos(p.pk for p in nuevas)
+    invalidar_permisos_globales()
+
+    return {
+        'areas': len(lista_areas),
+        'empresas': len(lista_empresas),
+        'roles': sum(len(r) for r in roles_por_area_id.values()),
+        'usuarios_creados': len(nuevos),
+        'usuarios_reutilizados': len(nombres) - len(nuevos),
+        'pertenencias_creadas': len(nuevas),
+        'excepciones': len(excepciones),
+        'permisos_efectivos': altas,
+    }
+
+
+# ==============================================================================
+# 2. LIMPIEZA
+# ==============================================================================
+
+def _borrar(queryset):
+    """Filas borradas del modelo del queryset (sin contar las cascadas)."""
+    _, por_modelo = queryset.delete()
+    return por_modelo.get(queryset.model._meta.label, 0)
+
+
+@transaction.atomic
+def limpiar_organizacion():
+    """Borra lo sintético. Usuarios con auditoría: se desactivan (el historial no se borra)."""
+    usuarios = User.objects.filter(username__startswith=PREFIJO_USUARIO)
+    historial = HistorialCambiosRol.objects.all()
+    conservados = set(
+        historial.filter(actor__username__startswith=PREFIJO_USUARIO).values_list('actor_id', flat=True)
+    ) | set(
+        historial.filter(usuario_afectado__username__startswith=PREFIJO_USUARIO).values_list('usuario_afectado_id', flat=True)
+    )
+
+    Pertenencia.objects.filter(usuario__in=usuarios).delete()
+    desactivados = usuarios.filter(pk__in=conservados).update(is_active=False)
+    conteos = {
+        'usuarios_borrados': _borrar(usuarios.exclude(pk__in=conservados)),
+        'usuarios_desactivados': desactivados,
+        'correos': _borrar(CorreoPendiente.objects.filter(destinatario__endswith=f"@{DOMINIO_CORREO}")),
+        # Empresas con Pertenencias reales (no sintéticas) no se tocan
+        'empresas': _borrar(Empresa.objects.filter(codigo__startswith=PREFIJO_EMPRESA, pertenencia__isnull=True)),
+        'roles': _borrar(Group.objects.filter(name__startswith=PREFIJO_GRUPO)),
+        'areas': _borrar(Area.objects.filter(codigo__startswith=PREFIJO_AREA)),
+    }
+    invalidar_permisos_globales()
+    return conteos
+
+
+# ==============================================================================
+# 3. CASOS PARA LOS FLUJOS
+# ==============================================================================
+
+def casos_de_delegacion(limite=500):
+    """[(username_jefe, empresa_id, usuario_destino_id)]: jefe gerencial y empleado de su misma área."""
+    sinteticas = Pertenencia.objects.filter(usuario__username__startswith=PREFIJO_USUARIO, usuario__is_active=True)
+
+    # Empleados (no gerenciales) por (empresa, área): una consulta
+    empleados = {}
+    for empresa_id, area_id, usuario_id in sinteticas.filter(grupo__perfil__es_gerencial=False).order_by(
+        'usuario_id'
+    ).values_list('empresa_id', 'grupo__perfil__area_id', 'usuario_id'):
+        empleados.setdefault((empresa_id, area_id), []).append(usuario_id)
+
+    jefes = sinteticas.filter(grupo__perfil__es_gerencial=True).order_by('usuario_id', 'empresa_id').values_list(
+        'usuario__username', 'empresa_id', 'grupo__perfil__area_id'
+    )
+    # Cada jefe de un mismo equipo recibe un empleado distinto (flujos concurrentes
+    # sobre el mismo empleado se invalidarían el enlace de reseteo entre sí)
+    asignados = Counter()
+    casos = []
+    for username, empresa_id, area_id in jefes:
+        equipo = empleados.get((empresa_id, area_id))
+        if equipo:
+            casos.append((username, empresa_id, equipo[asignados[(empresa_id, area_id)] % len(equipo)]))
+            asignados[(empresa_id, area_id)] += 1
+    return casos[:limite]
@@ -1,3 +1,1101 @@
-from django.test import TestCase
+"""
+CORE TESTS - PRUEBAS DE REGRESIÓN
+---------------------------------
+Ejecutar con: python manage.py test core
+"""
 
-# Create your tests here.
+import csv
+import http.client
+import io
+import json
+import smtplib
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock, skipUnless
+
+import jwt
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, Permission, User
+from django.contrib.contenttypes.models import ContentType
+from django.core import mail
+from django.core.cache import caches
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, transaction
+from django.db.migrations.recorder import MigrationRecorder
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path
+from django.utils import timezone
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from hub_core import urls as rutas_del_hub
+from hub_pasaporte import ClaveCompartida, PasaporteInvalido, RegistroEstatico, VerificadorPasaporte, expandir_bits
+from hub_pasaporte.webhooks import CABECERA, verificar_firma
+
+from .aprovisionamiento import crear_usuarios_en_bloque, reparar_perfiles, usuarios_sin_perfil
+from .arranque import calcular_huella, guardar_huella, huella_guardada, migraciones_pendientes
+from .auditoria import registrar_evento
+from .autenticacion import BackendLoginAcotado, LoginSaturadoError, ejecutar_hash
+from .cache import CacheDosNiveles
+from .conexiones import estadisticas_de_conexiones, estadisticas_de_pool
+from .correo import calcular_backoff as calcular_backoff_correo, encolar_correo, procesar_lote as procesar_correos
+from .delegacion import vencer_delegaciones
+from .firmas import AlmacenClaves, TokenBackendRotativo
+from .importacion import exportar_pertenencias
+from .metricas import cerrar_medicion, iniciar_medicion, revisar_presupuesto
+from .models import (
+    CorreoPendiente, CorteSesion, Empresa, EntregaWebhook, ExcepcionPermiso, HistorialCambiosRol, IndicePermiso,
+    ModuloCompras, PerfilUsuario, PermisoEfectivo, Pertenencia, SuscriptorWebhook,
+)
+from .permisos import calcular_permisos_efectivos, codificar_permisos, obtener_permisos_efectivos, obtener_registro
+from .revocacion import CLAVE_CARGADA, CLAVE_CARGANDO, cargar_revocaciones, cortar_sesiones, motivo_revocacion
+from .servidor_prueba import ReceptorWebhooks
+from .sincronizacion import plan_vacio, planificar_sincronizacion
+from .sintetico import casos_de_delegacion, permisos_delegables, sembrar_organizacion
+from .views import AuditoriaView
+from .views_async import CustomLoginAsyncView, DelegarPermisosAsyncView, SelectEmpresaAsyncView
+from .webhooks import procesar_lote
+
+
+# Hasher rápido: aquí medimos consultas SQL, no el costo de PBKDF2.
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class LoginContextoConsultasTests(TestCase):
+    """
+    El Login debe costar un número FIJO de consultas, sin importar a cuántas
+    empresas pertenezca el usuario (sin N+1 por Empresa ni por Perfil).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.grupo = Group.objects.create(name='OPERADOR')
+        cls.empresas = [
+            Empresa.objects.create(nombre=f'Empresa {i}', codigo=f'E{i}', activo=(i != 4))
+            for i in range(5)
+        ]
+
+    def _crear_usuario(self, username, n_empresas):
+        user = User.objects.create_user(username, f'{username}@provefrut.com', 'clave-segura-123')
+        for empresa in self.empresas[:n_empresas]:
+            Pertenencia.objects.create(usuario=user, empresa=empresa, grupo=self.grupo)
+        return user
+
+    def _login(self, username):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.post(
+                '/api/login/',
+                {'username': username, 'password': 'clave-segura-123'},
+                content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(consultas)
+
+    def test_numero_de_consultas_no_depende_de_las_empresas(self):
+        self._crear_usuario('una_empresa', 1)
+        self._crear_usuario('cinco_empresas', 5)
+
+        data_una, consultas_una = self._login('una_empresa')
+        data_cinco, consultas_cinco = self._login('cinco_empresas')
+
+        self.assertEqual(len(data_una['empresas_disponibles']), 1)
+        self.assertEqual(len(data_cinco['empresas_disponibles']), 5)
+        self.assertEqual(consultas_una, consultas_cinco)
+        # 1 consulta de autenticación + 1 consulta de contexto
+        self.assertEqual(consultas_cinco, 2)
+
+    def test_usuario_sin_empresas_conserva_la_bandera_de_seguridad(self):
+        self._crear_usuario('sin_empresas', 0)
+
+        data, _ = self._login('sin_empresas')
+
+        self.assertEqual(data['empresas_disponibles'], [])
+        self.assertTrue(data['debe_cambiar_password'])
+
+    @override_settings(LOGIN_SOLO_EMPRESAS_ACTIVAS=True)
+    def test_filtra_empresas_inactivas(self):
+        self._crear_usuario('con_inactiva', 5)
+
+        data, _ = self._login('con_inactiva')
+
+        codigos = [e['codigo'] for e in data['empresas_disponibles']]
+        self.assertEqual(codigos, ['E0', 'E1', 'E2', 'E3'])
+
+
+# Preferido PBKDF2 (barato aquí) y claves viejas en MD5: fuerzan el re-hash.
+@override_settings(
+    PASSWORD_HASHERS=['core.hashers.PBKDF2Ajustado', 'django.contrib.auth.hashers.MD5PasswordHasher'],
+    PASSWORD_PBKDF2_ITERACIONES=1000,
+)
+class LoginAcotadoTests(TestCase):
+    """Comportamiento del login cuando el pool de hashing (core/autenticacion.py) no tiene cupo."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('acotado', 'acotado@provefrut.com')
+        self.user.password = make_password('clave-segura-123', hasher='md5')
+        self.user.save(update_fields=['password'])
+
+    def test_login_saturado_responde_503_con_retry_after(self):
+        with mock.patch('core.autenticacion.enviar_hash', side_effect=LoginSaturadoError):
+            response = self.client.post(
+                '/api/login/', {'username': 'acotado', 'password': 'clave-segura-123'}, content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], str(settings.LOGIN_RETRY_AFTER))
+
+    def test_rehash_se_omite_si_el_pool_esta_saturado(self):
+        def sin_cupo_para_rehash(funcion, *args):
+            if funcion is make_password:
+                raise LoginSaturadoError()
+            return ejecutar_hash(funcion, *args)
+
+        # La clave ya verificada vale aunque el re-hash no tenga cupo
+        with mock.patch('core.autenticacion.ejecutar_hash', side_effect=sin_cupo_para_rehash):
+            user = BackendLoginAcotado().authenticate(None, username='acotado', password='clave-segura-123')
+        self.assertEqual(user, self.user)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('md5$'))
+
+        # Con cupo, el siguiente login la lleva al hasher preferido
+        BackendLoginAcotado().authenticate(None, username='acotado', password='clave-segura-123')
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class FlujosIdentidadConsultasTests(TestCase):
+    """
+    Presupuesto de consultas de los flujos que recorre 'benchmark_flujos',
+    sobre una organización sintética chica (core/sintetico.py). Si un cambio
+    agrega un N+1, estas cifras fijas fallan antes del deploy.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        sembrar_organizacion(usuarios=40, empresas=4, areas=2, roles_por_area=3, empresas_por_usuario=2)
+        cls.jefe, cls.empresa_id, cls.empleado_id = casos_de_delegacion(limite=1)[0]
+        cls.permiso = permisos_delegables()[0]
+
+    def setUp(self):
+        # Sin restos de otras pruebas (cortes, throttling, permisos en la capa
+        # local) y con la copia de la lista de revocación ya cargada: el
+        # estado estable que se mide
+        caches['default'].clear()  # También vacía 'compartido'
+        cargar_revocaciones()
+
+    def _post(self, ruta, datos, token=None):
+        extra = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if token else {}
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.post(ruta, datos, content_type='application/json', **extra)
+        return response, len(consultas)
+
+    def _token(self, username=None):
+        response, _ = self._post('/api/login/', {'username': username or self.jefe, 'password': 'clave-sintetica-123'})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['access']
+
+    def test_select_empresa(self):
+        response, consultas = self._post('/api/select-empresa/', {'empresa_id': self.empresa_id}, self._token())
+        self.assertEqual(response.status_code, 200)
+        # Usuario + Pertenencia (con empresa y grupo) + permisos materializados
+        self.assertEqual(consultas, 3)
+
+    def test_pasaporte_verificado_por_el_sdk(self):
+        login = self._token()
+        response, _ = self._post('/api/select-empresa/', {'empresa_id': self.empresa_id}, login)
+        token = response.json()['access_token']
+        pertenencia = Pertenencia.objects.get(usuario__username=self.jefe, empresa_id=self.empresa_id)
+
+        # La app satélite verifica sin red y ve los mismos permisos que calculó el Hub
+        verificador = VerificadorPasaporte(ClaveCompartida(settings.SIMPLE_JWT['SIGNING_KEY']))
+        pasaporte = verificador.verificar(token)
+        self.assertEqual((pasaporte.username, pasaporte.empresa_id), (self.jefe, self.empresa_id))
+        self.assertEqual(pasaporte.permisos, frozenset(calcular_permisos_efectivos(pertenencia)))
+        self.assertIs(verificador.verificar(token), pasaporte)  # LRU de verificados
+
+        # El token de login (sin empresa), uno alterado o con otra clave no son Pasaportes
+        for invalido, fuente in (
+            (login, verificador.fuente_clave),
+            (token[:-2] + ('AA' if not token.endswith('AA') else 'BB'), verificador.fuente_clave),
+            (token, ClaveCompartida('otra-clave')),
+        ):
+            with self.assertRaises(PasaporteInvalido):
+                VerificadorPasaporte(fuente).verificar(invalido)
+
+    @override_settings(PASAPORTE_PERMISOS_COMPACTOS=True)
+    def test_pasaporte_compacto_ida_y_vuelta(self):
+        obtener_registro(recargar=True)  # Sin la copia en memoria de otra prueba
+        response, _ = self._post('/api/select-empresa/', {'empresa_id': self.empresa_id}, self._token())
+        token = response.json()['access_token']
+        claims = AccessToken(token)
+        self.assertNotIn('permisos', claims)
+        pertenencia = Pertenencia.objects.get(usuario__username=self.jefe, empresa_id=self.empresa_id)
+        esperados = frozenset(calcular_permisos_efectivos(pertenencia))
+
+        # Cada permiso quedó con su bit en IndicePermiso y el mapa se expande igual
+        nombres = list(IndicePermiso.objects.order_by('bit').values_list('permiso', flat=True))
+        self.assertEqual(claims['permisos_reg'], len(nombres))
+        self.assertEqual(expandir_bits(claims['permisos_bits'], nombres), esperados)
+        clave = ClaveCompartida(settings.SIMPLE_JWT['SIGNING_KEY'])
+        pasaporte = VerificadorPasaporte(clave, registro=RegistroEstatico(nombres)).verificar(token)
+        self.assertEqual(pasaporte.permisos, esperados)
+
+        # Un registro local más viejo que el del token no adivina: rechaza
+        with self.assertRaises(PasaporteInvalido):
+            VerificadorPasaporte(clave, registro=RegistroEstatico(nombres[:-1])).verificar(token)
+
+        # Los bits ya asignados no cambian: registrar otro permiso solo agrega al final
+        codificar_permisos(['core.permiso_nuevo'])
+        self.assertEqual(
+            list(IndicePermiso.objects.order_by('bit').values_list('permiso', flat=True)),
+            nombres + ['core.permiso_nuevo'],
+        )
+
+    def test_cambios_de_permisos_llegan_al_siguiente_pasaporte(self):
+        empleado = User.objects.get(pk=self.empleado_id)
+        login = self._token(empleado.username)
+        pertenencia = Pertenencia.objects.select_related('grupo__perfil').get(
+            usuario=empleado, empresa_id=self.empresa_id
+        )
+        nuevo = Permission.objects.create(
+            codename='prueba_cache', name='Prueba de caché', content_type=ContentType.objects.get_for_model(Empresa)
+        )
+
+        def pasaporte():
+            response, consultas = self._post('/api/select-empresa/', {'empresa_id': self.empresa_id}, login)
+            return 'core.prueba_cache' in AccessToken(response.json()['access_token'])['permisos'], consultas
+
+        def cambio(accion):
+            with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+                accion()
+
+        self.assertFalse(pasaporte()[0])
+        cambio(lambda: pertenencia.grupo.permissions.add(nuevo))
+        self.assertTrue(pasaporte()[0])
+        cambio(lambda: pertenencia.grupo.permissions.remove(nuevo))
+        self.assertFalse(pasaporte()[0])
+
+        # Un lector que calculó justo antes de una invalidación no la pisa
+        cambio(lambda: pertenencia.permisos_adicionales.add(nuevo))
+
+        def lector_lento(p):
+            viejos = calcular_permisos_efectivos(p)
+            cambio(lambda: pertenencia.permisos_adicionales.remove(nuevo))
+            return viejos
+
+        with mock.patch('core.permisos.calcular_permisos_efectivos', side_effect=lector_lento):
+            self.assertIn('core.prueba_cache', obtener_permisos_efectivos(pertenencia))
+        self.assertFalse(pasaporte()[0])
+
+        # PerfilGrupo descarta la entrada cacheada (vuelve la consulta de permisos)
+        self.assertEqual(pasaporte()[1], 2)
+        perfil = pertenencia.grupo.perfil
+        perfil.es_gerencial = not perfil.es_gerencial
+        cambio(perfil.save)
+        self.assertEqual(pasaporte()[1], 3)
+
+        cambio(lambda: pertenencia.permisos_adicionales.add(nuevo))
+        self.assertTrue(pasaporte()[0])
+        cambio(nuevo.delete)
+        self.assertFalse(pasaporte()[0])
+
+    def test_delegar_permiso(self):
+        token = self._token()
+        # Incluye SAVEPOINT/RELEASE de la transacción de aplicar_delegacion(), el
+        # INSERT de auditoría, los suscriptores de webhooks (core/webhooks.py) y,
+        # al quitar, el corte de los Pasaportes ya emitidos (core/revocacion.py)
+        for accion, esperadas in (('add', 15), ('remove', 14)):
+            response, consultas = self._post('/api/delegar-permiso/', {
+                'usuario_destino_id': self.empleado_id, 'empresa_id': self.empresa_id,
+                'permiso_codename': self.permiso, 'accion': accion,
+            }, token)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(consultas, esperadas, accion)
+
+    def test_delegar_permiso_lote(self):
+        token = self._token()
+        empleados = [c[2] for c in casos_de_delegacion() if c[:2] == (self.jefe, self.empresa_id)][:1]
+        permisos = permisos_delegables()
+
+        def lote(nombres):
+            operaciones = [
+                {'usuario_destino_id': empleados[0], 'permiso': permiso, 'accion': 'add'} for permiso in nombres
+            ]
+            return self._post('/api/delegar-permiso/lote/', {
+                'empresa_id': self.empresa_id, 'operaciones': operaciones,
+            }, token)
+
+        # El costo no crece con el tamaño del lote
+        chico, consultas_chico = lote(permisos[:5])
+        self.assertEqual(chico.json()['aplicadas'], 5)
+        grande, consultas_grande = lote(permisos[:25])
+        self.assertEqual((grande.json()['aplicadas'], grande.json()['sin_cambios']), (20, 5))
+        self.assertEqual(consultas_chico, consultas_grande)
+
+    def test_auditoria_en_la_transaccion_del_cambio(self):
+        eventos = HistorialCambiosRol.objects.filter(usuario_afectado_id=self.empleado_id)
+
+        # Un cambio revertido no deja evento
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            registrar_evento(self.empleado_id, self.empleado_id, "Prueba")
+            raise RuntimeError
+        self.assertFalse(eventos.exists())
+
+        # Uno confirmado lo deja al responder, sin esperar a ningún buffer
+        self._post('/api/delegar-permiso/', {
+            'usuario_destino_id': self.empleado_id, 'empresa_id': self.empresa_id,
+            'permiso_codename': self.permiso, 'accion': 'add',
+        }, self._token())
+        self.assertEqual(list(eventos.values_list('accion', flat=True)), ['Delegación (add)'])
+
+    def test_delegacion_temporal_vence(self):
+        token = self._token()
+        vence_en = timezone.now() + timedelta(hours=1)
+        response, _ = self._post('/api/delegar-permiso/lote/', {'empresa_id': self.empresa_id, 'operaciones': [
+            {'usuario_destino_id': self.empleado_id, 'permiso': permiso, 'accion': 'add', 'vence_en': vence_en.isoformat()}
+            for permiso in permisos_delegables()[:3]
+        ]}, token)
+        self.assertEqual(response.json()['aplicadas'], 3)
+        temporales = ExcepcionPermiso.objects.filter(vence_en=vence_en)
+        efectivos = PermisoEfectivo.objects.filter(usuario_id=self.empleado_id, empresa_id=self.empresa_id)
+        antes = set(efectivos.values_list('permiso', flat=True))
+
+        self.assertEqual(vencer_delegaciones(), 0)
+        self.assertEqual(temporales.count(), 3)
+
+        # Una hora después: se revocan en un lote y repetir no hace nada
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(vencer_delegaciones(ahora=vence_en), 3)
+        self.assertEqual(vencer_delegaciones(ahora=vence_en), 0)
+        self.assertFalse(temporales.exists())
+        self.assertLess(set(efectivos.values_list('permiso', flat=True)), antes)
+        # SELECT ... FOR UPDATE, DELETE, sincronización (3-4), auditoría,
+        # suscriptores de webhooks y SAVEPOINT/RELEASE
+        self.assertLessEqual(len(consultas), 11)
+
+    def test_vencimiento_imposible_es_400(self):
+        token = self._token()
+        imposible = '2027-02-30T10:00:00'  # Bien formado, pero febrero no tiene 30
+        response, _ = self._post('/api/delegar-permiso/', {
+            'usuario_destino_id': self.empleado_id, 'empresa_id': self.empresa_id,
+            'permiso_codename': self.permiso, 'accion': 'add', 'vence_en': imposible,
+        }, token)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('vence_en inválido', response.json()['error'])
+
+        response, _ = self._post('/api/delegar-permiso/lote/', {'empresa_id': self.empresa_id, 'operaciones': [
+            {'usuario_destino_id': self.empleado_id, 'permiso': self.permiso, 'accion': 'add', 'vence_en': imposible},
+        ]}, token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['rechazadas'], 1)
+        self.assertIn('vence_en inválido', response.json()['resultados'][0]['error'])
+
+    def test_delegar_con_datos_invalidos(self):
+        token = self._token()
+        datos = {
+            'usuario_destino_id': self.empleado_id, 'empresa_id': self.empresa_id,
+            'permiso_codename': self.permiso, 'accion': 'add',
+        }
+        response, _ = self._post('/api/delegar-permiso/', {**datos, 'empresa_id': 'abc'}, token)
+        self.assertEqual(response.status_code, 403)
+        response, _ = self._post('/api/delegar-permiso/', {**datos, 'usuario_destino_id': 'abc'}, token)
+        self.assertEqual(response.status_code, 404)
+
+        # Destino con un rol sin PerfilGrupo (sin Área): fuera del territorio del Jefe
+        sin_area = Pertenencia.objects.create(
+            usuario=User.objects.create_user('sin_area'), empresa_id=self.empresa_id,
+            grupo=Group.objects.create(name='Rol sin perfil'),
+        )
+        response, _ = self._post('/api/delegar-permiso/', {**datos, 'usuario_destino_id': sin_area.usuario_id}, token)
+        self.assertEqual(response.status_code, 403)
+        self.assertIn('Conflicto de Área', response.json()['error'])
+
+    def test_revocacion_de_tokens(self):
+        empleado = User.objects.get(pk=self.empleado_id)
+        login = self._token(empleado.username)
+        response, _ = self._post('/api/select-empresa/', {'empresa_id': self.empresa_id}, login)
+        pasaporte = response.json()['access_token']
+
+        # Quitarle un permiso corta el Pasaporte de esa empresa (no el token de login)
+        token_jefe = self._token()
+        with self.captureOnCommitCallbacks(execute=True):  # El caché se escribe al confirmar
+            for accion in ('add', 'remove'):
+                self._post('/api/delegar-permiso/', {
+                    'usuario_destino_id': self.empleado_id, 'empresa_id': self.empresa_id,
+                    'permiso_codename': self.permiso, 'accion': accion,
+                }, token_jefe)
+        response, _ = self._post('/api/select-empresa/', {'empresa_id': self.empresa_id}, pasaporte)
+        self.assertEqual(response.status_code, 401)
+
+        # Logout: el jti queda revocado
+        with self.captureOnCommitCallbacks(execute=True):
+            response, _ = self._post('/api/logout/', {}, login)
+        self.assertEqual(response.status_code, 200)
+        response, _ = self._post('/api/select-empresa/', {'empresa_id': self.empresa_id}, login)
+        self.assertEqual(response.status_code, 401)
+
+    def test_refresh_rota_y_detecta_reuso(self):
+        response, _ = self._post('/api/login/', {'username': self.jefe, 'password': 'clave-sintetica-123'})
+        refresh = response.json()['refresh']
+
+        # Renovar no verifica la clave: re-emite el Pasaporte desde el caché de permisos
+        with self.captureOnCommitCallbacks(execute=True):
+            response, consultas = self._post('/api/token/refresh/', {'refresh': refresh, 'empresa_id': self.empresa_id})
+        self.assertEqual(response.status_code, 200)
+        renovado = response.json()
+        self.assertEqual(set(renovado), {'refresh', 'access', 'access_token'})
+        # Pertenencia (con usuario, empresa y grupo) + INSERT del jti gastado (con SAVEPOINT/RELEASE)
+        self.assertLessEqual(consultas, 5)
+        response, _ = self._post('/api/select-empresa/', {'empresa_id': self.empresa_id}, renovado['access'])
+        self.assertEqual(response.status_code, 200)
+
+        # Reusar el Refresh gastado revoca la familia: también lo emitido después
+        with self.captureOnCommitCallbacks(execute=True):
+            response, _ = self._post('/api/token/refresh/', {'refresh': refresh})
+        self.assertEqual(response.status_code, 401)
+        response, _ = self._post('/api/token/refresh/', {'refresh': renovado['refresh']})
+        self.assertEqual(response.status_code, 401)
+        response, _ = self._post('/api/select-empresa/', {'empresa_id': self.empresa_id}, renovado['access_token'])
+        self.assertEqual(response.status_code, 401)
+
+    def test_webhooks_de_permisos(self):
+        token = self._token()
+        with ReceptorWebhooks(fallar=1) as receptor:
+            suscriptor = SuscriptorWebhook.objects.create(nombre='bodega', url=receptor.url, secreto='secreto-bodega')
+            for accion in ('add', 'remove'):
+                self._post('/api/delegar-permiso/', {
+                    'usuario_destino_id': self.empleado_id, 'empresa_id': self.empresa_id,
+                    'permiso_codename': self.permiso, 'accion': accion,
+                }, token)
+
+            # El primer POST falla: el suscriptor espera su backoff sin perder eventos
+            self.assertEqual(procesar_lote(), (0, 2))
+            self.assertEqual(procesar_lote(), (0, 0))
+            SuscriptorWebhook.objects.filter(pk=suscriptor.pk).update(proximo_intento=timezone.now())
+            self.assertEqual(procesar_lote(), (2, 0))
+
+        cabeceras, cuerpo = receptor.recibidos[-1]
+        verificar_firma('secreto-bodega', cabeceras[CABECERA], cuerpo)
+        eventos = json.loads(cuerpo)['eventos']
+        self.assertEqual([e['datos']['operacion'] for e in eventos], ['add', 'remove'])
+        self.assertLess(eventos[0]['secuencia'], eventos[1]['secuencia'])
+
+    def test_webhook_se_envia_fuera_de_la_transaccion(self):
+        suscriptor = SuscriptorWebhook.objects.create(nombre='bodega', url='http://127.0.0.1:9/', secreto='s')
+        self._post('/api/delegar-permiso/', {
+            'usuario_destino_id': self.empleado_id, 'empresa_id': self.empresa_id,
+            'permiso_codename': self.permiso, 'accion': 'add',
+        }, self._token())
+        bloques_de_la_prueba = len(connection.atomic_blocks)
+
+        def respuesta_cortada(_suscriptor, lote):
+            # Sin transacción propia abierta, y el suscriptor reservado para otros workers
+            self.assertEqual(len(connection.atomic_blocks), bloques_de_la_prueba)
+            self.assertEqual(procesar_lote(), (0, 0))
+            raise http.client.IncompleteRead(b'')
+
+        with mock.patch('core.webhooks._enviar', side_effect=respuesta_cortada) as enviar:
+            self.assertEqual(procesar_lote(), (0, 1))
+        self.assertEqual(enviar.call_count, 1)
+        suscriptor.refresh_from_db()
+        self.assertEqual(suscriptor.fallos_consecutivos, 1)
+        self.assertTrue(suscriptor.ultimo_error.startswith('IncompleteRead'))
+        self.assertEqual(suscriptor.entregas.get().intentos, 1)
+
+    def test_login_justo_despues_de_un_corte(self):
+        empleado = User.objects.get(pk=self.empleado_id)
+        viejo = self._token(empleado.username)
+        with self.captureOnCommitCallbacks(execute=True):
+            cortar_sesiones([(empleado.pk, None)])
+
+        # En el mismo segundo del corte: el token viejo cae y el nuevo funciona
+        nuevo = self._token(empleado.username)
+        response, _ = self._post('/api/select-empresa/', {'empresa_id': self.empresa_id}, viejo)
+        self.assertEqual(response.status_code, 401)
+        response, _ = self._post('/api/select-empresa/', {'empresa_id': self.empresa_id}, nuevo)
+        self.assertEqual(response.status_code, 200)
+
+    def test_recarga_de_revocaciones_sin_estampida(self):
+        token = AccessToken(self._token())
+        with self.captureOnCommitCallbacks(execute=True):
+            cortar_sesiones([(token['user_id'], None)])
+        cache = caches['compartido']
+
+        # Marca vencida y otro proceso recargando: se sigue sirviendo de la copia
+        cache.delete(CLAVE_CARGADA)
+        cache.add(CLAVE_CARGANDO, True)
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(motivo_revocacion(token), 'corte')
+        self.assertEqual(len(consultas), 0)
+
+        # Caché vacío y otro proceso recargando: solo este token, contra la BD
+        cache.clear()
+        cache.add(CLAVE_CARGANDO, True)
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(motivo_revocacion(token), 'corte')
+        self.assertEqual(len(consultas), 2)
+        self.assertNotIn(CLAVE_CARGADA, cache)
+
+    def test_password_reset(self):
+        email = User.objects.get(pk=self.empleado_id).email
+        response, consultas = self._post('/api/password-reset/', {'email': email})
+        self.assertEqual(response.status_code, 200)
+        # Buscar al usuario + encolar el correo (el envío SMTP lo hace run_mail_worker)
+        self.assertEqual(consultas, 2)
+
+
+class RutasAsincronas:
+    """ROOT_URLCONF de prueba: hub_core.urls como queda con API_ASYNC=True."""
+    urlpatterns = [
+        path('api/login/', CustomLoginAsyncView.as_view()),
+        path('api/select-empresa/', SelectEmpresaAsyncView.as_view()),
+        path('api/delegar-permiso/', DelegarPermisosAsyncView.as_view()),
+        *rutas_del_hub.urlpatterns,  # Las primeras en coincidir ganan
+    ]
+
+
+@override_settings(ROOT_URLCONF=RutasAsincronas)
+class FlujosAsincronosConsultasTests(FlujosIdentidadConsultasTests):
+    """
+    Los mismos flujos, cifras y revocaciones con las vistas ASGI de
+    core/views_async.py en lugar de las de DRF.
+    """
+
+
+@override_settings(CORREO_MAX_POR_SEGUNDO=0, CORREO_MAX_INTENTOS=2, CORREO_BACKOFF_BASE=10, CORREO_BACKOFF_MAXIMO=60)
+class BandejaCorreoTests(TestCase):
+    """Reintentos con backoff de la bandeja de salida (core/correo.py)."""
+
+    def _procesar(self):
+        def enviar(_conexion, mensajes):
+            if mensajes[0].to[0].startswith('rebota'):
+                raise smtplib.SMTPRecipientsRefused({mensajes[0].to[0]: (550, b'No existe')})
+            mail.outbox.extend(mensajes)
+            return len(mensajes)
+
+        with mock.patch.object(EmailBackend, 'send_messages', autospec=True, side_effect=enviar):
+            return procesar_correos()
+
+    def test_backoff_y_descarte(self):
+        encolar_correo('ok@provefrut.com', 'Asunto', 'Cuerpo')
+        rebota = encolar_correo('rebota@provefrut.com', 'Asunto', 'Cuerpo')
+
+        antes = timezone.now()
+        self.assertEqual(self._procesar(), (1, 1))
+        self.assertEqual([m.to for m in mail.outbox], [['ok@provefrut.com']])
+        rebota.refresh_from_db()
+        self.assertEqual((rebota.estado, rebota.intentos), (CorreoPendiente.Estado.PENDIENTE, 1))
+        self.assertTrue(rebota.ultimo_error.startswith('SMTPRecipientsRefused'))
+        self.assertGreaterEqual(rebota.proximo_intento, antes + timedelta(seconds=10))
+
+        # Mientras corre su espera no se reintenta
+        self.assertEqual(self._procesar(), (0, 0))
+
+        # Al llegar su turno falla de nuevo y agota CORREO_MAX_INTENTOS
+        CorreoPendiente.objects.filter(pk=rebota.pk).update(proximo_intento=timezone.now())
+        self.assertEqual(self._procesar(), (0, 1))
+        rebota.refresh_from_db()
+        self.assertEqual((rebota.estado, rebota.intentos), (CorreoPendiente.Estado.FALLIDO, 2))
+        self.assertEqual(self._procesar(), (0, 0))
+
+    def test_backoff_exponencial_con_tope(self):
+        self.assertEqual(
+            [calcular_backoff_correo(intentos).total_seconds() for intentos in (1, 2, 3, 4, 5)],
+            [10, 20, 40, 60, 60],
+        )
+
+
+@override_settings(JWT_FIRMA='EdDSA')
+class FirmaAsimetricaTests(TestCase):
+    """JWKS publicado y rotación de llaves del Pasaporte (core/firmas.py)."""
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.almacen = AlmacenClaves(directorio.name)
+        self.almacen.rotar('EdDSA', timedelta(hours=1))
+        backend = TokenBackendRotativo(self.almacen)
+        for objetivo, valor in (
+            ('core.views.obtener_almacen', lambda: self.almacen),
+            ('rest_framework_simplejwt.state.token_backend', backend),
+        ):
+            parche = mock.patch(objetivo, valor)
+            parche.start()
+            self.addCleanup(parche.stop)
+        self.user = User.objects.create_user('firmante')
+
+    def _jwks(self, if_none_match=None):
+        extra = {'HTTP_IF_NONE_MATCH': if_none_match} if if_none_match else {}
+        return self.client.get('/.well-known/jwks.json', **extra)
+
+    def _verificar_como_satelite(self, token):
+        """Lo que hace ClavesJWKS: la llave pública del 'kid' tomada del JWKS publicado."""
+        llaves = {jwk.key_id: jwk for jwk in jwt.PyJWKSet.from_dict(self._jwks().json()).keys}
+        llave = llaves[jwt.get_unverified_header(token)['kid']]
+        return jwt.decode(token, llave.key, algorithms=[llave.algorithm_name])
+
+    def test_jwks_responde_304_si_el_etag_coincide(self):
+        response = self._jwks()
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        for cabecera in (etag, f'W/{etag}', f'"otro", {etag}', '*'):
+            self.assertEqual(self._jwks(cabecera).status_code, 304, cabecera)
+        for cabecera in ('"otro"', etag[:-2] + '"', etag.strip('"')):
+            self.assertEqual(self._jwks(cabecera).status_code, 200, cabecera)
+
+        # Una rotación cambia el JWKS y por lo tanto su ETag
+        self.almacen.rotar('EdDSA', timedelta(hours=1))
+        self.assertEqual(self._jwks(etag).status_code, 200)
+
+    def test_token_sigue_valiendo_tras_rotar_la_llave(self):
+        viejo = str(AccessToken.for_user(self.user))
+        kid_viejo = jwt.get_unverified_header(viejo)['kid']
+
+        ahora = datetime.now(dt_timezone.utc)
+        self.almacen.rotar('EdDSA', timedelta(hours=1), ahora=ahora)
+        nuevo = str(AccessToken.for_user(self.user))
+        self.assertNotEqual(jwt.get_unverified_header(nuevo)['kid'], kid_viejo)
+
+        # Durante el solapamiento valen ambos, en el Hub y en las apps satélite
+        for token in (viejo, nuevo):
+            self.assertEqual(AccessToken(token)['user_id'], str(self.user.pk))
+            self.assertEqual(self._verificar_como_satelite(token)['user_id'], str(self.user.pk))
+
+        # Vencido el solapamiento, la llave retirada deja de publicarse y de aceptarse
+        self.almacen.rotar('EdDSA', timedelta(hours=1), ahora=ahora + timedelta(hours=2))
+        with self.assertRaises(TokenError):
+            AccessToken(viejo)
+        self.assertNotIn(kid_viejo, [jwk['kid'] for jwk in self._jwks().json()['keys']])
+
+
+class CacheDosNivelesTests(TestCase):
+    """Dos workers (dos capas locales) sobre el mismo caché compartido (core/cache.py)."""
+
+    def setUp(self):
+        caches['default'].clear()  # También vacía 'compartido'
+        opciones = {'OPTIONS': {'COMPARTIDO': 'compartido', 'MAX_ENTRADAS': 10, 'TTL_LOCAL': 60}}
+        self.a, self.b = CacheDosNiveles('', opciones), CacheDosNiveles('', opciones)
+
+    def test_la_capa_local_responde_sin_ir_al_compartido(self):
+        self.a.set('clave', 1)
+        self.assertEqual(self.b.get('clave'), 1)
+        caches['compartido'].set('clave', 2)  # Otro worker escribió
+        self.assertEqual(self.b.get('clave'), 1)  # Copia local hasta TTL_LOCAL
+        self.assertEqual(self.b.get_many(['clave']), {'clave': 1})
+
+    def test_incr_y_add_saltan_la_capa_local(self):
+        # incr: el contador de cada worker parte del valor compartido, no de su copia
+        self.a.set('contador', 1)
+        self.assertEqual(self.b.get('contador'), 1)
+        self.assertEqual(self.a.incr('contador'), 2)
+        self.assertEqual(self.b.incr('contador'), 3)
+        self.assertEqual(self.b.get('contador'), 3)
+
+        # add: es un candado entre workers aunque uno tenga la clave en su capa local
+        self.assertTrue(self.a.add('candado', 'a'))
+        self.assertFalse(self.b.add('candado', 'b'))
+        self.b.set('vencida', 1)
+        caches['compartido'].delete('vencida')  # Expiró en el compartido
+        self.assertTrue(self.b.add('vencida', 2))
+        self.assertEqual(self.b.get('vencida'), 2)
+
+
+class ImportacionPertenenciasTests(TestCase):
+    """export_pertenencias -> import_pertenencias deja la organización como estaba (core/importacion.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        sembrar_organizacion(usuarios=30, empresas=3, areas=2, roles_por_area=3, empresas_por_usuario=2, tasa_excepciones=0.5)
+
+    def _foto(self):
+        return (
+            set(Pertenencia.objects.values_list('usuario__username', 'empresa__codigo', 'grupo__name', 'area__codigo')),
+            set(ExcepcionPermiso.objects.values_list('pertenencia__usuario_id', 'pertenencia__empresa_id', 'permission_id')),
+            set(PermisoEfectivo.objects.values_list('usuario_id', 'empresa_id', 'permiso')),
+        )
+
+    def test_ida_y_vuelta(self):
+        foto = self._foto()
+        self.assertTrue(foto[1])  # La siembra trae excepciones: la columna se ejercita
+
+        for formato in ('csv', 'jsonl'):
+            with tempfile.TemporaryDirectory() as directorio:
+                ruta = f"{directorio}/pertenencias.{formato}"
+                call_command('export_pertenencias', ruta, stdout=io.StringIO())
+                Pertenencia.objects.all().delete()  # Arrastra excepciones y PermisoEfectivo
+                call_command('import_pertenencias', ruta, '--lote', '7', stdout=io.StringIO())
+            self.assertEqual(self._foto(), foto, formato)
+
+    def test_error_no_deja_cambios_a_medias(self):
+        foto = self._foto()
+        exportado = io.StringIO()
+        exportar_pertenencias(exportado, 'csv')
+        filas = list(csv.DictReader(io.StringIO(exportado.getvalue())))
+        for fila in filas:
+            fila['permisos_adicionales'] = ''  # Los primeros lotes sí borran excepciones...
+        filas[-1]['username'] = 'desconocido'  # ...pero el último falla
+
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', encoding='utf-8', newline='') as archivo:
+            escritor = csv.DictWriter(archivo, fieldnames=list(filas[0]))
+            escritor.writeheader()
+            escritor.writerows(filas)
+            archivo.flush()
+            with self.assertRaisesMessage(CommandError, 'desconocido'):
+                call_command('import_pertenencias', archivo.name, '--lote', '5', stdout=io.StringIO())
+        self.assertEqual(self._foto(), foto)
+
+
+class PerfilesUsuarioTests(TestCase):
+    """Alta masiva con perfil y reparación de usuarios sin él (core/aprovisionamiento.py)."""
+
+    def test_alta_en_bloque_crea_los_perfiles(self):
+        with self.assertNumQueries(4):  # SAVEPOINT + Users + Perfiles + RELEASE
+            usuarios = crear_usuarios_en_bloque([User(username=f'bloque{n}') for n in range(5)])
+        self.assertEqual(PerfilUsuario.objects.filter(usuario__in=usuarios, debe_cambiar_password=True).count(), 5)
+        self.assertFalse(usuarios[0].has_usable_password())
+
+    def test_reparar_perfiles_usuario(self):
+        User.objects.bulk_create([User(username=f'sin_perfil{n}') for n in range(3)])  # Sin señal: sin perfil
+        User.objects.create_user('con_perfil')
+
+        salida = io.StringIO()
+        call_command('reparar_perfiles_usuario', '--dry-run', stdout=salida)
+        self.assertIn('3 usuarios sin PerfilUsuario', salida.getvalue())
+        self.assertEqual(usuarios_sin_perfil().count(), 3)
+
+        call_command('reparar_perfiles_usuario', '--sin-forzar-cambio', stdout=io.StringIO())
+        self.assertFalse(usuarios_sin_perfil().exists())
+        self.assertEqual(
+            set(PerfilUsuario.objects.filter(usuario__username__startswith='sin_perfil').values_list(
+                'debe_cambiar_password', flat=True
+            )),
+            {False},
+        )
+        self.assertEqual(reparar_perfiles(), [])  # Idempotente
+
+
+class AuditoriaConsultaTests(TestCase):
+    """GET /api/auditoria/: paginación por cursor (fecha, id) y filtros (core/auditoria.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('auditor', is_staff=True)
+        cls.jefe, cls.empleado = User.objects.create_user('jefe_a'), User.objects.create_user('empleado_a')
+        base = timezone.now() - timedelta(days=1)
+        # Varios eventos por instante: el desempate por id no debe saltar ni repetir filas
+        HistorialCambiosRol.objects.bulk_create([
+            HistorialCambiosRol(
+                fecha=base + timedelta(minutes=n // 3), actor=cls.jefe,
+                usuario_afectado=cls.empleado if n % 2 else cls.staff,
+                accion='Delegación (add)', detalle=f"permiso core.permiso_{n}",
+            )
+            for n in range(8)
+        ])
+
+    def setUp(self):
+        caches['default'].clear()
+        cargar_revocaciones()  # Copia de la lista de revocación ya cargada: no suma consultas
+
+    def _get(self, url):
+        token = AccessToken.for_user(self.staff)
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {token}')
+        return response, len(consultas)
+
+    def test_cursor_recorre_todo_sin_repetir(self):
+        esperados = list(HistorialCambiosRol.objects.order_by('-fecha', '-id').values_list('id', flat=True))
+        vistos, url, costos = [], '/api/auditoria/?limite=3', set()
+        while url:
+            response, consultas = self._get(url)
+            self.assertEqual(response.status_code, 200)
+            vistos += [fila['id'] for fila in response.json()['resultados']]
+            url = response.json()['siguiente']
+            costos.add(consultas)
+        self.assertEqual(vistos, esperados)
+        self.assertEqual(costos, {2})  # Usuario + página: igual en la primera y en la última
+
+    def test_filtros_y_cursor_invalido(self):
+        response, _ = self._get(f'/api/auditoria/?usuario={self.empleado.username}&limite=2')
+        filas = response.json()['resultados']
+        self.assertEqual({fila['usuario_afectado']['id'] for fila in filas}, {self.empleado.pk})
+        # El enlace 'siguiente' conserva los filtros
+        self.assertIn(f'usuario={self.empleado.username}', response.json()['siguiente'])
+
+        response, _ = self._get('/api/auditoria/?usuario=no_existe')
+        self.assertEqual(response.json()['resultados'], [])
+        for parametro in ('cursor=basura', 'desde=ayer'):
+            response, _ = self._get(f'/api/auditoria/?{parametro}')
+            self.assertEqual(response.status_code, 400, parametro)
+
+    @skipUnless(connection.vendor == 'postgresql', "Búsqueda de texto de PostgreSQL")
+    def test_busqueda_de_texto(self):
+        response, _ = self._get('/api/auditoria/?q=core.permiso_5')
+        self.assertEqual([fila['detalle'] for fila in response.json()['resultados']], ['permiso core.permiso_5'])
+
+
+class SincronizacionPermisosTests(TestCase):
+    """'manage.py sync_permisos_full': diff del catálogo de permisos fantasma (core/sincronizacion.py)."""
+
+    def _compras(self):
+        return Permission.objects.filter(content_type__app_label='core', content_type__model='modulocompras')
+
+    def test_catalogo_al_dia_cuesta_dos_consultas(self):
+        with self.assertNumQueries(2):  # ContentTypes + permisos existentes
+            plan = planificar_sincronizacion()
+        self.assertTrue(plan_vacio(plan))
+
+        salida = io.StringIO()
+        with self.assertNumQueries(2):  # Sin cambios no escribe nada
+            call_command('sync_permisos_full', stdout=salida)
+        self.assertIn('Permisos al día', salida.getvalue())
+
+    def test_crea_renombra_y_borra_por_diferencia(self):
+        self._compras().filter(codename='compras_acceso').delete()
+        self._compras().filter(codename='compras_crear_orden').update(name='Nombre viejo')
+        sobrante = Permission.objects.create(
+            content_type=self._compras().first().content_type, codename='compras_obsoleto', name='Obsoleto'
+        )
+
+        salida = io.StringIO()
+        call_command('sync_permisos_full', '--dry-run', '--json', stdout=salida)
+        resultado = json.loads(salida.getvalue())
+        self.assertFalse(resultado['aplicado'])
+        self.assertEqual(resultado['conteos'], {'crear': 1, 'renombrar': 1, 'borrar': 1})
+        self.assertEqual([p['codename'] for p in resultado['plan']['crear']], ['compras_acceso'])
+        self.assertEqual(resultado['plan']['renombrar'][0]['nombre_anterior'], 'Nombre viejo')
+        self.assertEqual(resultado['plan']['borrar'][0]['id'], sobrante.pk)
+        self.assertFalse(self._compras().filter(codename='compras_acceso').exists())  # Dry-run: sin cambios
+
+        call_command('sync_permisos_full', stdout=io.StringIO())
+        self.assertEqual(
+            dict(self._compras().values_list('codename', 'name')),
+            dict(ModuloCompras._meta.permissions),
+        )
+        self.assertTrue(plan_vacio(planificar_sincronizacion()))
+
+
+@override_settings(JWT_FIRMA='HS256')
+class ArranqueTests(TestCase):
+    """/readyz ante migraciones pendientes y 'manage.py preparar_arranque' por huella (core/arranque.py)."""
+
+    def test_readyz_no_listo_con_migraciones_pendientes(self):
+        self.assertEqual(migraciones_pendientes(), [])
+        aplicada = MigrationRecorder.Migration.objects.get(app='core', name='0017_textos_de_ayuda')
+        aplicada.delete()  # Como si el código trajera una migración que la BD aún no tiene
+
+        response = self.client.get('/readyz')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['migraciones_pendientes'], ['core.0017_textos_de_ayuda'])
+        self.assertEqual(self.client.get('/healthz').status_code, 200)  # Liveness no mira el esquema
+
+        aplicada.save()
+        self.assertEqual(self.client.get('/readyz').status_code, 200)
+        with self.assertNumQueries(1):  # Esquema ya visto al día: solo el SELECT 1
+            self.assertEqual(self.client.get('/readyz').status_code, 200)
+
+    def test_huella_igual_omite_migrate(self):
+        guardar_huella(calcular_huella())
+        salida = io.StringIO()
+        with mock.patch('core.management.commands.preparar_arranque.call_command') as comando:
+            with self.assertNumQueries(1):  # Solo leer la huella guardada
+                call_command('preparar_arranque', stdout=salida)
+        comando.assert_not_called()
+        self.assertIn('se omite migrate', salida.getvalue())
+
+    @skipUnless(connection.vendor == 'postgresql', "Advisory lock de PostgreSQL")
+    def test_huella_distinta_migra_y_la_guarda(self):
+        guardar_huella('huella-de-otro-despliegue')
+        with mock.patch('core.management.commands.preparar_arranque.call_command') as comando:
+            call_command('preparar_arranque', stdout=io.StringIO())
+        self.assertEqual([llamada.args[0] for llamada in comando.call_args_list], ['migrate', 'sync_permisos_full'])
+        self.assertEqual(huella_guardada(), calcular_huella())
+
+
+class ConexionesBDTests(TestCase):
+    """Contador de conexiones nuevas y GET /api/bd/estadisticas/ (core/conexiones.py)."""
+
+    def test_cuenta_conexiones_nuevas_por_alias(self):
+        antes = estadisticas_de_conexiones()['alias']['default']['conexiones_creadas']
+        otra = connections.create_connection('default')  # Conexión propia: no toca la de la prueba
+        try:
+            otra.ensure_connection()
+            otra.ensure_connection()  # Reutilizada: no cuenta
+        finally:
+            otra.close()
+        self.assertEqual(estadisticas_de_conexiones()['alias']['default']['conexiones_creadas'], antes + 1)
+
+    def test_estadisticas_de_pool(self):
+        pool = mock.Mock(get_stats=mock.Mock(return_value={
+            'pool_min': 2, 'pool_max': 8, 'pool_size': 6, 'pool_available': 2,
+            'requests_waiting': 3, 'requests_wait_ms': 1500,
+        }))
+        stats = estadisticas_de_pool(pool)
+        self.assertEqual((stats['tamano'], stats['libres'], stats['en_uso']), (6, 2, 4))
+        self.assertEqual(stats['saturacion'], 0.5)
+        self.assertEqual((stats['en_espera'], stats['espera_total_ms'], stats['errores']), (3, 1500, 0))
+
+    def test_endpoint_solo_staff(self):
+        url = '/api/bd/estadisticas/'
+        empleado = AccessToken.for_user(User.objects.create_user('empleado_bd'))
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {empleado}').status_code, 403)
+
+        staff = AccessToken.for_user(User.objects.create_user('staff_bd', is_staff=True))
+        response = self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {staff}')
+        self.assertEqual(response.status_code, 200)
+        default = response.json()['alias']['default']
+        self.assertEqual(default['modo'], settings.DB_CONEXIONES)
+        self.assertEqual(default['conn_max_age'], connection.settings_dict['CONN_MAX_AGE'])
+
+
+@override_settings(METRICAS_SERVER_TIMING=True, METRICAS_PRESUPUESTO_CONSULTAS=10, METRICAS_TOKEN='')
+class InstrumentacionTests(TestCase):
+    """Server-Timing, presupuesto de consultas y /metrics (core/metricas.py, InstrumentacionMiddleware)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('staff_metricas', is_staff=True)
+
+    def setUp(self):
+        caches['default'].clear()
+        cargar_revocaciones()
+
+    def _get(self, url):
+        token = AccessToken.for_user(self.staff)
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url, HTTP_AUTHORIZATION=f'Bearer {token}')
+        return response, len(consultas)
+
+    def test_server_timing_cuenta_las_consultas(self):
+        response, consultas = self._get('/api/auditoria/')
+        self.assertEqual(response.status_code, 200)
+        cabecera = response['Server-Timing']
+        self.assertRegex(cabecera, r'^total;dur=[\d.]+, bd;dur=[\d.]+;desc="\d+ consultas"')
+        self.assertIn(f'desc="{consultas} consultas"', cabecera)
+
+        with override_settings(METRICAS_SERVER_TIMING=False):
+            response, _ = self._get('/api/auditoria/')
+        self.assertNotIn('Server-Timing', response)
+
+    def test_aviso_al_superar_el_presupuesto(self):
+        with self.assertNoLogs('core.metricas', 'WARNING'):
+            self._get('/api/auditoria/')
+
+        # El presupuesto de la vista manda sobre METRICAS_PRESUPUESTO_CONSULTAS
+        with mock.patch.object(AuditoriaView, 'presupuesto_consultas', 1, create=True):
+            with self.assertLogs('core.metricas', 'WARNING') as registros:
+                self._get('/api/auditoria/')
+        self.assertIn('Presupuesto de consultas superado en api/auditoria/', registros.output[0])
+        self.assertIn('(máx 1)', registros.output[0])
+
+    def test_aviso_senala_el_posible_n_mas_1(self):
+        medicion, token = iniciar_medicion()
+        try:
+            for empresa_id in range(3):
+                list(Pertenencia.objects.filter(empresa_id=empresa_id))
+            list(User.objects.all()[:1])
+        finally:
+            cerrar_medicion(token)
+        self.assertEqual(medicion.consultas, 4)
+
+        self.assertFalse(revisar_presupuesto(medicion, 'ruta/', 4))
+        with self.assertLogs('core.metricas', 'WARNING') as registros:
+            self.assertTrue(revisar_presupuesto(medicion, 'ruta/', 3))
+        self.assertIn('Posible N+1 (3x)', registros.output[0])
+        self.assertIn('core_pertenencia', registros.output[0])
+
+    def test_metrics_con_token(self):
+        self._get('/api/auditoria/')
+        with override_settings(METRICAS_TOKEN='secreto'):
+            self.assertEqual(self.client.get('/metrics').status_code, 401)
+            response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secreto')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('hub_peticion_consultas_bd_count{ruta="api/auditoria/"}', response.content.decode())
+
+    def test_metrics_sin_token_falla_cerrado(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+        with override_settings(DEBUG=True):  # Desarrollo local: abierto
+            self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+
+class AdminExcepcionesTests(TestCase):
+    """El inline de excepciones del Admin tiene las consecuencias de una delegación (core/delegacion.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin_hub', password='x')
+        cls.empleado = User.objects.create_user('empleado_admin')
+        cls.empresa = Empresa.objects.create(nombre='Empresa Admin', codigo='ADM')
+        cls.pertenencia = Pertenencia.objects.create(
+            usuario=cls.empleado, empresa=cls.empresa, grupo=Group.objects.create(name='Rol Admin')
+        )
+        cls.permiso = Permission.objects.get(codename='compras_aprobar_orden')
+        SuscriptorWebhook.objects.create(nombre='satelite', url='http://127.0.0.1:9/', secreto='s')
+
+    def setUp(self):
+        caches['default'].clear()
+        cargar_revocaciones()
+        self.client.force_login(self.admin)
+
+    def _guardar(self, excepciones):
+        """POST del formulario de cambio con las excepciones dadas: [(excepcion o None, vence_en, borrar)]."""
+        datos = {
+            'usuario': self.empleado.pk, 'empresa': self.empresa.pk, 'grupo': self.pertenencia.grupo_id, 'area': '',
+            'excepciones-TOTAL_FORMS': len(excepciones),
+            'excepciones-INITIAL_FORMS': sum(1 for excepcion, _, _ in excepciones if excepcion),
+            'excepciones-MIN_NUM_FORMS': 0, 'excepciones-MAX_NUM_FORMS': 1000,
+        }
+        for i, (excepcion, vence_en, borrar) in enumerate(excepciones):
+            local = timezone.localtime(vence_en) if vence_en else None
+            datos.update({
+                f'excepciones-{i}-id': excepcion.pk if excepcion else '',
+                f'excepciones-{i}-pertenencia': self.pertenencia.pk,
+                f'excepciones-{i}-permission': self.permiso.pk,
+                f'excepciones-{i}-vence_en_0': local.strftime('%Y-%m-%d') if local else '',
+                f'excepciones-{i}-vence_en_1': local.strftime('%H:%M:%S') if local else '',
+            })
+            if borrar:
+                datos[f'excepciones-{i}-DELETE'] = 'on'
+        url = f'/admin/core/pertenencia/{self.pertenencia.pk}/change/'
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, datos)
+        self.assertEqual(response.status_code, 302)  # Guardado sin errores de formulario
+
+    def test_otorgar_renovar_y_quitar(self):
+        eventos = HistorialCambiosRol.objects.filter(usuario_afectado=self.empleado).order_by('id')
+        entregas = EntregaWebhook.objects.order_by('id')
+        efectivos = PermisoEfectivo.objects.filter(usuario=self.empleado, empresa=self.empresa)
+        permiso = 'core.compras_aprobar_orden'
+
+        self._guardar([(None, None, False)])
+        excepcion = ExcepcionPermiso.objects.get(pertenencia=self.pertenencia)
+        self.assertEqual(excepcion.otorgada_por, self.admin)
+        self.assertEqual(list(efectivos.values_list('permiso', flat=True)), [permiso])
+        self.assertEqual(obtener_permisos_efectivos(self.pertenencia), [permiso])
+        self.assertEqual(eventos.last().accion, 'Delegación (add)')
+        self.assertEqual(entregas.last().datos['operacion'], 'add')
+
+        # Solo el vencimiento: auditado y avisado, sin cortar sesiones
+        vence_en = (timezone.now() + timedelta(days=1)).replace(microsecond=0)
+        self._guardar([(excepcion, vence_en, False)])
+        self.assertIn('ACTUALIZADO', eventos.last().detalle)
+        self.assertEqual(entregas.last().datos['vence_en'], vence_en.isoformat())
+        self.assertFalse(CorteSesion.objects.filter(usuario=self.empleado).exists())
+
+        # Quitarla corta los Pasaportes de esa empresa, igual que /api/delegar-permiso/
+        pasaporte = AccessToken.for_user(self.empleado)
+        pasaporte['empresa_id'] = self.empresa.pk
+        self._guardar([(excepcion, vence_en, True)])
+        self.assertFalse(efectivos.exists())
+        self.assertEqual(obtener_permisos_efectivos(self.pertenencia), [])
+        self.assertEqual(eventos.last().accion, 'Delegación (remove)')
+        self.assertEqual(eventos.last().datos['permiso'], permiso)
+        self.assertEqual((entregas.last().datos['operacion'], entregas.last().datos['permiso']), ('remove', permiso))
+        self.assertTrue(CorteSesion.objects.filter(usuario=self.empleado, empresa=self.empresa).exists())
+        self.assertEqual(motivo_revocacion(pasaporte), 'corte')
+
+    def test_guardar_sin_cambios_no_audita(self):
+        self._guardar([])
+        self.assertFalse(HistorialCambiosRol.objects.filter(usuario_afectado=self.empleado).exists())
+        self.assertFalse(EntregaWebhook.objects.exists())
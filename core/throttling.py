@@ -0,0 +1,21 @@
+"""
+CORE THROTTLING - LÍMITES DE TASA CON CONTADORES COMPARTIDOS
+------------------------------------------------------------
+Las clases de DRF guardan el historial de peticiones en el caché 'default'.
+Con un caché por proceso cada worker de Gunicorn lleva su propia cuenta (el
+límite real queda multiplicado por la cantidad de workers) y todo se reinicia
+en cada deploy. Estas variantes usan el alias compartido (Redis) de
+settings.THROTTLE_CACHE_ALIAS, sin la capa local.
+"""
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
+
+
+class AnonRateThrottleCompartido(AnonRateThrottle):
+    cache = caches[settings.THROTTLE_CACHE_ALIAS]
+
+
+class UserRateThrottleCompartido(UserRateThrottle):
+    cache = caches[settings.THROTTLE_CACHE_ALIAS]
@@ -4,29 +4,54 @@ CORE VIEWS - CONTROLADORES DE LA API
 Este módulo contiene la lógica de negocio expuesta a través de endpoints REST.
 
 ESTRUCTURA:
-1. Autenticación Inicial (Login extendido).
+1. Autenticación Inicial (Login extendido, renovación y cierre de sesión).
 2. Gestión de Identidad (Selección de Empresa / Contexto).
 3. Administración Delegada (Gerentes asignando permisos).
 4. Seguridad y Recuperación (Reset Password / Cambio Obligatorio).
+5. Operación (Diagnóstico de caché y conexiones a la BD).
+6. Auditoría (Consulta paginada del historial).
 """
 
-from django.shortcuts import get_object_or_404
+import hashlib
+import json
+import os
+from collections import Counter
+from datetime import datetime, time
+
+from django.db import transaction
+from django.db.models import F
 from django.contrib.auth.models import Permission, User
 from django.contrib.auth.tokens import default_token_generator
-from django.utils.http import urlsafe_base64_encode
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import parse_etags, urlsafe_base64_encode
 from django.utils.encoding import force_bytes
-from django.core.mail import send_mail
 from django.conf import settings
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
-from .models import Pertenencia, Empresa, HistorialCambiosRol
+from .auditoria import CursorInvalido, consultar_eventos, registrar_evento
+from .autenticacion import LoginSaturadoError
+from .cache import estadisticas_de_cache
+from .conexiones import estadisticas_de_conexiones
+from .correo import encolar_correo
+from .delegacion import aplicar_delegaciones, filtro_permiso, interpretar_vencimiento
+from .firmas import obtener_almacen
+from .models import Pertenencia, Empresa, ExcepcionPermiso, IndicePermiso
+from .permisos import codificar_permisos, obtener_permisos_efectivos
+from .revocacion import (
+    CLAIM_FAMILIA, consumir_refresh, cortar_sesiones, marcar_emision, nuevo_refresh, revocar_token,
+)
+from .webhooks import encolar_eventos, evento_delegacion
 from .serializers import (
     EmpresaSerializer, 
     PasswordResetRequestSerializer, 
@@ -43,36 +68,200 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     Extiende el Login estándar de JWT para devolver información de contexto
     adicional (Empresas disponibles, alertas de seguridad) junto con el token.
     """
+    @classmethod
+    def get_token(cls, user):
+        # El Refresh del login abre una familia nueva (rotación, ver core/revocacion.py)
+        return nuevo_refresh(user)
+
     def validate(self, attrs):
         # Validación estándar (Usuario/Password)
         data = super().validate(attrs)
-        
+
+        debe_cambiar, empresas = self.armar_contexto_login(self.consulta_contexto_login(self.user))
+
         # --- SEGURIDAD: CHECK DE CAMBIO OBLIGATORIO ---
-        debe_cambiar = False
-        if hasattr(self.user, 'perfil_usuario'):
-            debe_cambiar = self.user.perfil_usuario.debe_cambiar_password
-        
         data['debe_cambiar_password'] = debe_cambiar
 
         # --- CONTEXTO: EMPRESAS DISPONIBLES ---
-        pertenencias = Pertenencia.objects.filter(usuario=self.user)
-        empresas = [p.empresa for p in pertenencias]
         data['empresas_disponibles'] = EmpresaSerializer(empresas, many=True).data
         
         return data
 
+    @staticmethod
+    def consulta_contexto_login(user):
+        """
+        Construye el contexto del Login en UNA sola consulta, sin importar a
+        cuántas empresas pertenezca el usuario.
+
+        Partimos del User y hacemos LEFT JOIN a su Perfil y a sus Pertenencias
+        (-> Empresa): sale una fila por Pertenencia, o una sola fila con NULLs
+        si no tiene ninguna (así nunca perdemos la bandera de seguridad).
+        Se devuelve el QuerySet sin evaluar para poder iterarlo sync o async.
+        """
+        return User.objects.filter(pk=user.pk).annotate(
+            debe_cambiar=F('perfil_usuario__debe_cambiar_password'),
+            empresa_pk=F('pertenencias__empresa__id'),
+            empresa_nombre=F('pertenencias__empresa__nombre'),
+            empresa_codigo=F('pertenencias__empresa__codigo'),
+            empresa_activa=F('pertenencias__empresa__activo'),
+        ).order_by('pertenencias__id').values_list(
+            'debe_cambiar', 'empresa_pk', 'empresa_nombre', 'empresa_codigo', 'empresa_activa'
+        )
+
+    @staticmethod
+    def armar_contexto_login(filas):
+        """Convierte las filas de consulta_contexto_login() en (debe_cambiar, empresas)."""
+        debe_cambiar = False
+        empresas = []
+        for debe_cambiar_fila, pk, nombre, codigo, activa in filas:
+            debe_cambiar = bool(debe_cambiar_fila)  # Sin perfil (NULL) -> False
+            if pk is None:
+                continue
+            if settings.LOGIN_SOLO_EMPRESAS_ACTIVAS and not activa:
+                continue
+            empresas.append(Empresa(id=pk, nombre=nombre, codigo=codigo, activo=activa))
+
+        return debe_cambiar, empresas
+
 class CustomLoginView(TokenObtainPairView):
     """
     Endpoint: POST /api/login/
     Punto de entrada principal. Devuelve credenciales temporales y contexto.
+
+    Si el pool de verificación de claves está saturado (ver core/autenticacion.py)
+    responde 503 + Retry-After de inmediato para que el cliente reintente.
     """
     serializer_class = CustomTokenObtainPairSerializer
 
+    def post(self, request, *args, **kwargs):
+        try:
+            return super().post(request, *args, **kwargs)
+        except LoginSaturadoError:
+            return Response(
+                {"error": "Servicio de login saturado. Intenta nuevamente en unos segundos."},
+                status=503,
+                headers={'Retry-After': str(settings.LOGIN_RETRY_AFTER)}
+            )
+
+
+class LogoutView(APIView):
+    """
+    Endpoint: POST /api/logout/
+    Revoca el token con el que se llama (por su 'jti', ver core/revocacion.py)
+    y, si viene {"refresh": "..."}, también ese Refresh del mismo usuario.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @transaction.atomic
+    def post(self, request):
+        revocar_token(request.auth)
+
+        crudo = request.data.get('refresh')
+        if crudo:
+            try:
+                refresh = RefreshToken(crudo)
+            except TokenError:
+                pass  # Inválido o vencido: ya no sirve para nada
+            else:
+                if str(refresh.get(jwt_settings.USER_ID_CLAIM)) != str(request.user.pk):
+                    return Response({"error": "El Refresh no pertenece a esta sesión."}, status=400)
+                revocar_token(refresh)
+
+        return Response({"mensaje": "Sesión cerrada."})
+
+
+class RefrescarSesionView(APIView):
+    """
+    Endpoint: POST /api/token/refresh/
+    Renueva la sesión SIN volver a pedir la clave (ni PBKDF2, ni select-empresa).
+
+    Recibe: {"refresh": "...", "empresa_id": 3 (opcional)}.
+    Devuelve: un Refresh NUEVO (el recibido queda gastado), el token de login
+    ('access') y, si viene empresa_id, el Pasaporte de esa empresa
+    ('access_token') armado desde el caché de permisos.
+
+    Reusar un Refresh ya gastado revoca toda la familia (core/revocacion.py).
+    Sin transacción a propósito: esa revocación debe quedar aunque se responda 401.
+    """
+    permission_classes = []
+    authentication_classes = []  # El Access vencido que manda el cliente no debe bloquear la renovación
+
+    def post(self, request):
+        crudo = request.data.get('refresh')
+        if not crudo:
+            return Response({"error": "Falta el campo 'refresh'"}, status=400)
+        try:
+            refresh = RefreshToken(crudo)
+        except TokenError as exc:
+            return Response({"detail": str(exc)}, status=401)
+
+        # Primero lo que puede fallar sin gastar el Refresh (el cliente puede reintentar sin empresa)
+        usuario_id = refresh.get(jwt_settings.USER_ID_CLAIM)
+        empresa_id = request.data.get('empresa_id')
+        pertenencia = None
+        if empresa_id:
+            try:
+                pertenencia = Pertenencia.objects.select_related('usuario', 'empresa', 'grupo').get(
+                    usuario_id=usuario_id, empresa_id=empresa_id
+                )
+            except (Pertenencia.DoesNotExist, ValueError):
+                return Response({"error": "No tienes acceso a esta empresa"}, status=403)
+            user = pertenencia.usuario
+        else:
+            user = User.objects.filter(pk=usuario_id).first()
+        if user is None or not jwt_settings.USER_AUTHENTICATION_RULE(user):
+            return Response({"detail": "El usuario no existe o está inactivo."}, status=401)
+
+        try:
+            familia = consumir_refresh(refresh)
+        except InvalidToken as exc:
+            return Response({"detail": str(exc.detail)}, status=401)
+
+        nuevo = nuevo_refresh(user, familia)
+        datos = {'refresh': str(nuevo), 'access': str(nuevo.access_token)}
+        if pertenencia is not None:
+            permisos = obtener_permisos_efectivos(pertenencia)
+            datos['access_token'] = str(emitir_pasaporte(user, pertenencia, permisos, familia))
+        return Response(datos)
+
 
 # ==============================================================================
 # 2. GESTIÓN DE IDENTIDAD (EL PASAPORTE)
 # ==============================================================================
 
+def emitir_pasaporte(user, pertenencia, permisos, familia=None):
+    """
+    Construye el 'Pasaporte Universal' (AccessToken) de un usuario en una empresa.
+    'pertenencia' debe venir con empresa y grupo cargados (select_related).
+    'familia' es la del login que lo origina (revocarla también lo invalida).
+    """
+    token = marcar_emision(AccessToken.for_user(user))
+    if familia:
+        token[CLAIM_FAMILIA] = familia
+
+    # Inyectar Contexto (Dónde estoy)
+    token['empresa_id'] = pertenencia.empresa.id
+    token['empresa_codigo'] = pertenencia.empresa.codigo
+    token['empresa_nombre'] = pertenencia.empresa.nombre
+    token['rol_nombre'] = pertenencia.grupo.name
+
+    # Inyectar Identidad (Quién soy)
+    token['username'] = user.username
+    token['email'] = user.email
+    full_name = f"{user.first_name} {user.last_name}".strip()
+    token['nombre_completo'] = full_name.title() if full_name else user.username
+    
+    # Inyectar Autoridad (Qué puedo hacer)
+    # Permisos del Grupo + Excepciones, ya aplanados a "app.codename".
+    # Se leen del caché versionado (ver core/permisos.py).
+    if settings.PASAPORTE_PERMISOS_COMPACTOS:
+        # Mapa de bits + versión del registro (ver hub_pasaporte/compacto.py)
+        token['permisos_bits'], token['permisos_reg'] = codificar_permisos(permisos)
+    else:
+        token['permisos'] = permisos
+    return token
+
+
 class SelectEmpresaView(APIView):
     """
     Endpoint: POST /api/select-empresa/
@@ -91,7 +280,7 @@ class SelectEmpresaView(APIView):
 
         # Validación de Seguridad: ¿El usuario realmente pertenece a esa empresa?
         try:
-            pertenencia = Pertenencia.objects.get(
+            pertenencia = Pertenencia.objects.select_related('empresa', 'grupo').get(
                 usuario=request.user, 
                 empresa_id=empresa_id
             )
@@ -99,32 +288,9 @@ class SelectEmpresaView(APIView):
             return Response({"error": "No tienes acceso a esta empresa"}, status=403)
 
         # Construcción del Token Enriquecido
-        token = AccessToken.for_user(request.user)
-
-        # Inyectar Contexto (Dónde estoy)
-        token['empresa_id'] = pertenencia.empresa.id
-        token['empresa_codigo'] = pertenencia.empresa.codigo
-        token['empresa_nombre'] = pertenencia.empresa.nombre
-        token['rol_nombre'] = pertenencia.grupo.name
-
-        # Inyectar Identidad (Quién soy)
-        token['username'] = request.user.username
-        token['email'] = request.user.email
-        full_name = f"{request.user.first_name} {request.user.last_name}".strip()
-        token['nombre_completo'] = full_name.title() if full_name else request.user.username
-        
-        # Inyectar Autoridad (Qué puedo hacer)
-        # Sumamos permisos del Grupo + Permisos Individuales (Excepciones)
-        permisos_grupo = pertenencia.grupo.permissions.all()
-        permisos_extra = pertenencia.permisos_adicionales.all()
-        todos_los_permisos = permisos_grupo | permisos_extra
-        
-        # Aplanar permisos a lista de strings "app.codename"
-        lista_permisos = [
-            f"{p.content_type.app_label}.{p.codename}" 
-            for p in todos_los_permisos.distinct()
-        ]
-        token['permisos'] = lista_permisos
+        token = emitir_pasaporte(
+            request.user, pertenencia, obtener_permisos_efectivos(pertenencia), request.auth.get(CLAIM_FAMILIA)
+        )
 
         return Response({
             'access_token': str(token),
@@ -132,6 +298,63 @@ class SelectEmpresaView(APIView):
         })
 
 
+class RegistroPermisosView(APIView):
+    """
+    Endpoint: GET /api/permisos/registro/?desde=N
+    Registro de índices de bit para expandir Pasaportes compactos.
+
+    Devuelve los permisos a partir del bit N (el registro es de solo agregado,
+    así que un consumidor solo pide lo que le falta).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            desde = max(int(request.query_params.get('desde', 0)), 0)
+        except ValueError:
+            return Response({"error": "'desde' debe ser un entero"}, status=400)
+
+        permisos = list(
+            IndicePermiso.objects.filter(bit__gte=desde).order_by('bit').values_list('permiso', flat=True)
+        )
+        return Response({
+            'version': desde + len(permisos),
+            'desde': desde,
+            'permisos': permisos,
+        })
+
+
+class JWKSView(APIView):
+    """
+    Endpoint: GET /.well-known/jwks.json
+    Llaves PÚBLICAS para verificar Pasaportes firmados con RS256/EdDSA.
+
+    Público y cacheable: las apps satélite lo descargan una vez y verifican
+    sin conexión. Tras una rotación, un 'kid' desconocido las hace volver a
+    descargarlo; la llave anterior sigue publicada durante el solapamiento.
+    """
+    permission_classes = []
+    authentication_classes = []
+    throttle_classes = []
+    renderer_classes = [JSONRenderer]
+
+    def get(self, request):
+        if settings.JWT_FIRMA == 'HS256':
+            return Response({"error": "El Hub firma con HS256: no hay llaves públicas."}, status=404)
+
+        jwks = obtener_almacen().jwks()
+        etag = '"%s"' % hashlib.sha256(json.dumps(jwks, sort_keys=True).encode()).hexdigest()[:32]
+        cabeceras = {
+            'Cache-Control': f"public, max-age={settings.JWT_JWKS_MAX_AGE}, stale-while-revalidate=86400",
+            'ETag': etag,
+        }
+        # Comparación débil sobre la lista de entity-tags (RFC 9110 §13.1.2)
+        etiquetas = parse_etags(request.headers.get('If-None-Match', ''))
+        if '*' in etiquetas or etag in (etiqueta.removeprefix('W/') for etiqueta in etiquetas):
+            return Response(status=304, headers=cabeceras)
+        return Response(jwks, headers=cabeceras)
+
+
 # ==============================================================================
 # 3. ADMINISTRACIÓN DELEGADA
 # ==============================================================================
@@ -143,6 +366,8 @@ class DelegarPermisosView(APIView):
     Reglas:
     1. El actor debe ser Gerente.
     2. El objetivo debe estar en la misma Área.
+    3. Con 'vence_en' (ISO 8601) el permiso se revoca solo al vencer
+       ('manage.py expire_delegations'); sin él queda hasta que se quite.
     """
     permission_classes = [IsAuthenticated]
 
@@ -156,47 +381,138 @@ class DelegarPermisosView(APIView):
              return Response({"error": "Faltan datos obligatorios"}, status=400)
 
         # 1. Validar al Jefe
-        try:
-            pertenencia_jefe = Pertenencia.objects.get(usuario=request.user, empresa_id=empresa_id)
-        except Pertenencia.DoesNotExist:
-            return Response({"error": "No tienes acceso a esta empresa"}, status=403)
-
-        if not hasattr(pertenencia_jefe.grupo, 'perfil') or not pertenencia_jefe.grupo.perfil.es_gerencial:
-            return Response({"error": "No tienes permisos gerenciales para delegar."}, status=403)
+        pertenencia_jefe, error = validar_jefe(request.user, empresa_id)
+        if error:
+            return Response({"error": error}, status=403)
 
         # 2. Validar al Empleado y Territorio
-        pertenencia_empleado = get_object_or_404(Pertenencia, usuario_id=target_user_id, empresa_id=empresa_id)
-        
-        if pertenencia_jefe.grupo.perfil.area != pertenencia_empleado.grupo.perfil.area:
+        try:
+            pertenencia_empleado = Pertenencia.objects.select_related('grupo__perfil').get(
+                usuario_id=target_user_id, empresa_id=empresa_id
+            )
+        except (Pertenencia.DoesNotExist, ValueError):
+            return Response({"detail": "No encontrado."}, status=404)
+
+        # Rol sin PerfilGrupo: sin Área, fuera del territorio de cualquier Jefe
+        perfil_empleado = getattr(pertenencia_empleado.grupo, 'perfil', None)
+        if perfil_empleado is None or pertenencia_jefe.grupo.perfil.area_id != perfil_empleado.area_id:
             return Response({
                 "error": "Conflicto de Área: Solo puedes gestionar personal de tu departamento."
             }, status=403)
 
-        # 3. Ejecutar Acción
+        # 3. Ejecutar Acción ("app.codename" o un codename que sea único)
         try:
-            permiso = Permission.objects.get(codename=permiso_codename)
-            
-            if accion == 'add':
-                pertenencia_empleado.permisos_adicionales.add(permiso)
-                log_msg = f"Permiso '{permiso_codename}' OTORGADO por {request.user.username}"
-            elif accion == 'remove':
-                pertenencia_empleado.permisos_adicionales.remove(permiso)
-                log_msg = f"Permiso '{permiso_codename}' REVOCADO por {request.user.username}"
-            else:
-                return Response({"error": "Acción inválida"}, status=400)
-
-            # 4. Auditoría Obligatoria
-            HistorialCambiosRol.objects.create(
-                actor=request.user,
-                usuario_afectado=pertenencia_empleado.usuario,
-                accion=f"Delegación ({accion})",
-                detalle=f"{log_msg} en empresa {pertenencia_jefe.empresa.codigo}"
-            )
-
-            return Response({"mensaje": "Operación exitosa", "detalle": log_msg})
-
+            permiso = Permission.objects.select_related('content_type').get(**filtro_permiso(permiso_codename))
         except Permission.DoesNotExist:
             return Response({"error": f"El permiso '{permiso_codename}' no existe"}, status=404)
+        except Permission.MultipleObjectsReturned:
+            return Response({"error": f"El permiso '{permiso_codename}' es ambiguo: usar 'app.codename'"}, status=400)
+
+        if accion not in ('add', 'remove'):
+            return Response({"error": "Acción inválida"}, status=400)
+
+        # Opcional: delegación temporal (la revoca 'manage.py expire_delegations')
+        vence_en, error = interpretar_vencimiento(request.data.get('vence_en'))
+        if error:
+            return Response({"error": error}, status=400)
+
+        log_msg = aplicar_delegacion(request.user, pertenencia_jefe, pertenencia_empleado, permiso, accion, vence_en)
+        return Response({"mensaje": "Operación exitosa", "detalle": log_msg})
+
+
+class DelegarPermisosLoteView(APIView):
+    """
+    Endpoint: POST /api/delegar-permiso/lote/
+    Varias delegaciones de un Gerente en una sola llamada y una sola transacción.
+
+    Recibe: {"empresa_id": 1, "operaciones": [
+        {"usuario_destino_id": 5, "permiso": "core.compras_aprobar_orden", "accion": "add"}, ...]}
+    Devuelve: un resultado por operación ('aplicada', 'sin_cambios' o 'rechazada'
+    con el motivo). Las mismas reglas que /api/delegar-permiso/ (ver core/delegacion.py).
+    """
+    permission_classes = [IsAuthenticated]
+    MAX_OPERACIONES = 500
+    # Fijo para cualquier tamaño de lote (incluye SAVEPOINT/RELEASE y el caché de sesión)
+    presupuesto_consultas = 15
+
+    def post(self, request):
+        empresa_id = request.data.get('empresa_id')
+        operaciones = request.data.get('operaciones')
+
+        if not empresa_id or not isinstance(operaciones, list) or not operaciones:
+            return Response({"error": "Faltan 'empresa_id' u 'operaciones' (lista no vacía)"}, status=400)
+        if len(operaciones) > self.MAX_OPERACIONES:
+            return Response({"error": f"Máximo {self.MAX_OPERACIONES} operaciones por lote"}, status=400)
+
+        # El Jefe se valida UNA vez para todo el lote
+        pertenencia_jefe, error = validar_jefe(request.user, empresa_id)
+        if error:
+            return Response({"error": error}, status=403)
+
+        resultados = aplicar_delegaciones(request.user, pertenencia_jefe, operaciones)
+        conteo = Counter(r['estado'] for r in resultados)
+        return Response({
+            "aplicadas": conteo['aplicada'],
+            "sin_cambios": conteo['sin_cambios'],
+            "rechazadas": conteo['rechazada'],
+            "resultados": resultados,
+        })
+
+
+def validar_jefe(usuario, empresa_id):
+    """(Pertenencia gerencial con empresa y perfil cargados, None) o (None, mensaje para el 403)."""
+    try:
+        pertenencia = Pertenencia.objects.select_related('empresa', 'grupo__perfil').get(
+            usuario=usuario, empresa_id=empresa_id
+        )
+    except (Pertenencia.DoesNotExist, ValueError):
+        return None, "No tienes acceso a esta empresa"
+
+    perfil = getattr(pertenencia.grupo, 'perfil', None)
+    if perfil is None or not perfil.es_gerencial:
+        return None, "No tienes permisos gerenciales para delegar."
+    return pertenencia, None
+
+
+@transaction.atomic
+def aplicar_delegacion(actor, pertenencia_jefe, pertenencia_empleado, permiso, accion, vence_en=None):
+    """
+    Aplica una delegación YA VALIDADA ('add' o 'remove') y deja la auditoría.
+    Compartida por la vista síncrona y la asíncrona (core/views_async.py).
+    Un 'add' sobre una excepción existente solo reemplaza su vencimiento.
+    """
+    if accion == 'add':
+        renovada = ExcepcionPermiso.objects.filter(pertenencia=pertenencia_empleado, permission=permiso).update(
+            vence_en=vence_en
+        )
+        if not renovada:
+            pertenencia_empleado.permisos_adicionales.add(
+                permiso, through_defaults={'vence_en': vence_en, 'otorgada_por': actor}
+            )
+        log_msg = f"Permiso '{permiso.codename}' OTORGADO por {actor.username}"
+        if vence_en:
+            log_msg += f" hasta {vence_en.isoformat()}"
+    else:
+        pertenencia_empleado.permisos_adicionales.remove(permiso)
+        # El Pasaporte que ya tiene en esta empresa todavía lista el permiso
+        cortar_sesiones([(pertenencia_empleado.usuario_id, pertenencia_empleado.empresa_id)])
+        log_msg = f"Permiso '{permiso.codename}' REVOCADO por {actor.username}"
+
+    # 4. Auditoría Obligatoria (en la misma transacción: si se revierte, no queda evento)
+    empresa = pertenencia_jefe.empresa
+    registrar_evento(
+        actor,
+        pertenencia_empleado.usuario_id,
+        f"Delegación ({accion})",
+        detalle=f"{log_msg} en empresa {empresa.codigo}",
+        empresa=empresa,
+        permiso=permiso,
+        operacion=accion,
+        pertenencia_id=pertenencia_empleado.pk,
+        vence_en=vence_en.isoformat() if vence_en else None,
+    )
+    encolar_eventos([evento_delegacion(pertenencia_empleado.usuario_id, empresa, permiso, accion, vence_en)])
+    return log_msg
 
 
 # ==============================================================================
@@ -224,12 +540,12 @@ class PasswordResetRequestView(APIView):
                 # Link apunta al Frontend (React)
                 link = f"{settings.FRONTEND_URL}/reset-password/{uid}/{token}"
                 
-                send_mail(
-                    subject='Restablecer Contraseña - Hub Provefrut',
-                    message=f'Hola {user.username}.\n\nUsa este enlace para cambiar tu clave:\n{link}\n\nSi no fuiste tú, ignora este mensaje.',
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[email],
-                    fail_silently=False,
+                # Solo se encola (un INSERT): el worker 'run_mail_worker' hace el envío SMTP.
+                # Así la respuesta no espera al servidor de correo ni revela si el email existe.
+                encolar_correo(
+                    destinatario=email,
+                    asunto='Restablecer Contraseña - Hub Provefrut',
+                    cuerpo=f'Hola {user.username}.\n\nUsa este enlace para cambiar tu clave:\n{link}\n\nSi no fuiste tú, ignora este mensaje.',
                 )
                 
             except User.DoesNotExist:
@@ -256,6 +572,8 @@ class PasswordResetConfirmView(APIView):
             
             user.set_password(password)
             user.save()
+            # Quien tenga un token viejo (ej: el que motivó el reseteo) queda afuera
+            cortar_sesiones([(user.pk, None)])
             
             return Response({"mensaje": "Contraseña actualizada. Inicia sesión."}, status=200)
         
@@ -286,4 +604,114 @@ class CambiarPasswordPropioView(APIView):
             perfil.debe_cambiar_password = False
             perfil.save()
 
-        return Response({"mensaje": "Contraseña actualizada exitosamente."}, status=200)
\ No newline at end of file
+        return Response({"mensaje": "Contraseña actualizada exitosamente."}, status=200)
+
+# ==============================================================================
+# 5. OPERACIÓN (DIAGNÓSTICO)
+# ==============================================================================
+
+class EstadisticasCacheView(APIView):
+    """
+    Endpoint: GET /api/cache/estadisticas/
+    Aciertos/fallos de la capa local (del worker que responde) y del caché
+    compartido. Solo para staff.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            'pid': os.getpid(),
+            'caches': {alias: estadisticas_de_cache(alias) for alias in settings.CACHES},
+        })
+
+
+class EstadisticasBDView(APIView):
+    """
+    Endpoint: GET /api/bd/estadisticas/
+    Conexiones a PostgreSQL del worker que responde: modo (persistentes/pool/
+    pgbouncer), conexiones nuevas abiertas y saturación del pool. Solo staff.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(estadisticas_de_conexiones())
+
+
+# ==============================================================================
+# 6. AUDITORÍA (CUMPLIMIENTO)
+# ==============================================================================
+
+class AuditoriaView(APIView):
+    """
+    Endpoint: GET /api/auditoria/
+    Historial de cambios de permisos, del más nuevo al más viejo. Solo staff.
+
+    Filtros: ?actor= &usuario= (id o username), ?desde= &hasta= (ISO 8601),
+    ?q= (búsqueda de texto en el detalle), ?limite= (máx. 500).
+    Paginación por cursor: seguir el enlace 'siguiente' hasta que sea null.
+    """
+    permission_classes = [IsAdminUser]
+    LIMITE_DEFECTO = 50
+    LIMITE_MAXIMO = 500
+
+    def get(self, request):
+        params = request.query_params
+        try:
+            filtros = {
+                'actor_id': self._usuario(params.get('actor')),
+                'usuario_id': self._usuario(params.get('usuario')),
+                'desde': self._fecha(params.get('desde')),
+                'hasta': self._fecha(params.get('hasta')),
+                'texto': params.get('q', '').strip() or None,
+                'limite': min(max(int(params.get('limite', self.LIMITE_DEFECTO)), 1), self.LIMITE_MAXIMO),
+            }
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=400)
+
+        try:
+            filas, cursor = consultar_eventos(cursor=params.get('cursor'), **filtros)
+        except CursorInvalido:
+            return Response({"error": "Cursor inválido"}, status=400)
+
+        siguiente = None
+        if cursor:
+            query = params.copy()
+            query['cursor'] = cursor
+            siguiente = request.build_absolute_uri(f"{request.path}?{query.urlencode()}")
+
+        return Response({
+            "resultados": [
+                {
+                    "id": fila['id'],
+                    "fecha": fila['fecha'],
+                    "actor": {"id": fila['actor_id'], "username": fila['actor__username']},
+                    "usuario_afectado": {"id": fila['usuario_afectado_id'], "username": fila['usuario_afectado__username']},
+                    "accion": fila['accion'],
+                    "detalle": fila['detalle'],
+                    "datos": fila['datos'],
+                }
+                for fila in filas
+            ],
+            "siguiente": siguiente,
+        })
+
+    @staticmethod
+    def _usuario(valor):
+        """ID numérico o username -> ID (username inexistente: -1, sin resultados)."""
+        if not valor:
+            return None
+        if valor.isdigit():
+            return int(valor)
+        return User.objects.filter(username=valor).values_list('pk', flat=True).first() or -1
+
+    @staticmethod
+    def _fecha(valor):
+        if not valor:
+            return None
+        fecha = parse_datetime(valor)
+        if fecha is None:
+            dia = parse_date(valor)
+            if dia is None:
+                raise ValueError(f"Fecha inválida: {valor}")
+            fecha = datetime.combine(dia, time.min)
+        return timezone.make_aware(fecha) if timezone.is_naive(fecha) else fecha
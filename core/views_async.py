@@ -0,0 +1,270 @@
+"""
+CORE VIEWS ASYNC - ENDPOINTS CALIENTES NATIVOS PARA ASGI
+--------------------------------------------------------
+Versiones asíncronas de los endpoints que reciben la avalancha de las 8:00 AM:
+Login, Selección de Empresa y Delegación de Permisos.
+
+POR QUÉ:
+Bajo WSGI cada petición ocupa un hilo mientras espera a la BD, al caché o a
+un cliente lento. Con ASGI (uvicorn) y el ORM asíncrono de Django, un solo
+proceso atiende miles de conexiones concurrentes: solo se ocupa un hilo
+cuando realmente hay trabajo síncrono (señales, hash en el pool acotado).
+
+CONTRATO:
+Mismas URLs, mismos cuerpos de entrada/salida y mismos códigos HTTP que las
+vistas DRF de core/views.py. Se activan con API_ASYNC=True (ver hub_core/urls.py).
+"""
+
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import aauthenticate
+from django.contrib.auth.models import AnonymousUser, Permission, User
+from django.http import JsonResponse
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.settings import api_settings as drf_settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.serializers import TokenObtainSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .autenticacion import LoginSaturadoError
+from .delegacion import filtro_permiso, interpretar_vencimiento
+from .models import Pertenencia
+from .permisos import aobtener_permisos_efectivos, asegurar_registro, registro_cubre
+from .revocacion import CLAIM_FAMILIA, nuevo_refresh, verificar_token
+from .serializers import EmpresaSerializer
+from .views import CustomTokenObtainPairSerializer, aplicar_delegacion, emitir_pasaporte
+
+
+# ==============================================================================
+# 0. BASE: AUTENTICACIÓN JWT + THROTTLING SIN DRF
+# ==============================================================================
+
+class VistaAsincrona(View):
+    """
+    Equivalente mínimo de APIView para handlers 'async def':
+    - Exenta de CSRF (igual que DRF; la API usa Bearer tokens, no cookies).
+    - Cuerpo JSON en self.datos.
+    - Autenticación JWT (si requiere_autenticacion) con ORM asíncrono y la
+      lista de revocación de core/revocacion.py.
+    - Throttling con las mismas clases configuradas en REST_FRAMEWORK.
+    """
+    requiere_autenticacion = True
+    http_method_names = ['post', 'options']
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            self.datos = json.loads(request.body or b'{}')
+        except ValueError:
+            return JsonResponse({"detail": "JSON malformado."}, status=400)
+        if not isinstance(self.datos, dict):
+            return JsonResponse({"detail": "Se esperaba un objeto JSON."}, status=400)
+
+        request.user, request.auth = AnonymousUser(), None
+        if self.requiere_autenticacion:
+            try:
+                request.user = await self.autenticar(request)
+            except AuthenticationFailed as exc:  # Incluye InvalidToken
+                return JsonResponse(_detalle(exc), status=401)
+            if request.user is None:
+                request.user = AnonymousUser()
+                return JsonResponse(
+                    {"detail": "Las credenciales de autenticación no se proveyeron."}, status=401
+                )
+
+        espera = await sync_to_async(self.verificar_throttling)(request)
+        if espera is not None:
+            return JsonResponse(
+                {"detail": "Solicitud fue regulada (throttled)."},
+                status=429,
+                headers={'Retry-After': str(int(espera))} if espera else None,
+            )
+
+        return await super().dispatch(request, *args, **kwargs)
+
+    async def autenticar(self, request):
+        """Valida el Bearer token (CPU puro) y trae al usuario con el ORM async."""
+        jwt_auth = JWTAuthentication()
+        header = jwt_auth.get_header(request)
+        if header is None:
+            return None
+        raw_token = jwt_auth.get_raw_token(header)
+        if raw_token is None:
+            return None
+        token = jwt_auth.get_validated_token(raw_token)
+        await sync_to_async(verificar_token)(token)  # Lista de revocación (puede recargarla desde la BD)
+
+        try:
+            user = await User.objects.aget(**{jwt_settings.USER_ID_FIELD: token[jwt_settings.USER_ID_CLAIM]})
+        except (KeyError, User.DoesNotExist):
+            raise AuthenticationFailed("Usuario no encontrado.")
+        if not user.is_active:
+            raise AuthenticationFailed("El usuario está inactivo.")
+        request.auth = token
+        return user
+
+    def verificar_throttling(self, request):
+        """Devuelve None si se permite la petición, o los segundos de espera sugeridos."""
+        for clase in drf_settings.DEFAULT_THROTTLE_CLASSES:
+            throttle = clase()
+            if not throttle.allow_request(request, self):
+                return throttle.wait() or 0
+        return None
+
+
+def _detalle(exc):
+    detalle = exc.detail
+    return detalle if isinstance(detalle, dict) else {"detail": str(detalle)}
+
+
+# ==============================================================================
+# 1. LOGIN
+# ==============================================================================
+
+class CustomLoginAsyncView(VistaAsincrona):
+    """Endpoint: POST /api/login/ (versión ASGI de CustomLoginView)."""
+    requiere_autenticacion = False
+
+    async def post(self, request):
+        faltantes = {
+            campo: ["Este campo es requerido."]
+            for campo in (User.USERNAME_FIELD, 'password')
+            if not self.datos.get(campo)
+        }
+        if faltantes:
+            return JsonResponse(faltantes, status=400)
+
+        try:
+            user = await aauthenticate(
+                request,
+                username=self.datos[User.USERNAME_FIELD],
+                password=self.datos['password'],
+            )
+        except LoginSaturadoError:
+            return JsonResponse(
+                {"error": "Servicio de login saturado. Intenta nuevamente en unos segundos."},
+                status=503,
+                headers={'Retry-After': str(settings.LOGIN_RETRY_AFTER)},
+            )
+
+        if not jwt_settings.USER_AUTHENTICATION_RULE(user):
+            return JsonResponse(
+                {"detail": str(TokenObtainSerializer.default_error_messages['no_active_account'])},
+                status=401,
+            )
+
+        refresh = nuevo_refresh(user)
+        filas = [fila async for fila in CustomTokenObtainPairSerializer.consulta_contexto_login(user)]
+        debe_cambiar, empresas = CustomTokenObtainPairSerializer.armar_contexto_login(filas)
+
+        return JsonResponse({
+            'refresh': str(refresh),
+            'access': str(refresh.access_token),
+            'debe_cambiar_password': debe_cambiar,
+            'empresas_disponibles': EmpresaSerializer(empresas, many=True).data,
+        })
+
+
+# ==============================================================================
+# 2. SELECCIÓN DE EMPRESA (EL PASAPORTE)
+# ==============================================================================
+
+class SelectEmpresaAsyncView(VistaAsincrona):
+    """Endpoint: POST /api/select-empresa/ (versión ASGI de SelectEmpresaView)."""
+
+    async def post(self, request):
+        empresa_id = self.datos.get('empresa_id')
+
+        if not empresa_id:
+            return JsonResponse({"error": "Falta el campo 'empresa_id'"}, status=400)
+
+        try:
+            pertenencia = await Pertenencia.objects.select_related('empresa', 'grupo').aget(
+                usuario=request.user,
+                empresa_id=empresa_id
+            )
+        except (Pertenencia.DoesNotExist, ValueError):
+            return JsonResponse({"error": "No tienes acceso a esta empresa"}, status=403)
+
+        permisos = await aobtener_permisos_efectivos(pertenencia)
+        if settings.PASAPORTE_PERMISOS_COMPACTOS and not registro_cubre(permisos):
+            # Solo la primera vez que aparece un permiso hay que ir a la BD
+            await sync_to_async(asegurar_registro)(permisos)
+        token = emitir_pasaporte(request.user, pertenencia, permisos, request.auth.get(CLAIM_FAMILIA))
+
+        return JsonResponse({
+            'access_token': str(token),
+            'mensaje': f"Bienvenido a {pertenencia.empresa.nombre}"
+        })
+
+
+# ==============================================================================
+# 3. ADMINISTRACIÓN DELEGADA
+# ==============================================================================
+
+class DelegarPermisosAsyncView(VistaAsincrona):
+    """
+    Endpoint: POST /api/delegar-permiso/ (versión ASGI de DelegarPermisosView).
+    Las validaciones (lecturas) usan el ORM async; la escritura (m2m + señales
+    + auditoría) reutiliza aplicar_delegacion() en una sola transacción.
+    """
+
+    async def post(self, request):
+        target_user_id = self.datos.get('usuario_destino_id')
+        permiso_codename = self.datos.get('permiso_codename')
+        empresa_id = self.datos.get('empresa_id')
+        accion = self.datos.get('accion')  # 'add' o 'remove'
+
+        if not all([target_user_id, permiso_codename, empresa_id, accion]):
+            return JsonResponse({"error": "Faltan datos obligatorios"}, status=400)
+
+        # 1. Validar al Jefe
+        consulta = Pertenencia.objects.select_related('empresa', 'grupo__perfil')
+        try:
+            pertenencia_jefe = await consulta.aget(usuario=request.user, empresa_id=empresa_id)
+        except (Pertenencia.DoesNotExist, ValueError):
+            return JsonResponse({"error": "No tienes acceso a esta empresa"}, status=403)
+
+        perfil_jefe = getattr(pertenencia_jefe.grupo, 'perfil', None)
+        if perfil_jefe is None or not perfil_jefe.es_gerencial:
+            return JsonResponse({"error": "No tienes permisos gerenciales para delegar."}, status=403)
+
+        # 2. Validar al Empleado y Territorio
+        try:
+            pertenencia_empleado = await consulta.aget(usuario_id=target_user_id, empresa_id=empresa_id)
+        except (Pertenencia.DoesNotExist, ValueError):
+            return JsonResponse({"detail": "No encontrado."}, status=404)
+
+        perfil_empleado = getattr(pertenencia_empleado.grupo, 'perfil', None)
+        if perfil_empleado is None or perfil_jefe.area_id != perfil_empleado.area_id:
+            return JsonResponse({
+                "error": "Conflicto de Área: Solo puedes gestionar personal de tu departamento."
+            }, status=403)
+
+        # 3. Ejecutar Acción
+        try:
+            permiso = await Permission.objects.select_related('content_type').aget(**filtro_permiso(permiso_codename))
+        except Permission.DoesNotExist:
+            return JsonResponse({"error": f"El permiso '{permiso_codename}' no existe"}, status=404)
+        except Permission.MultipleObjectsReturned:
+            return JsonResponse({"error": f"El permiso '{permiso_codename}' es ambiguo: usar 'app.codename'"}, status=400)
+
+        if accion not in ('add', 'remove'):
+            return JsonResponse({"error": "Acción inválida"}, status=400)
+
+        vence_en, error = interpretar_vencimiento(self.datos.get('vence_en'))
+        if error:
+            return JsonResponse({"error": error}, status=400)
+
+        log_msg = await sync_to_async(aplicar_delegacion)(
+            request.user, pertenencia_jefe, pertenencia_empleado, permiso, accion, vence_en
+        )
+        return JsonResponse({"mensaje": "Operación exitosa", "detalle": log_msg})
@@ -0,0 +1,235 @@
+"""
+CORE WEBHOOKS - EVENTOS DE PERMISOS PARA LAS APPS SATÉLITE
+----------------------------------------------------------
+Las apps satélite cachean la autorización del Pasaporte; sin aviso, un
+permiso quitado solo se notaba al emitir un Pasaporte nuevo. Ahora el Hub
+les avisa por webhook:
+
+1. encolar_eventos(): lo que usan las delegaciones y las señales de Roles.
+   Inserta una EntregaWebhook por suscriptor activo en la MISMA transacción
+   del cambio (outbox): sin cambio confirmado no hay evento, y sin evento
+   guardado no hay cambio. Costo: un SELECT de suscriptores + un INSERT.
+2. procesar_lote(): lo que usa 'manage.py run_webhook_worker'. Por cada
+   suscriptor con pendientes (reservado con SKIP LOCKED: varios workers no
+   se pisan) envía UN POST con hasta WEBHOOK_LOTE eventos en orden, firmado
+   con HMAC (hub_pasaporte.webhooks), sin transacción abierta durante el POST. Si falla, el suscriptor entero espera
+   con backoff exponencial: los eventos siguientes no se adelantan al que
+   falló. Tras WEBHOOK_MAX_INTENTOS fallos el lote queda FALLIDO y se sigue.
+
+Cuerpo del POST:
+    {"eventos": [{"secuencia": 812, "tipo": "permisos.delegacion",
+                  "fecha": "...", "datos": {"usuario_id": 5, "empresa_id": 1,
+                  "permiso": "core.compras_aprobar_orden", "operacion": "remove"}}]}
+
+Tipos: 'permisos.delegacion' (add / remove / vencida, por usuario y empresa)
+y 'permisos.rol' (add / remove / clear sobre los permisos de un Grupo).
+"""
+
+import http.client
+import json
+import urllib.error
+import urllib.request
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import Group, Permission
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from hub_pasaporte.webhooks import CABECERA, firmar
+
+from .models import EntregaWebhook, SuscriptorWebhook
+
+TIPO_DELEGACION = 'permisos.delegacion'
+TIPO_ROL = 'permisos.rol'
+
+
+# ==============================================================================
+# 1. ENCOLADO (DENTRO DE LA TRANSACCIÓN DEL CAMBIO)
+# ==============================================================================
+
+def nombre_permiso(permiso):
+    """"app_label.codename" sin consultar si el content_type ya viene cargado."""
+    if type(permiso).content_type.is_cached(permiso):
+        app_label = permiso.content_type.app_label
+    else:
+        app_label = ContentType.objects.get_for_id(permiso.content_type_id).app_label  # Caché de Django
+    return f"{app_label}.{permiso.codename}"
+
+
+def evento_delegacion(usuario_id, empresa, permiso, operacion, vence_en=None):
+    """(tipo, datos) de una excepción otorgada ('add'), quitada ('remove') o vencida ('vencida')."""
+    datos = {
+        'usuario_id': usuario_id,
+        'empresa_id': empresa.pk,
+        'empresa_codigo': empresa.codigo,
+        'permiso': nombre_permiso(permiso),
+        'operacion': operacion,
+    }
+    if vence_en:
+        datos['vence_en'] = vence_en.isoformat()
+    return TIPO_DELEGACION, datos
+
+
+def encolar_cambio_de_rol(grupo_ids, operacion, permiso_ids=None):
+    """
+    Un 'permisos.rol' por Grupo afectado ('grupo' es el rol_nombre del
+    Pasaporte). permiso_ids=None con operacion 'clear': se quitaron todos.
+    Lo llama la señal de Group.permissions (cambios desde el Admin).
+    """
+    grupos = list(Group.objects.filter(pk__in=grupo_ids).values_list('pk', 'name'))
+    permisos = None
+    if permiso_ids is not None:
+        permisos = sorted(
+            f"{app_label}.{codename}" for app_label, codename in Permission.objects.filter(
+                pk__in=permiso_ids
+            ).values_list('content_type__app_label', 'codename')
+        )
+    return encolar_eventos(
+        (TIPO_ROL, {'grupo_id': pk, 'grupo': nombre, 'operacion': operacion, 'permisos': permisos})
+        for pk, nombre in grupos
+    )
+
+
+def encolar_eventos(eventos):
+    """Una EntregaWebhook por (evento, suscriptor activo interesado). Devuelve cuántas encoló."""
+    eventos = list(eventos)
+    if not eventos:
+        return 0
+    suscriptores = list(SuscriptorWebhook.objects.filter(activo=True).values_list('pk', 'tipos'))
+    if not suscriptores:
+        return 0
+
+    ahora = timezone.now()
+    entregas = [
+        EntregaWebhook(suscriptor_id=pk, tipo=tipo, datos=datos, creado=ahora)
+        for tipo, datos in eventos
+        for pk, tipos in suscriptores if not tipos or tipo in tipos
+    ]
+    EntregaWebhook.objects.bulk_create(entregas, batch_size=1000)
+    return len(entregas)
+
+
+# ==============================================================================
+# 2. DESPACHO (WORKER)
+# ==============================================================================
+
+def calcular_backoff(fallos):
+    """Espera antes del siguiente intento: base * 2^(fallos-1), con tope."""
+    segundos = settings.WEBHOOK_BACKOFF_BASE * (2 ** max(fallos - 1, 0))
+    return timedelta(seconds=min(segundos, settings.WEBHOOK_BACKOFF_MAXIMO))
+
+
+def _enviar(suscriptor, entregas):
+    """POST firmado con el lote. Lanza una excepción si no responde 2xx."""
+    cuerpo = json.dumps({'eventos': [
+        {'secuencia': e.pk, 'tipo': e.tipo, 'fecha': e.creado.isoformat(), 'datos': e.datos}
+        for e in entregas
+    ]}, separators=(',', ':')).encode()
+    peticion = urllib.request.Request(suscriptor.url, data=cuerpo, method='POST', headers={
+        'Content-Type': 'application/json',
+        'User-Agent': 'hub-identidad-webhooks',
+        CABECERA: firmar(suscriptor.secreto, cuerpo),
+    })
+    with urllib.request.urlopen(peticion, timeout=settings.WEBHOOK_TIMEOUT) as respuesta:
+        respuesta.read()
+
+
+def procesar_lote(tamano=None):
+    """
+    Un lote por cada suscriptor con eventos pendientes cuyo turno ya llegó.
+    Devuelve (entregados, fallidos) en cantidad de eventos.
+    """
+    tamano = tamano or settings.WEBHOOK_LOTE
+    pendientes = EntregaWebhook.objects.filter(
+        suscriptor=OuterRef('pk'), estado=EntregaWebhook.Estado.PENDIENTE
+    )
+    candidatos = SuscriptorWebhook.objects.filter(
+        Exists(pendientes), activo=True, proximo_intento__lte=timezone.now()
+    ).values_list('pk', flat=True)
+
+    entregados = fallidos = 0
+    for pk in candidatos:
+        ok, cantidad = _procesar_suscriptor(pk, tamano)
+        if ok:
+            entregados += cantidad
+        else:
+            fallidos += cantidad
+    return entregados, fallidos
+
+
+def _procesar_suscriptor(pk, tamano):
+    """
+    (entregado?, eventos del lote). El POST sale FUERA de toda transacción:
+    reservar el lote y anotar el resultado son dos transacciones cortas, así
+    un suscriptor lento no retiene filas bloqueadas ni una conexión en 'idle
+    in transaction' durante WEBHOOK_TIMEOUT.
+    """
+    reserva = _reservar_lote(pk, tamano)
+    if reserva is None:
+        return True, 0  # Otro worker lo está atendiendo (o ya no toca)
+    suscriptor, lote = reserva
+
+    try:
+        _enviar(suscriptor, lote)
+    except (urllib.error.URLError, http.client.HTTPException, OSError, ValueError) as exc:  # HTTPError es URLError
+        error = exc
+    else:
+        error = None
+    return _registrar_resultado(suscriptor, lote, error), len(lote)
+
+
+@transaction.atomic
+def _reservar_lote(pk, tamano):
+    """
+    Toma el suscriptor (SKIP LOCKED) y corre su proximo_intento hasta el fin
+    del envío: mientras dura el POST los demás workers no lo ven como candidato.
+    Si el worker muere a mitad, la reserva vence y otro reenvía el lote.
+    """
+    suscriptor = SuscriptorWebhook.objects.select_for_update(skip_locked=True).filter(
+        pk=pk, activo=True, proximo_intento__lte=timezone.now()
+    ).first()
+    if suscriptor is None:
+        return None
+
+    lote = list(
+        suscriptor.entregas.filter(estado=EntregaWebhook.Estado.PENDIENTE).order_by('id')[:tamano]
+    )
+    if not lote:
+        return None
+
+    # urlopen aplica el timeout por operación de socket: margen para conectar + enviar + leer
+    suscriptor.proximo_intento = timezone.now() + timedelta(seconds=3 * settings.WEBHOOK_TIMEOUT)
+    suscriptor.save(update_fields=['proximo_intento'])
+    return suscriptor, lote
+
+
+@transaction.atomic
+def _registrar_resultado(suscriptor, lote, error):
+    """Anota el envío (error=None si respondió 2xx) y libera la reserva. Devuelve entregado?"""
+    ahora = timezone.now()
+    for entrega in lote:
+        entrega.intentos += 1
+    if error is not None:
+        suscriptor.fallos_consecutivos += 1
+        suscriptor.ultimo_error = f"{type(error).__name__}: {error}"[:2000]
+        suscriptor.proximo_intento = ahora + calcular_backoff(suscriptor.fallos_consecutivos)
+        if suscriptor.fallos_consecutivos >= settings.WEBHOOK_MAX_INTENTOS:
+            # Sin más reintentos: el lote se descarta y el suscriptor sigue con lo demás
+            for entrega in lote:
+                entrega.estado = EntregaWebhook.Estado.FALLIDO
+            suscriptor.fallos_consecutivos = 0
+            suscriptor.proximo_intento = ahora
+    else:
+        for entrega in lote:
+            entrega.estado = EntregaWebhook.Estado.ENTREGADO
+            entrega.entregado_en = ahora
+        suscriptor.fallos_consecutivos = 0
+        suscriptor.ultimo_error = ''
+        suscriptor.proximo_intento = ahora
+
+    EntregaWebhook.objects.bulk_update(lote, ['estado', 'intentos', 'entregado_en'])
+    suscriptor.save(update_fields=['fallos_consecutivos', 'ultimo_error', 'proximo_intento'])
+    return error is None
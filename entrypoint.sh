@@ -5,15 +5,29 @@ set -e
 
 echo "🚀 [BACKEND] Iniciando Entrypoint..."
 
-# 1. Migraciones (Usando ruta directa del venv)
-echo "📦 Aplicando migraciones..."
-./venv/bin/python3 manage.py migrate
+# Intérprete: el venv del servidor por defecto; en la imagen Docker, PYTHON=python3
+PYTHON="${PYTHON:-./venv/bin/python3}"
 
-# 2. Estáticos
-echo "🎨 Recolectando estáticos..."
-./venv/bin/python3 manage.py collectstatic --noinput
+# 1. Migraciones + permisos + llave de firma en UN solo proceso.
+# Si la huella (migraciones + permisos declarados) es la misma del último deploy,
+# se omite migrate por completo. ARRANQUE_FORZAR=True aplica igual.
+echo "📦 Preparando arranque..."
+if [ "${ARRANQUE_FORZAR:-False}" = "True" ]; then
+    $PYTHON manage.py preparar_arranque --forzar
+else
+    $PYTHON manage.py preparar_arranque
+fi
+
+# 2. Estáticos: se recolectan al construir la imagen (Dockerfile / apprunner.yaml).
+# Solo como respaldo (ej: ejecución fuera de la imagen) si no existe el manifiesto.
+if [ ! -f static/staticfiles.json ]; then
+    echo "🎨 Recolectando estáticos (no venían en la imagen)..."
+    $PYTHON manage.py collectstatic --noinput
+fi
 
 # 3. Iniciar Servidor
-echo "🔥 Iniciando Gunicorn..."
+# Workers, hilos, keepalive, reciclaje, --preload y app WSGI/ASGI (según SERVIDOR_MODO)
+# se definen en gunicorn.conf.py; cada valor se puede cambiar con GUNICORN_*.
 # IMPORTANTE: Usar exec y la ruta completa
-exec ./venv/bin/python3 -m gunicorn hub_core.wsgi:application --bind 0.0.0.0:8000
\ No newline at end of file
+echo "🔥 Iniciando Gunicorn (${SERVIDOR_MODO:-wsgi})..."
+exec $PYTHON -m gunicorn -c gunicorn.conf.py
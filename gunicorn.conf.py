@@ -0,0 +1,192 @@
+"""
+GUNICORN - CONFIGURACIÓN DEL SERVIDOR
+-------------------------------------
+Lo carga entrypoint.sh ('gunicorn -c gunicorn.conf.py'). Todo se puede
+sobreescribir con variables de entorno GUNICORN_* (y SERVIDOR_MODO).
+
+DIMENSIONAMIENTO:
+1. CPUs: las que el contenedor puede usar de verdad (cuota del cgroup o
+   afinidad), no las del host. App Runner/ECS limitan por cuota.
+2. Workers: WSGI = 2 x CPU + 1; ASGI = 1 por CPU (cada worker Uvicorn ya
+   atiende miles de conexiones). Topados por la memoria disponible.
+3. Hilos (solo WSGI): con GUNICORN_THREADS > 1 se usa el worker 'gthread'.
+   Mientras un hilo espera a la BD o al hash del login (PBKDF2/bcrypt, ver
+   LOGIN_HASH_* en settings) los demás siguen atendiendo.
+
+KEEPALIVE CON NGINX (portal_web/nginx.conf):
+Nginx reutiliza conexiones hacia el backend ('upstream ... keepalive') y las
+cierra tras 60 s ociosas. Gunicorn debe esperar MÁS que eso: si Gunicorn
+cerrara primero, Nginx podría enviar una petición por una conexión recién
+cerrada y el usuario vería un 502.
+"""
+
+import math
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+
+def _entorno(nombre, defecto, tipo=str):
+    """Variable de entorno tipada; vacía (ej: 'GUNICORN_WORKERS=' en .env) = valor automático."""
+    valor = os.getenv(nombre)
+    return tipo(valor) if valor not in (None, '') else defecto
+
+
+# ==============================================================================
+# 1. RECURSOS DEL CONTENEDOR
+# ==============================================================================
+
+def _leer(ruta):
+    try:
+        with open(ruta) as archivo:
+            return archivo.read().strip()
+    except OSError:
+        return None
+
+
+def cpus_disponibles():
+    """CPUs efectivas: cuota del cgroup (v2 o v1) si existe, si no la afinidad del proceso."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = multiprocessing.cpu_count()
+
+    cuota = None
+    cpu_max = _leer('/sys/fs/cgroup/cpu.max')  # cgroup v2: "<cuota> <periodo>" o "max <periodo>"
+    if cpu_max and not cpu_max.startswith('max'):
+        limite, periodo = cpu_max.split()
+        cuota = int(limite) / int(periodo)
+    else:
+        limite, periodo = _leer('/sys/fs/cgroup/cpu/cpu.cfs_quota_us'), _leer('/sys/fs/cgroup/cpu/cpu.cfs_period_us')
+        if limite and periodo and int(limite) > 0:
+            cuota = int(limite) / int(periodo)
+
+    if cuota:
+        cpus = min(cpus, max(1, math.ceil(cuota)))
+    return max(1, cpus)
+
+
+def memoria_disponible_mb():
+    """Límite de memoria del cgroup o, sin límite, la memoria total del equipo. None si no se sabe."""
+    for ruta in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        valor = _leer(ruta)
+        if valor and valor.isdigit() and int(valor) < 1 << 60:  # v1 usa un número enorme como "sin límite"
+            return int(valor) // (1024 * 1024)
+    meminfo = _leer('/proc/meminfo')
+    if meminfo:
+        for linea in meminfo.splitlines():
+            if linea.startswith('MemTotal:'):
+                return int(linea.split()[1]) // 1024
+    return None
+
+
+# ==============================================================================
+# 2. PROCESOS E HILOS
+# ==============================================================================
+SERVIDOR_MODO = _entorno('SERVIDOR_MODO', 'wsgi')
+CPUS = cpus_disponibles()
+MEMORIA_MB = memoria_disponible_mb()
+MEMORIA_POR_WORKER_MB = _entorno('GUNICORN_MEMORIA_POR_WORKER_MB', 150, int)
+
+_workers_por_cpu = CPUS if SERVIDOR_MODO == 'asgi' else 2 * CPUS + 1
+if MEMORIA_MB:
+    # Dejamos ~25% para el maestro, el SO y los picos de cada worker
+    _workers_por_cpu = min(_workers_por_cpu, max(1, int(MEMORIA_MB * 0.75) // MEMORIA_POR_WORKER_MB))
+workers = _entorno('GUNICORN_WORKERS', _workers_por_cpu, int)
+
+if SERVIDOR_MODO == 'asgi':
+    wsgi_app = 'hub_core.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+    threads = 1
+else:
+    wsgi_app = 'hub_core.wsgi:application'
+    threads = _entorno('GUNICORN_THREADS', 4, int)
+    worker_class = _entorno('GUNICORN_WORKER_CLASS', 'gthread' if threads > 1 else 'sync')
+
+bind = _entorno('GUNICORN_BIND', '0.0.0.0:8000')
+backlog = _entorno('GUNICORN_BACKLOG', 2048, int)
+
+# La app se importa una vez en el maestro; los workers nacen por fork ya cargados
+preload_app = _entorno('GUNICORN_PRELOAD', 'True') == 'True'
+
+
+# ==============================================================================
+# 3. TIEMPOS Y RECICLAJE
+# ==============================================================================
+# Un login paga el hash de la clave (hasta LOGIN_HASH_TIMEOUT en la cola del pool):
+# el timeout del worker debe cubrirlo con margen para no matar workers sanos.
+timeout = _entorno('GUNICORN_TIMEOUT', max(30, int(_entorno('LOGIN_HASH_TIMEOUT', 10, float)) + 20), int)
+graceful_timeout = _entorno('GUNICORN_GRACEFUL_TIMEOUT', 30, int)
+
+# Mayor que el keepalive_timeout del upstream de Nginx (60 s). Solo aplica a gthread/ASGI:
+# el worker 'sync' cierra la conexión después de cada respuesta.
+keepalive = _entorno('GUNICORN_KEEPALIVE', 75, int)
+
+# Reciclar workers cada ~N peticiones (fugas de memoria lentas). El jitter evita
+# que todos se reinicien a la vez.
+max_requests = _entorno('GUNICORN_MAX_REQUESTS', 2000, int)
+max_requests_jitter = _entorno('GUNICORN_MAX_REQUESTS_JITTER', max(1, max_requests // 10) if max_requests else 0, int)
+
+
+# ==============================================================================
+# 4. LOGS Y MÉTRICAS (STATSD)
+# ==============================================================================
+accesslog = _entorno('GUNICORN_ACCESSLOG', '-')
+errorlog = '-'
+loglevel = _entorno('GUNICORN_LOGLEVEL', 'info')
+# Detrás del proxy: la IP real viene en X-Forwarded-For
+forwarded_allow_ips = _entorno('GUNICORN_FORWARDED_ALLOW_IPS', '*')
+
+# Con GUNICORN_STATSD_HOST=host:8125 Gunicorn envía sus métricas propias
+# (duración por petición, códigos HTTP, workers vivos) y las de los hooks de abajo.
+statsd_host = _entorno('GUNICORN_STATSD_HOST', None)
+statsd_prefix = _entorno('GUNICORN_STATSD_PREFIX', 'hub.gunicorn')
+
+
+# Métricas de la app (/metrics, core/metricas.py): cada worker escribe las suyas en
+# este directorio y /metrics las suma. Debe existir ANTES de importar la app
+# (preload_app) y vaciarse en cada arranque para no arrastrar workers viejos.
+PROMETHEUS_MULTIPROC_DIR = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'hub-metricas')
+)
+shutil.rmtree(PROMETHEUS_MULTIPROC_DIR, ignore_errors=True)
+os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+
+def _metrica(log, tipo, nombre, valor=1):
+    """Envía una métrica si el logger es el de statsd (sin GUNICORN_STATSD_HOST, no hace nada)."""
+    emitir = getattr(log, tipo, None)
+    if statsd_host and emitir:
+        emitir(nombre, valor)
+
+
+def on_starting(server):
+    server.log.info(
+        "Gunicorn %s: %s workers x %s hilos (%s), %s CPUs, %s MB, keepalive %ss, max_requests %s±%s",
+        SERVIDOR_MODO, workers, threads, worker_class, CPUS, MEMORIA_MB or '?',
+        keepalive, max_requests, max_requests_jitter,
+    )
+    _metrica(server.log, 'gauge', 'config.workers', workers)
+    _metrica(server.log, 'gauge', 'config.hilos', threads)
+
+
+def post_fork(server, worker):
+    _metrica(server.log, 'increment', 'workers.iniciados')
+
+
+def worker_exit(server, worker):
+    # Salida normal: reciclaje por max_requests o recarga
+    _metrica(server.log, 'increment', 'workers.terminados')
+
+
+def worker_abort(worker):
+    # SIGABRT por 'timeout': una petición bloqueó el worker (p. ej. BD lenta o cola de hashes llena)
+    worker.log.warning("Worker %s abortado por timeout (%ss)", worker.pid, timeout)
+    _metrica(worker.log, 'increment', 'workers.timeout')
+
+
+def child_exit(server, worker):
+    _metrica(server.log, 'increment', 'workers.salidas')
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid, PROMETHEUS_MULTIPROC_DIR)
@@ -3,6 +3,11 @@ ASGI config for hub_core project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+MODO ASGI (SERVIDOR_MODO=asgi):
+Los estáticos (/static/) se sirven con WhiteNoise envuelto como sub-aplicación,
+fuera de la cadena de middleware de Django, para que el resto de peticiones
+viajen 100% asíncronas hasta las vistas de core/views_async.py.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -13,4 +18,24 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hub_core.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from asgiref.wsgi import WsgiToAsgi  # noqa: E402
+from django.conf import settings  # noqa: E402
+from whitenoise import WhiteNoise  # noqa: E402
+
+
+def _no_encontrado(environ, start_response):
+    start_response('404 Not Found', [('Content-Type', 'text/plain')])
+    return [b'Not Found']
+
+
+static_application = WsgiToAsgi(
+    WhiteNoise(_no_encontrado, root=settings.STATIC_ROOT, prefix=settings.STATIC_URL, max_age=31536000)
+)
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'].startswith(settings.STATIC_URL):
+        return await static_application(scope, receive, send)
+    return await django_application(scope, receive, send)
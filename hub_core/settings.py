@@ -74,6 +74,12 @@ INSTALLED_APPS = [
 # 4. MIDDLEWARE (La tubería de procesamiento)
 # ==============================================================================
 MIDDLEWARE = [
+    # Sondas /healthz y /readyz del orquestador: antes de ALLOWED_HOSTS/HTTPS/CORS (core/middleware.py)
+    'core.middleware.SondasSaludMiddleware',
+
+    # Métricas por ruta (tiempo, consultas, caché, hash), Server-Timing y /metrics
+    'core.middleware.InstrumentacionMiddleware',
+
     # CORS debe ser lo primero: si el origen no es válido, rechazamos antes de procesar nada.
     'corsheaders.middleware.CorsMiddleware',
     
@@ -113,6 +119,18 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'hub_core.wsgi.application'
+ASGI_APPLICATION = 'hub_core.asgi.application'
+
+# MODO DE SERVIDOR: 'wsgi' (Gunicorn sync, default) o 'asgi' (Gunicorn + Uvicorn).
+# En 'asgi' los endpoints calientes (login, select-empresa, delegar-permiso)
+# usan sus versiones asíncronas nativas (core/views_async.py).
+SERVIDOR_MODO = os.getenv('SERVIDOR_MODO', 'wsgi')
+API_ASYNC = os.getenv('API_ASYNC', str(SERVIDOR_MODO == 'asgi')) == 'True'
+
+if SERVIDOR_MODO == 'asgi':
+    # WhiteNoise es solo síncrono: dentro de la cadena ASGI obligaría a pasar
+    # cada petición por un hilo. En ASGI los estáticos los sirve hub_core/asgi.py.
+    MIDDLEWARE.remove('whitenoise.middleware.WhiteNoiseMiddleware')
 
 
 # ==============================================================================
@@ -128,9 +146,49 @@ DATABASES = {
         'PASSWORD': os.getenv('DB_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
         'PORT': os.getenv('DB_PORT', '5432'),
+        'OPTIONS': {},
     }
 }
 
+# TLS hacia RDS (require / verify-full). Vacío = default de libpq ('prefer').
+if os.getenv('DB_SSLMODE'):
+    DATABASES['default']['OPTIONS']['sslmode'] = os.getenv('DB_SSLMODE')
+
+# --- CONEXIONES (core/conexiones.py) ---
+# Abrir una conexión TLS a RDS cuesta decenas de ms; sin reutilizarla, lo paga cada petición.
+# DB_CONEXIONES:
+#   'persistentes' (default WSGI): cada hilo reutiliza su conexión hasta DB_CONN_MAX_AGE
+#                  segundos, verificándola antes de usarla tras un error/inactividad.
+#   'pool'         (default ASGI): pool de psycopg 3 por proceso (DB_POOL_MIN..DB_POOL_MAX).
+#                  En ASGI Django no admite conexiones persistentes.
+#   'pgbouncer':   detrás de PgBouncer en modo transacción: conexiones persistentes
+#                  (baratas, son locales al bouncer) y sin cursores del lado del servidor.
+#   'ninguna':     comportamiento anterior (una conexión por petición).
+DB_CONEXIONES = os.getenv('DB_CONEXIONES', 'pool' if SERVIDOR_MODO == 'asgi' else 'persistentes')
+DB_CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', 300))  # Segundos
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', 2))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', 10))            # Por proceso: >= hilos por worker
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))  # Espera máxima por una conexión libre
+
+if DB_CONEXIONES in ('persistentes', 'pgbouncer'):
+    DATABASES['default']['CONN_MAX_AGE'] = DB_CONN_MAX_AGE
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+    if DB_CONEXIONES == 'pgbouncer':
+        # Cada transacción puede caer en otra conexión del servidor: sin cursores con nombre
+        DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+elif DB_CONEXIONES == 'pool':
+    # Con CONN_HEALTH_CHECKS Django verifica cada conexión al sacarla del pool
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': DB_POOL_MIN,
+        'max_size': DB_POOL_MAX,
+        'timeout': DB_POOL_TIMEOUT,
+        'max_idle': 300,
+        'max_lifetime': 1800,  # Recicla conexiones (failover de RDS, memoria del backend)
+    }
+elif DB_CONEXIONES != 'ninguna':
+    raise ValueError(f"DB_CONEXIONES inválido: {DB_CONEXIONES}")
+
 
 # ==============================================================================
 # 7. VALIDACIÓN DE CONTRASEÑAS
@@ -142,6 +200,44 @@ AUTH_PASSWORD_VALIDATORS = [
     { 'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator', },
 ]
 
+# --- ALGORITMO DE HASH (COSTO DEL LOGIN) ---
+# El primero de la lista es el 'preferido': las claves guardadas con otro
+# algoritmo o con otros parámetros se re-hashean solas en el siguiente login.
+# Opciones: pbkdf2 (default), scrypt, argon2. Las claves antiguas en BCrypt se
+# siguen verificando ('argon2-cffi' y 'bcrypt' vienen en requirements.txt).
+_HASHERS_DISPONIBLES = {
+    'pbkdf2': 'core.hashers.PBKDF2Ajustado',
+    'scrypt': 'core.hashers.ScryptAjustado',
+    'argon2': 'core.hashers.Argon2Ajustado',
+}
+_hasher_preferido = os.getenv('PASSWORD_HASHER', 'pbkdf2')
+if _hasher_preferido not in _HASHERS_DISPONIBLES:
+    raise ValueError(f"PASSWORD_HASHER inválido: {_hasher_preferido} (opciones: {', '.join(_HASHERS_DISPONIBLES)})")
+PASSWORD_HASHERS = [_HASHERS_DISPONIBLES[_hasher_preferido]] + [
+    ruta for nombre, ruta in _HASHERS_DISPONIBLES.items() if nombre != _hasher_preferido
+] + [
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
+# Parámetros de costo (ajustar al presupuesto de CPU/RAM del contenedor)
+PASSWORD_PBKDF2_ITERACIONES = int(os.getenv('PASSWORD_PBKDF2_ITERACIONES', 1_000_000))
+PASSWORD_SCRYPT_N = int(os.getenv('PASSWORD_SCRYPT_N', 2**14))
+PASSWORD_SCRYPT_R = int(os.getenv('PASSWORD_SCRYPT_R', 8))
+PASSWORD_SCRYPT_P = int(os.getenv('PASSWORD_SCRYPT_P', 1))
+PASSWORD_ARGON2_TIME_COST = int(os.getenv('PASSWORD_ARGON2_TIME_COST', 2))
+PASSWORD_ARGON2_MEMORY_COST = int(os.getenv('PASSWORD_ARGON2_MEMORY_COST', 65536))  # KiB
+PASSWORD_ARGON2_PARALLELISM = int(os.getenv('PASSWORD_ARGON2_PARALLELISM', 1))
+
+# --- LOGIN ACOTADO (core/autenticacion.py) ---
+# El hash se calcula en un pool de hilos por proceso. Si hilos + cola están
+# llenos, /api/login/ responde 503 con 'Retry-After' en vez de bloquear workers.
+AUTHENTICATION_BACKENDS = ['core.autenticacion.BackendLoginAcotado']
+LOGIN_HASH_WORKERS = int(os.getenv('LOGIN_HASH_WORKERS', 2))
+LOGIN_HASH_COLA_MAX = int(os.getenv('LOGIN_HASH_COLA_MAX', 8))
+LOGIN_HASH_TIMEOUT = float(os.getenv('LOGIN_HASH_TIMEOUT', 10))  # Segundos
+LOGIN_RETRY_AFTER = int(os.getenv('LOGIN_RETRY_AFTER', 2))  # Segundos sugeridos al cliente
+
 
 # ==============================================================================
 # 8. INTERNACIONALIZACIÓN
@@ -185,7 +281,8 @@ CSRF_TRUSTED_ORIGINS = csrf_origins_raw.split(',')
 # ==============================================================================
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWTAuthentication de simplejwt + lista de revocación (core/revocacion.py)
+        'core.revocacion.AutenticacionJWT',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -194,18 +291,19 @@ REST_FRAMEWORK = {
     
     # --- RATE LIMITING (Ajustado para Oficina Corporativa) ---
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle'
+        # Mismas reglas que las de DRF, con contadores en el caché compartido
+        'core.throttling.AnonRateThrottleCompartido',
+        'core.throttling.UserRateThrottleCompartido'
     ],
     'DEFAULT_THROTTLE_RATES': {
         # 100 intentos por minuto por IP.
         # Permite que toda la oficina entre a las 8:00 AM sin bloquearse,
         # pero detiene scripts agresivos que intenten miles de claves.
-        'anon': '100/minute', 
+        'anon': os.getenv('THROTTLE_ANON', '100/minute'),
         
         # 2000 peticiones al día por usuario logueado.
         # Suficiente para un uso intensivo del sistema.
-        'user': '2000/day'    
+        'user': os.getenv('THROTTLE_USER', '2000/day'),
     }
 }
 
@@ -221,20 +319,56 @@ SPECTACULAR_SETTINGS = {
 # ==============================================================================
 # 12. JWT CONFIGURACIÓN (TOKENS)
 # ==============================================================================
+# Firma del Pasaporte:
+# - HS256: con la SECRET_KEY (quien verifica necesita el secreto).
+# - RS256 / EdDSA: llaves asimétricas en JWT_CLAVES_DIR, públicas en
+#   /.well-known/jwks.json. Crear/rotar con 'manage.py rotate_signing_key'
+#   (ver core/firmas.py). Cambiar el modo invalida las sesiones abiertas.
+JWT_FIRMA = os.getenv('JWT_FIRMA', 'HS256')
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=8),  # Duración de la sesión laboral
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
     'SIGNING_KEY': SECRET_KEY, 
-    'ALGORITHM': 'HS256',
+    'ALGORITHM': JWT_FIRMA,
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+JWT_CLAVES_DIR = os.getenv('JWT_CLAVES_DIR', str(BASE_DIR / 'claves_jwt'))
+JWT_RSA_BITS = int(os.getenv('JWT_RSA_BITS', 2048))
+# Tiempo que una llave retirada sigue siendo aceptada (y publicada) tras una rotación.
+# Por defecto cubre al token más longevo (Refresh) emitido justo antes de rotar.
+JWT_CLAVES_SOLAPAMIENTO = timedelta(
+    seconds=int(os.getenv('JWT_CLAVES_SOLAPAMIENTO', 0))
+) or max(SIMPLE_JWT['ACCESS_TOKEN_LIFETIME'], SIMPLE_JWT['REFRESH_TOKEN_LIFETIME'])
+# Cache-Control de /.well-known/jwks.json (segundos)
+JWT_JWKS_MAX_AGE = int(os.getenv('JWT_JWKS_MAX_AGE', 3600))
+
+# Revocación (core/revocacion.py): tokens por 'jti' y cortes "no antes de" por
+# usuario/empresa, copiados en este alias de caché y consultados en cada petición.
+# La copia se recarga desde la BD (purgando lo vencido) cada REVOCACION_RECARGA
+# segundos; sin CACHE_URL (LocMem por proceso) es también la demora máxima con
+# la que un worker ve una revocación hecha en otro.
+REVOCACION_CACHE_ALIAS = os.getenv('REVOCACION_CACHE_ALIAS', 'compartido')
+REVOCACION_RECARGA = int(os.getenv('REVOCACION_RECARGA', 60))
+
+# Login: Si es True, el selector inicial solo ofrece Empresas con activo=True.
+LOGIN_SOLO_EMPRESAS_ACTIVAS = os.getenv('LOGIN_SOLO_EMPRESAS_ACTIVAS', 'False') == 'True'
+
+# Pasaporte: Si es True, los permisos viajan como mapa de bits (claim 'permisos_bits')
+# en vez de la lista "app.codename". Las apps satélite necesitan hub_pasaporte con
+# URL_REGISTRO configurada para expandirlo.
+PASAPORTE_PERMISOS_COMPACTOS = os.getenv('PASAPORTE_PERMISOS_COMPACTOS', 'False') == 'True'
+
 
 # ==============================================================================
 # 13. CONFIGURACIÓN DE CORREO (SMTP)
 # ==============================================================================
 # Usamos el backend SMTP real para producción y pruebas locales conectadas.
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Para desarrollo/pruebas: 'django.core.mail.backends.console.EmailBackend'
+# o 'django.core.mail.backends.filebased.EmailBackend' (+ EMAIL_FILE_PATH).
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_FILE_PATH = os.getenv('EMAIL_FILE_PATH', BASE_DIR / 'correos_enviados')
 
 # Configuración del servidor (Office 365, Gmail, AWS SES)
 EMAIL_HOST = os.getenv('EMAIL_HOST')
@@ -246,16 +380,98 @@ EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 # Remitente por defecto para correos automáticos
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', EMAIL_HOST_USER)
 
+# Bandeja de salida (core/correo.py): las vistas encolan y el worker
+# 'manage.py run_mail_worker' envía en lotes con una sola conexión SMTP.
+CORREO_LOTE = int(os.getenv('CORREO_LOTE', 50))                           # Correos por conexión
+CORREO_MAX_POR_SEGUNDO = float(os.getenv('CORREO_MAX_POR_SEGUNDO', 10))   # Límite del proveedor (SES)
+CORREO_MAX_INTENTOS = int(os.getenv('CORREO_MAX_INTENTOS', 5))
+CORREO_BACKOFF_BASE = int(os.getenv('CORREO_BACKOFF_BASE', 30))           # Segundos (se duplica por intento)
+CORREO_BACKOFF_MAXIMO = int(os.getenv('CORREO_BACKOFF_MAXIMO', 3600))
+
 # URL del Frontend para generar links (ej: Reset Password)
 # En local es http://172.20...:5173, en Prod será el dominio HTTPS real.
 FRONTEND_URL = os.getenv('FRONTEND_URL', 'http://localhost')
 
 
 # ==============================================================================
-# 14. SISTEMA
+# 14. CACHÉ (LOCAL EN PROCESO + COMPARTIDO)
+# ==============================================================================
+# 'compartido': Redis/Valkey (CACHE_URL=redis://host:6379/0), fuente de verdad
+#               entre workers y deploys. Sin CACHE_URL se usa LocMem como
+#               sustituto local (desarrollo/tests): NO se comparte entre procesos.
+# 'default':    LRU en proceso (TTL corto) delante de 'compartido' (core/cache.py).
+#               Una escritura puede tardar hasta CACHE_LOCAL_TTL segundos en
+#               verse en los demás workers. CACHE_LOCAL_MAX_ENTRADAS=0 la desactiva.
+CACHE_URL = os.getenv('CACHE_URL', '')
+CACHE_LOCAL_MAX_ENTRADAS = int(os.getenv('CACHE_LOCAL_MAX_ENTRADAS', 1000))
+CACHE_LOCAL_TTL = float(os.getenv('CACHE_LOCAL_TTL', 5))  # Segundos
+
+if CACHE_URL:
+    CACHE_COMPARTIDO = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_URL,
+        'KEY_PREFIX': 'hub',
+    }
+else:
+    CACHE_COMPARTIDO = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'hub-compartido',
+    }
+
+CACHES = {
+    'default': {
+        'BACKEND': 'core.cache.CacheDosNiveles',
+        'OPTIONS': {
+            'COMPARTIDO': 'compartido',
+            'MAX_ENTRADAS': CACHE_LOCAL_MAX_ENTRADAS,
+            'TTL_LOCAL': CACHE_LOCAL_TTL,
+        },
+    },
+    'compartido': CACHE_COMPARTIDO,
+}
+
+# Throttling: contadores siempre en el caché compartido (ver core/throttling.py)
+THROTTLE_CACHE_ALIAS = os.getenv('THROTTLE_CACHE_ALIAS', 'compartido')
+
+# Caché versionado de la lista "app.codename" por (usuario, empresa) que usa
+# SelectEmpresaView al emitir el Pasaporte (ver core/permisos.py).
+# Con la capa local, una revocación tarda como mucho CACHE_LOCAL_TTL en verse en
+# los demás workers (sin CACHE_URL, hasta PERMISOS_CACHE_TIMEOUT).
+PERMISOS_CACHE_ALIAS = os.getenv('PERMISOS_CACHE_ALIAS', 'default')
+PERMISOS_CACHE_TIMEOUT = int(os.getenv('PERMISOS_CACHE_TIMEOUT', 300))  # Segundos
+
+
+# ==============================================================================
+# 15. SISTEMA
 # ==============================================================================
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+
+# ==============================================================================
+# 16. OBSERVABILIDAD (MÉTRICAS)
+# ==============================================================================
+# Ver core/metricas.py y InstrumentacionMiddleware (core/middleware.py).
+METRICAS_ACTIVAS = os.getenv('METRICAS_ACTIVAS', 'True') == 'True'
+METRICAS_RUTA = os.getenv('METRICAS_RUTA', '/metrics')
+# Obligatorio para leer /metrics fuera de DEBUG (vacío = 404). Nginx no lo publica, pero
+# App Runner expone Gunicorn directo: el token es lo único que lo protege
+METRICAS_TOKEN = os.getenv('METRICAS_TOKEN', '')
+METRICAS_SERVER_TIMING = os.getenv('METRICAS_SERVER_TIMING', 'True') == 'True'
+# Consultas SQL por petición antes de registrar un WARNING (0 = sin límite)
+METRICAS_PRESUPUESTO_CONSULTAS = int(os.getenv('METRICAS_PRESUPUESTO_CONSULTAS', 10))
+
+
+# ==============================================================================
+# 17. WEBHOOKS DE PERMISOS (APPS SATÉLITE)
+# ==============================================================================
+# Ver core/webhooks.py: los cambios de permisos se encolan en la transacción y
+# 'manage.py run_webhook_worker' los envía en lotes firmados por suscriptor.
+WEBHOOK_LOTE = int(os.getenv('WEBHOOK_LOTE', 100))                     # Eventos por POST
+WEBHOOK_TIMEOUT = float(os.getenv('WEBHOOK_TIMEOUT', 5))               # Segundos por POST
+WEBHOOK_MAX_INTENTOS = int(os.getenv('WEBHOOK_MAX_INTENTOS', 8))       # Luego el lote queda FALLIDO
+WEBHOOK_BACKOFF_BASE = int(os.getenv('WEBHOOK_BACKOFF_BASE', 10))      # Segundos (se duplica por fallo)
+WEBHOOK_BACKOFF_MAXIMO = int(os.getenv('WEBHOOK_BACKOFF_MAXIMO', 3600))
+
 # ==========================================
 # CONFIGURACIÓN PARA PROXY REVERSO (AWS/NGINX)
 # ==========================================
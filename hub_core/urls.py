@@ -7,23 +7,41 @@ ESTRUCTURA DE ENDPOINTS:
 1. Administración: Panel nativo de Django.
 2. Autenticación: Login y selección de contexto (Empresa).
 3. Seguridad: Recuperación de cuentas y cambio obligatorio de clave.
-4. Gestión: Delegación de permisos por jefaturas.
+4. Gestión: Delegación de permisos por jefaturas, diagnóstico operativo y auditoría.
 5. Documentación: Especificación OpenAPI (Swagger) para desarrolladores externos.
 """
 
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path
 
 # Importamos las vistas del núcleo de negocio
 from core.views import (
     CustomLoginView, 
+    LogoutView,
+    RefrescarSesionView,
     SelectEmpresaView, 
     DelegarPermisosView, 
+    DelegarPermisosLoteView,
     PasswordResetRequestView, 
     PasswordResetConfirmView,
-    CambiarPasswordPropioView
+    CambiarPasswordPropioView,
+    RegistroPermisosView,
+    JWKSView,
+    EstadisticasCacheView,
+    EstadisticasBDView,
+    AuditoriaView,
 )
 
+# Endpoints calientes: en modo ASGI usamos sus versiones nativas asíncronas
+# (mismo contrato HTTP, ver core/views_async.py).
+if settings.API_ASYNC:
+    from core.views_async import (
+        CustomLoginAsyncView as CustomLoginView,
+        SelectEmpresaAsyncView as SelectEmpresaView,
+        DelegarPermisosAsyncView as DelegarPermisosView,
+    )
+
 # Herramientas de documentación automática
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 
@@ -40,10 +58,20 @@ urlpatterns = [
     # ==========================================================================
     # Paso A: Login básico (User/Pass) -> Devuelve Token Temporal
     path('api/login/', CustomLoginView.as_view(), name='login'),
+    # Revoca el token actual (y el Refresh, si viene) antes de su vencimiento
+    path('api/logout/', LogoutView.as_view(), name='logout'),
+    # Rota el Refresh y re-emite el Pasaporte sin pedir la clave (detecta reuso)
+    path('api/token/refresh/', RefrescarSesionView.as_view(), name='token_refresh'),
     
     # Paso B: Selección de Empresa -> Devuelve Token Final (Con Permisos)
     path('api/select-empresa/', SelectEmpresaView.as_view(), name='select_empresa'),
 
+    # Registro de bits para expandir Pasaportes compactos (apps satélite)
+    path('api/permisos/registro/', RegistroPermisosView.as_view(), name='registro_permisos'),
+
+    # Llaves públicas del Pasaporte (RS256/EdDSA) para verificación offline
+    path('.well-known/jwks.json', JWKSView.as_view(), name='jwks'),
+
 
     # ==========================================================================
     # 3. SEGURIDAD Y RECUPERACIÓN DE CUENTAS
@@ -61,6 +89,15 @@ urlpatterns = [
     # ==========================================================================
     # Permite a un Gerente dar permisos temporales a sus subordinados
     path('api/delegar-permiso/', DelegarPermisosView.as_view(), name='delegar_permiso'),
+    # Lo mismo para muchas personas/permisos en una llamada (una transacción)
+    path('api/delegar-permiso/lote/', DelegarPermisosLoteView.as_view(), name='delegar_permiso_lote'),
+
+    # Diagnóstico: aciertos de la caché local/compartida (solo staff)
+    path('api/cache/estadisticas/', EstadisticasCacheView.as_view(), name='cache_estadisticas'),
+    path('api/bd/estadisticas/', EstadisticasBDView.as_view(), name='bd_estadisticas'),
+
+    # Historial de auditoría paginado por cursor (solo staff)
+    path('api/auditoria/', AuditoriaView.as_view(), name='auditoria'),
 
 
     # ==========================================================================
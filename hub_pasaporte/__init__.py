@@ -0,0 +1,50 @@
+"""
+HUB PASAPORTE - SDK DE VERIFICACIÓN PARA APLICACIONES SATÉLITE
+--------------------------------------------------------------
+Librería para que Compras, Chatbot y cualquier otra app consumidora verifique
+el 'Pasaporte Universal' (JWT emitido por /api/select-empresa/ del Hub)
+LOCALMENTE, sin llamar al Hub en cada petición.
+
+USO BÁSICO:
+    from hub_pasaporte import VerificadorPasaporte, ClaveCompartida
+
+    verificador = VerificadorPasaporte(ClaveCompartida(os.environ['HUB_SIGNING_KEY']))
+    pasaporte = verificador.verificar(token)
+    if pasaporte.has_perm('core.compras_aprobar_orden'):
+        ...
+
+FIRMA ASIMÉTRICA (RS256/EdDSA, recomendado): solo llaves públicas, sin secretos.
+    verificador = VerificadorPasaporte(ClavesJWKS('https://hub.provefrut.com/.well-known/jwks.json'))
+
+PASAPORTE COMPACTO (permisos como mapa de bits):
+    verificador = VerificadorPasaporte(
+        ClaveCompartida(...),
+        registro=RegistroRemoto('https://hub.provefrut.com/api/permisos/registro/'),
+    )
+
+DJANGO REST FRAMEWORK: ver hub_pasaporte.drf
+
+WEBHOOKS DE PERMISOS (avisos del Hub para invalidar cachés): ver hub_pasaporte.webhooks
+
+Dependencias: PyJWT (+ cryptography para RS256/EdDSA). DRF solo si se usa hub_pasaporte.drf.
+"""
+
+from .compacto import codificar_bits, expandir_bits
+from .pasaporte import Pasaporte
+from .registro import RegistroEstatico, RegistroRemoto
+from .verificador import ClaveCompartida, ClavesJWKS, PasaporteInvalido, VerificadorPasaporte
+from .webhooks import FirmaInvalida, verificar_firma
+
+__all__ = [
+    'ClaveCompartida',
+    'ClavesJWKS',
+    'FirmaInvalida',
+    'Pasaporte',
+    'PasaporteInvalido',
+    'RegistroEstatico',
+    'RegistroRemoto',
+    'VerificadorPasaporte',
+    'codificar_bits',
+    'expandir_bits',
+    'verificar_firma',
+]
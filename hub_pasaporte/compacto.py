@@ -0,0 +1,54 @@
+"""
+Formato COMPACTO del claim de permisos.
+
+En lugar de la lista "app.codename" completa, el Pasaporte puede llevar:
+    permisos_bits: mapa de bits en base64url (sin relleno), little-endian.
+                   El bit i encendido = el permiso con índice i del registro.
+    permisos_reg:  versión del registro con la que se codificó (= cantidad de
+                   permisos registrados en ese momento).
+
+El registro es de SOLO AGREGADO: un índice nunca se reasigna ni se reutiliza,
+así que el registro versión N es exactamente el prefijo de largo N de cualquier
+versión posterior. Un consumidor con un registro igual o más nuevo que el del
+token siempre puede expandirlo.
+"""
+
+import base64
+
+CLAIM_BITS = 'permisos_bits'
+CLAIM_VERSION = 'permisos_reg'
+
+
+# Bits encendidos de cada valor de byte posible: evita operar con enteros
+# gigantes (cada operación sobre un int de N bits cuesta O(N)).
+_BITS_POR_BYTE = tuple(tuple(b for b in range(8) if valor >> b & 1) for valor in range(256))
+
+
+def codificar_bits(indices):
+    """Índices de bit -> texto base64url del mapa de bits."""
+    indices = list(indices)
+    mapa = bytearray((max(indices) >> 3) + 1 if indices else 0)
+    for indice in indices:
+        mapa[indice >> 3] |= 1 << (indice & 7)
+    return base64.urlsafe_b64encode(mapa).rstrip(b'=').decode('ascii')
+
+
+def indices_de_bits(texto):
+    """Texto base64url -> índices de los bits encendidos (en orden creciente)."""
+    crudo = base64.urlsafe_b64decode(texto + '=' * (-len(texto) % 4))
+    return [
+        base + bit
+        for base, valor in zip(range(0, len(crudo) * 8, 8), crudo) if valor
+        for bit in _BITS_POR_BYTE[valor]
+    ]
+
+
+def expandir_bits(texto, nombres):
+    """
+    Texto base64url + lista de nombres del registro (índice = bit) -> frozenset
+    de "app.codename". Lanza ValueError si el mapa usa bits fuera del registro.
+    """
+    try:
+        return frozenset(nombres[indice] for indice in indices_de_bits(texto))
+    except IndexError:
+        raise ValueError("El mapa de permisos usa bits que el registro no conoce.")
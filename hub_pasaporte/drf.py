@@ -0,0 +1,105 @@
+"""
+Integración con Django REST Framework para las apps satélite.
+
+CONFIGURACIÓN (settings.py de la app consumidora):
+
+    HUB_PASAPORTE = {
+        # Hub con RS256/EdDSA (recomendado): llaves públicas del JWKS
+        'URL_JWKS': 'https://hub.provefrut.com/.well-known/jwks.json',
+        # ...o Hub con HS256: la misma SIGNING_KEY del Hub
+        # 'CLAVE': os.environ['HUB_SIGNING_KEY'],
+        # 'ALGORITMOS': ['HS256'],
+        'LEEWAY': 30,                             # Segundos de tolerancia de reloj
+        # Solo si el Hub emite Pasaportes compactos (PASAPORTE_PERMISOS_COMPACTOS):
+        'URL_REGISTRO': 'https://hub.provefrut.com/api/permisos/registro/',
+    }
+
+    REST_FRAMEWORK = {
+        'DEFAULT_AUTHENTICATION_CLASSES': ['hub_pasaporte.drf.AutenticacionPasaporte'],
+    }
+
+EN LAS VISTAS:
+
+    class AprobarOrdenView(APIView):
+        permission_classes = [TienePermiso('core.compras_aprobar_orden')]
+
+    # o declarativo:
+    class ReportesView(APIView):
+        permission_classes = [PermisosRequeridos]
+        permisos_requeridos = ['core.compras_ver_reportes']
+"""
+
+from django.conf import settings
+from rest_framework import authentication, exceptions, permissions
+
+from .registro import RegistroRemoto
+from .verificador import ClaveCompartida, ClavesJWKS, PasaporteInvalido, VerificadorPasaporte
+
+_verificador = None
+
+
+def obtener_verificador():
+    """Verificador único por proceso, construido desde settings.HUB_PASAPORTE."""
+    global _verificador
+    if _verificador is None:
+        config = getattr(settings, 'HUB_PASAPORTE', {})
+        url_registro = config.get('URL_REGISTRO')
+        if config.get('URL_JWKS'):
+            fuente_clave = ClavesJWKS(config['URL_JWKS'], ttl=config.get('JWKS_TTL', 3600))
+        else:
+            fuente_clave = ClaveCompartida(config['CLAVE'], config.get('ALGORITMOS', ['HS256']))
+        _verificador = VerificadorPasaporte(
+            fuente_clave,
+            leeway=config.get('LEEWAY', 0),
+            tamano_cache=config.get('TAMANO_CACHE', 1024),
+            registro=RegistroRemoto(url_registro) if url_registro else None,
+        )
+    return _verificador
+
+
+class AutenticacionPasaporte(authentication.BaseAuthentication):
+    """
+    Lee 'Authorization: Bearer <pasaporte>' y lo verifica localmente.
+    request.user queda como un hub_pasaporte.Pasaporte.
+    """
+    tipo_cabecera = 'Bearer'
+
+    def authenticate(self, request):
+        cabecera = authentication.get_authorization_header(request).split()
+        if not cabecera or cabecera[0].lower() != self.tipo_cabecera.lower().encode():
+            return None
+        if len(cabecera) != 2:
+            raise exceptions.AuthenticationFailed("Cabecera Authorization mal formada.")
+
+        token = cabecera[1].decode('latin-1')
+        try:
+            return obtener_verificador().verificar(token), token
+        except PasaporteInvalido as exc:
+            raise exceptions.AuthenticationFailed(str(exc))
+
+    def authenticate_header(self, request):
+        return self.tipo_cabecera
+
+
+class PermisosRequeridos(permissions.BasePermission):
+    """Exige todos los permisos de 'view.permisos_requeridos' (lista de 'app.codename')."""
+
+    def has_permission(self, request, view):
+        usuario = request.user
+        if not getattr(usuario, 'is_authenticated', False):
+            return False
+        return usuario.has_perms(getattr(view, 'permisos_requeridos', ()))
+
+
+def TienePermiso(*permisos_requeridos):
+    """Fábrica de clases de permiso: permission_classes = [TienePermiso('core.x')]."""
+
+    class _TienePermiso(PermisosRequeridos):
+        message = f"Requiere: {', '.join(permisos_requeridos)}"
+
+        def has_permission(self, request, view):
+            usuario = request.user
+            return getattr(usuario, 'is_authenticated', False) and usuario.has_perms(permisos_requeridos)
+
+    _TienePermiso.__name__ = f"TienePermiso({', '.join(permisos_requeridos)})"
+    return _TienePermiso
@@ -0,0 +1,53 @@
+"""
+El Pasaporte ya verificado: identidad + empresa + permisos.
+"""
+
+
+class Pasaporte:
+    """
+    Representa al usuario dueño de un Pasaporte válido.
+
+    Los permisos se congelan en un frozenset UNA sola vez al construirlo, así
+    has_perm() es O(1) sin importar cuántos permisos traiga el token.
+    Expone la interfaz mínima de un 'user' de Django/DRF (is_authenticated, pk).
+    """
+    is_authenticated = True
+    is_anonymous = False
+    is_active = True
+
+    __slots__ = (
+        'claims', 'pk', 'id', 'username', 'email', 'nombre_completo',
+        'empresa_id', 'empresa_codigo', 'empresa_nombre', 'rol_nombre',
+        'permisos', 'expira',
+    )
+
+    def __init__(self, claims, permisos=None):
+        self.claims = claims
+        self.pk = self.id = claims.get('user_id')
+        self.username = claims.get('username', '')
+        self.email = claims.get('email', '')
+        self.nombre_completo = claims.get('nombre_completo', '')
+        self.empresa_id = claims.get('empresa_id')
+        self.empresa_codigo = claims.get('empresa_codigo', '')
+        self.empresa_nombre = claims.get('empresa_nombre', '')
+        self.rol_nombre = claims.get('rol_nombre', '')
+        # 'permisos' llega ya expandido cuando el token usa el formato compacto
+        self.permisos = frozenset(claims.get('permisos', ()) if permisos is None else permisos)
+        self.expira = claims.get('exp')
+
+    def has_perm(self, permiso):
+        """'app.codename' -> bool, en O(1)."""
+        return permiso in self.permisos
+
+    def has_perms(self, permisos):
+        return self.permisos.issuperset(permisos)
+
+    def has_module_perms(self, app_label):
+        prefijo = f"{app_label}."
+        return any(p.startswith(prefijo) for p in self.permisos)
+
+    def __str__(self):
+        return f"{self.username}@{self.empresa_codigo}"
+
+    def __repr__(self):
+        return f"<Pasaporte {self} ({len(self.permisos)} permisos)>"
@@ -0,0 +1,58 @@
+"""
+Fuentes del registro de permisos para expandir Pasaportes compactos.
+Exponen nombres(version, token) -> lista con al menos 'version' nombres.
+"""
+
+import json
+import threading
+import urllib.request
+
+
+class RegistroEstatico:
+    """Registro fijo (lista de "app.codename" ordenada por índice de bit)."""
+
+    def __init__(self, nombres):
+        self._nombres = list(nombres)
+
+    def nombres(self, version, token=None):
+        if version > len(self._nombres):
+            raise LookupError(f"El registro local (v{len(self._nombres)}) es anterior al del token (v{version}).")
+        return self._nombres
+
+
+class RegistroRemoto:
+    """
+    Registro descargado de GET /api/permisos/registro/ del Hub.
+
+    Solo se consulta al Hub cuando llega un token codificado con una versión
+    MÁS NUEVA que la conocida, y solo se pide la cola que falta (?desde=N):
+    como el registro es de solo agregado, lo ya descargado nunca cambia.
+    La petición se autentica con el mismo Pasaporte que se está verificando.
+    """
+
+    def __init__(self, url, timeout=5.0):
+        self.url = url
+        self.timeout = timeout
+        self._nombres = []
+        self._candado = threading.Lock()
+
+    def nombres(self, version, token=None):
+        if version <= len(self._nombres):
+            return self._nombres
+        with self._candado:
+            if version > len(self._nombres):
+                self._descargar(token)
+        if version > len(self._nombres):
+            raise LookupError(f"El Hub no conoce la versión {version} del registro de permisos.")
+        return self._nombres
+
+    def _descargar(self, token):
+        separador = '&' if '?' in self.url else '?'
+        peticion = urllib.request.Request(
+            f"{self.url}{separador}desde={len(self._nombres)}",
+            headers={'Authorization': f'Bearer {token}'} if token else {},
+        )
+        with urllib.request.urlopen(peticion, timeout=self.timeout) as respuesta:
+            datos = json.load(respuesta)
+        # Se reemplaza la lista (no se muta) para no afectar lecturas concurrentes
+        self._nombres = self._nombres + list(datos['permisos'])
@@ -0,0 +1,172 @@
+"""
+Verificación LOCAL del JWT del Hub (firma + expiración + tipo de token).
+"""
+
+import json
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+
+import jwt
+
+from .compacto import CLAIM_BITS, CLAIM_VERSION, expandir_bits
+from .pasaporte import Pasaporte
+
+
+class PasaporteInvalido(Exception):
+    """Token ausente, mal firmado, expirado o que no es un Pasaporte de empresa."""
+
+
+class ClaveCompartida:
+    """
+    Fuente de clave para tokens firmados con HMAC (HS256): la SIGNING_KEY del Hub.
+    Las fuentes de clave exponen obtener(token) -> (clave, algoritmos permitidos).
+    """
+
+    def __init__(self, secreto, algoritmos=('HS256',)):
+        self.secreto = secreto
+        self.algoritmos = list(algoritmos)
+
+    def obtener(self, token):
+        return self.secreto, self.algoritmos
+
+
+class ClavesJWKS:
+    """
+    Fuente de claves PÚBLICAS para tokens RS256/EdDSA, desde el JWKS del Hub
+    (GET /.well-known/jwks.json). Requiere 'cryptography'.
+
+    El JWKS se descarga una vez y se guarda 'ttl' segundos. Si llega un 'kid'
+    desconocido (el Hub rotó su llave) se vuelve a descargar, como mucho una
+    vez cada 'refresco_minimo' segundos para que tokens basura no martillen al Hub.
+    """
+
+    def __init__(self, url, ttl=3600, refresco_minimo=60, timeout=5.0):
+        self.url = url
+        self.ttl = ttl
+        self.refresco_minimo = refresco_minimo
+        self.timeout = timeout
+        self._claves = {}
+        self._descargado = 0.0
+        self._candado = threading.Lock()
+
+    def obtener(self, token):
+        kid = jwt.get_unverified_header(token).get('kid')
+        clave = self._claves.get(kid)
+        vencido = time.monotonic() - self._descargado > self.ttl
+        if clave is None or vencido:
+            with self._candado:
+                espera = time.monotonic() - self._descargado
+                if (kid not in self._claves and espera > self.refresco_minimo) or espera > self.ttl:
+                    try:
+                        self._descargar()
+                    except (OSError, ValueError, jwt.PyJWTError):
+                        # Hub caído: seguimos con las llaves conocidas y reintentamos después
+                        self._descargado = time.monotonic() - self.ttl + self.refresco_minimo
+                        if kid not in self._claves:
+                            raise
+            clave = self._claves.get(kid)
+        if clave is None:
+            raise jwt.InvalidKeyError(f"Llave '{kid}' desconocida para el Hub.")
+        return clave.key, [clave.algorithm_name]
+
+    def _descargar(self):
+        with urllib.request.urlopen(self.url, timeout=self.timeout) as respuesta:
+            datos = json.load(respuesta)
+        self._claves = {
+            jwk.key_id: jwk for jwk in jwt.PyJWKSet.from_dict(datos).keys if jwk.key_id
+        }
+        self._descargado = time.monotonic()
+
+
+class VerificadorPasaporte:
+    """
+    Verifica Pasaportes sin red: solo CPU.
+
+    Guarda los últimos Pasaportes verificados en un LRU acotado (clave = token
+    crudo): las peticiones siguientes con el mismo token no vuelven a verificar
+    la firma ni a construir el frozenset de permisos. Una entrada expirada se
+    descarta al consultarla.
+
+    'registro' (ver hub_pasaporte.registro) solo es necesario si el Hub emite
+    Pasaportes con el claim de permisos compacto (mapa de bits).
+    """
+
+    def __init__(self, fuente_clave, leeway=0, tamano_cache=1024, audiencia=None, emisor=None, registro=None):
+        self.fuente_clave = fuente_clave
+        self.registro = registro
+        self.leeway = leeway
+        self.audiencia = audiencia
+        self.emisor = emisor
+        self.tamano_cache = tamano_cache
+        self._cache = OrderedDict()
+        self._candado = threading.Lock()
+
+    def verificar(self, token):
+        """Devuelve un Pasaporte o lanza PasaporteInvalido."""
+        if not token:
+            raise PasaporteInvalido("Token ausente.")
+
+        pasaporte = self._desde_cache(token)
+        if pasaporte is not None:
+            return pasaporte
+
+        try:
+            clave, algoritmos = self.fuente_clave.obtener(token)
+            claims = jwt.decode(
+                token,
+                key=clave,
+                algorithms=algoritmos,
+                leeway=self.leeway,
+                audience=self.audiencia,
+                issuer=self.emisor,
+                options={'require': ['exp'], 'verify_aud': self.audiencia is not None},
+            )
+        except (jwt.PyJWTError, OSError, ValueError) as exc:
+            raise PasaporteInvalido(f"Token inválido: {exc}") from exc
+
+        if claims.get('token_type') != 'access':
+            raise PasaporteInvalido("No es un token de acceso.")
+        if 'empresa_id' not in claims:
+            # El token temporal del login no trae empresa: no sirve fuera del Hub
+            raise PasaporteInvalido("El token no es un Pasaporte de empresa.")
+
+        pasaporte = Pasaporte(claims, self._permisos(claims, token))
+        self._guardar_en_cache(token, pasaporte)
+        return pasaporte
+
+    def _permisos(self, claims, token):
+        """Lista "app.codename" del token, expandiendo el formato compacto si aplica."""
+        if CLAIM_BITS not in claims:
+            return claims.get('permisos', ())
+        if self.registro is None:
+            raise PasaporteInvalido("Pasaporte compacto sin registro de permisos configurado.")
+        try:
+            nombres = self.registro.nombres(int(claims.get(CLAIM_VERSION, 0)), token)
+            return expandir_bits(claims[CLAIM_BITS], nombres)
+        except (LookupError, ValueError, OSError) as exc:
+            raise PasaporteInvalido(f"No se pudieron expandir los permisos: {exc}") from exc
+
+    # --------------------------------------------------------------------------
+    # LRU DE PASAPORTES VERIFICADOS
+    # --------------------------------------------------------------------------
+    def _desde_cache(self, token):
+        with self._candado:
+            pasaporte = self._cache.get(token)
+            if pasaporte is None:
+                return None
+            if pasaporte.expira is not None and pasaporte.expira + self.leeway < time.time():
+                del self._cache[token]
+                return None
+            self._cache.move_to_end(token)
+            return pasaporte
+
+    def _guardar_en_cache(self, token, pasaporte):
+        if not self.tamano_cache:
+            return
+        with self._candado:
+            self._cache[token] = pasaporte
+            self._cache.move_to_end(token)
+            while len(self._cache) > self.tamano_cache:
+                self._cache.popitem(last=False)
@@ -0,0 +1,58 @@
+"""
+Firma de los webhooks de permisos que envía el Hub (run_webhook_worker).
+
+Cada POST trae la cabecera:
+
+    X-Hub-Firma: t=<epoch>,v1=<hex HMAC-SHA256(secreto, "<epoch>.<cuerpo>")>
+
+El epoch dentro de la firma impide reenviar un cuerpo viejo (replay) más
+allá de 'tolerancia' segundos. En la app satélite:
+
+    from hub_pasaporte.webhooks import FirmaInvalida, verificar_firma
+
+    def recibir(request):
+        try:
+            verificar_firma(os.environ['HUB_WEBHOOK_SECRETO'], request.headers.get('X-Hub-Firma'), request.body)
+        except FirmaInvalida:
+            return HttpResponse(status=400)
+        for evento in json.loads(request.body)['eventos']:
+            ...  # invalidar el caché local de (usuario_id, empresa_id) o del rol
+
+Los eventos de un mismo suscriptor llegan en orden ('secuencia' creciente).
+Un 2xx confirma el lote completo; cualquier otra respuesta hace que el Hub
+lo reintente con backoff, así que procesarlo dos veces debe ser inofensivo.
+"""
+
+import hashlib
+import hmac
+import time
+
+CABECERA = 'X-Hub-Firma'
+
+
+class FirmaInvalida(Exception):
+    """Cabecera ausente o mal formada, firma que no coincide o fuera de tolerancia."""
+
+
+def firmar(secreto, cuerpo, momento=None):
+    """Valor de la cabecera X-Hub-Firma para 'cuerpo' (bytes)."""
+    momento = int(momento if momento is not None else time.time())
+    digest = hmac.new(secreto.encode(), f"{momento}.".encode() + cuerpo, hashlib.sha256).hexdigest()
+    return f"t={momento},v1={digest}"
+
+
+def verificar_firma(secreto, cabecera, cuerpo, tolerancia=300):
+    """Devuelve el epoch firmado o lanza FirmaInvalida."""
+    try:
+        partes = dict(parte.split('=', 1) for parte in (cabecera or '').split(','))
+        momento = int(partes['t'])
+        recibida = partes['v1']
+    except (KeyError, ValueError):
+        raise FirmaInvalida(f"Cabecera {CABECERA} ausente o mal formada.")
+
+    if tolerancia and abs(time.time() - momento) > tolerancia:
+        raise FirmaInvalida("Firma fuera de la ventana de tolerancia (posible reenvío).")
+    esperada = firmar(secreto, cuerpo, momento).split('v1=', 1)[1]
+    if not hmac.compare_digest(esperada, recibida):
+        raise FirmaInvalida("La firma no coincide.")
+    return momento
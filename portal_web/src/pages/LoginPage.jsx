@@ -33,6 +33,8 @@ const LoginPage = () => {
         setIsLoading(true);
         try {
             const data = await authService.login(username, password);
+            // Permite renovar la sesión sin volver a pedir la clave (ver services/api.js)
+            localStorage.setItem('refresh_token', data.refresh);
             if (data.debe_cambiar_password) {
                 localStorage.setItem('access_token', data.access); 
                 navigate('/force-password-change');
@@ -1,4 +1,5 @@
 import axios from 'axios';
+import { jwtDecode } from "jwt-decode";
 
 // =================================================================
 // 0. CONFIGURACIÓN DINÁMICA DE URL
@@ -37,15 +38,77 @@ api.interceptors.request.use(
 );
 
 // =================================================================
-// INTERCEPTOR DE RESPUESTA (Entrada) -> Maneja Errores 401
+// RENOVACIÓN DE SESIÓN (Refresh Token rotativo)
+// =================================================================
+// Cada refresh_token sirve UNA vez: el Hub devuelve uno nuevo y, si alguien
+// reusa uno ya gastado, cierra la sesión completa (detección de robo).
+// Por eso nunca renovamos dos veces en paralelo:
+// - En esta pestaña: todas las peticiones con 401 esperan la misma promesa.
+// - Entre pestañas: Web Locks. Si otra pestaña ya renovó mientras
+//   esperábamos el candado, usamos sus tokens en lugar de gastar el viejo.
+let renovacionEnCurso = null;
+
+const renovarSesion = () => {
+    if (renovacionEnCurso) return renovacionEnCurso;
+
+    const refreshConocido = localStorage.getItem('refresh_token');
+    const tarea = async () => {
+        const refresh = localStorage.getItem('refresh_token');
+        if (!refresh) throw new Error("Sin refresh token");
+        if (refresh !== refreshConocido) return; // Otra pestaña ya renovó
+
+        // Si estábamos dentro de una empresa, pedimos también su Pasaporte
+        let empresa_id;
+        try {
+            empresa_id = jwtDecode(localStorage.getItem('access_token')).empresa_id;
+        } catch {
+            empresa_id = undefined;
+        }
+
+        // Axios "pelado": sin los interceptores (y sin el Bearer vencido)
+        const { data } = await axios.post('token/refresh/', { refresh, empresa_id }, { baseURL });
+        localStorage.setItem('refresh_token', data.refresh);
+        localStorage.setItem('temp_token', data.access);
+        localStorage.setItem('access_token', data.access_token || data.access);
+    };
+
+    renovacionEnCurso = (navigator.locks ? navigator.locks.request('hub-renovar-sesion', tarea) : tarea())
+        .finally(() => { renovacionEnCurso = null; });
+    return renovacionEnCurso;
+};
+
+// =================================================================
+// INTERCEPTOR DE RESPUESTA (Entrada) -> Renueva la sesión ante un 401
 // =================================================================
 api.interceptors.response.use(
     (response) => {
         return response;
     },
-    (error) => {
+    async (error) => {
+        const original = error.config;
+
         // Si el servidor responde con error 401 (No autorizado)
         if (error.response && error.response.status === 401) {
+            // 1. Intentamos renovar UNA vez con el refresh_token (sin pedir la clave de nuevo)
+            const puedeRenovar = original && !original._renovada
+                && localStorage.getItem('refresh_token')
+                && !original.url.includes('login/');
+            if (puedeRenovar) {
+                original._renovada = true;
+                const tokenTemporal = localStorage.getItem('temp_token');
+                try {
+                    await renovarSesion();
+                    // select-empresa viaja con el token temporal; el resto, con el Pasaporte
+                    const usabaTemporal = original.headers['Authorization'] === `Bearer ${tokenTemporal}`;
+                    const nuevo = localStorage.getItem(usabaTemporal ? 'temp_token' : 'access_token');
+                    original.headers['Authorization'] = `Bearer ${nuevo}`;
+                    return api(original);
+                } catch (errorRenovacion) {
+                    console.warn("⚠️ No se pudo renovar la sesión", errorRenovacion);
+                }
+            }
+
+            // 2. Sin renovación posible: la sesión terminó de verdad
             console.warn("⚠️ Acceso Denegado o Sesión Expirada (401)");
 
             // Evitar bucle infinito si ya estamos en login